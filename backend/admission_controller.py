@@ -0,0 +1,165 @@
+"""
+准入控制模块
+限制同时生成的播客数量，超出部分按 FIFO 排队并估算开始时间
+"""
+
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+from config import ADMISSION_CONFIG
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AdmissionTicket:
+    """一次播客生成请求的排队凭证"""
+
+    def __init__(self):
+        self.ticket_id = str(uuid.uuid4())
+        self.enqueued_at = time.time()
+        self.admitted_at = None
+        self.released = False
+        self._admitted = threading.Event()
+
+    @property
+    def admitted(self) -> bool:
+        return self._admitted.is_set()
+
+
+class AdmissionController:
+    """全局准入控制器"""
+
+    def __init__(self, max_concurrent: int, max_queue_size: int, default_episode_seconds: float):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue_size = max(0, int(max_queue_size))
+        self._avg_episode_seconds = float(default_episode_seconds)
+        self._lock = threading.Lock()
+        self._waiting = deque()
+        self._running = {}  # ticket_id -> AdmissionTicket
+
+    def try_enqueue(self) -> Optional[AdmissionTicket]:
+        """
+        申请准入
+
+        Returns:
+            排队凭证；队列已满时返回 None
+        """
+        return self._enqueue(bounded=True)
+
+    def enqueue(self) -> AdmissionTicket:
+        """
+        申请准入，不受排队上限限制（批量任务使用，排队条目数已由批量工作线程数限制）
+
+        Returns:
+            排队凭证
+        """
+        return self._enqueue(bounded=False)
+
+    def _enqueue(self, bounded: bool) -> Optional[AdmissionTicket]:
+        ticket = AdmissionTicket()
+        with self._lock:
+            if len(self._running) < self.max_concurrent and not self._waiting:
+                self._admit_locked(ticket)
+            elif bounded and len(self._waiting) >= self.max_queue_size:
+                logger.warning(f"准入队列已满（{len(self._waiting)}/{self.max_queue_size}），拒绝请求")
+                return None
+            else:
+                self._waiting.append(ticket)
+                logger.info(f"请求进入排队，当前位置: {len(self._waiting)}")
+        return ticket
+
+    def wait(self, ticket: AdmissionTicket, timeout: Optional[float] = None) -> bool:
+        """
+        等待准入
+
+        Returns:
+            是否已准入
+        """
+        return ticket._admitted.wait(timeout)
+
+    def release(self, ticket: AdmissionTicket) -> None:
+        """
+        释放凭证（生成结束、失败或客户端断开时调用，可重复调用）
+        """
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+
+            if ticket.ticket_id in self._running:
+                del self._running[ticket.ticket_id]
+                duration = time.time() - ticket.admitted_at
+                # 指数滑动平均，用于估算排队开始时间
+                self._avg_episode_seconds = 0.8 * self._avg_episode_seconds + 0.2 * duration
+                logger.info(f"播客生成结束，占用 {duration:.1f} 秒，当前并发: {len(self._running)}")
+            else:
+                try:
+                    self._waiting.remove(ticket)
+                    logger.info("排队中的请求已取消")
+                except ValueError:
+                    pass
+
+            while self._waiting and len(self._running) < self.max_concurrent:
+                self._admit_locked(self._waiting.popleft())
+
+    def queue_status(self, ticket: AdmissionTicket) -> Dict[str, Any]:
+        """
+        获取排队位置和预计开始时间
+
+        Returns:
+            {"position": 1 开始的位置, "estimated_wait_seconds": 秒, "estimated_start_time": 时间戳}
+        """
+        with self._lock:
+            if ticket.admitted:
+                return {"position": 0, "estimated_wait_seconds": 0, "estimated_start_time": int(time.time())}
+
+            try:
+                position = self._waiting.index(ticket) + 1
+            except ValueError:
+                position = 0
+
+            # 正在运行的任务预计剩余时间（按先结束的排序）
+            now = time.time()
+            remaining = sorted(
+                max(0.0, self._avg_episode_seconds - (now - running.admitted_at))
+                for running in self._running.values()
+            )
+            remaining += [0.0] * (self.max_concurrent - len(remaining))
+
+            rounds, slot = divmod(max(position - 1, 0), self.max_concurrent)
+            wait_seconds = remaining[slot] + rounds * self._avg_episode_seconds
+
+            return {
+                "position": position,
+                "estimated_wait_seconds": int(wait_seconds),
+                "estimated_start_time": int(now + wait_seconds)
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        """获取当前并发与排队统计"""
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "waiting": len(self._waiting),
+                "max_concurrent": self.max_concurrent,
+                "max_queue_size": self.max_queue_size,
+                "avg_episode_seconds": int(self._avg_episode_seconds)
+            }
+
+    def _admit_locked(self, ticket: AdmissionTicket) -> None:
+        ticket.admitted_at = time.time()
+        self._running[ticket.ticket_id] = ticket
+        ticket._admitted.set()
+        logger.info(f"请求已准入（排队 {ticket.admitted_at - ticket.enqueued_at:.1f} 秒），当前并发: {len(self._running)}")
+
+
+# 单例实例
+admission_controller = AdmissionController(
+    max_concurrent=ADMISSION_CONFIG["max_concurrent_episodes"],
+    max_queue_size=ADMISSION_CONFIG["max_queue_size"],
+    default_episode_seconds=ADMISSION_CONFIG["default_episode_seconds"]
+)
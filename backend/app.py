@@ -8,18 +8,29 @@ import sys
 import uuid
 import json
 import logging
+import time
 import threading
-from flask import Flask, request, jsonify, Response, send_file, send_from_directory
+from flask import Flask, request, jsonify, Response, send_file, send_from_directory, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 
 # 添加backend目录到路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from config import UPLOAD_DIR, OUTPUT_DIR, BGM_FILES
+from config import UPLOAD_DIR, OUTPUT_DIR, BGM_FILES, ADMISSION_CONFIG, URL_FETCH_CONFIG, PDF_PARSE_CONFIG, LONG_INPUT_CONFIG, LONG_FORM_CONFIG, COVER_STORE_CONFIG, SCRIPT_INPUT_CONFIG
 from content_parser import content_parser
 from voice_manager import voice_manager
 from podcast_generator import podcast_generator
+from admission_controller import admission_controller
+from tts_scheduler import tts_scheduler
+from stage_graph import StageGraph, StageError
+from upload_ingest import IngestRequest, save_upload
+from content_cache import content_cache, normalize_url
+from episode_cache import episode_cache
+from cover_store import cover_store, CoverTooLarge
+from segment_store import segment_store
+from batch_runner import batch_runner
 
 # 配置日志
 logging.basicConfig(
@@ -30,11 +41,14 @@ logger = logging.getLogger(__name__)
 
 # Flask 应用
 app = Flask(__name__)
+# 上传文件在解析 multipart 时直接分块写入上传目录，并计算 sha256、检查大小上限
+app.request_class = IngestRequest
 CORS(app)
 
 # 允许的文件扩展名
 ALLOWED_AUDIO_EXTENSIONS = {'wav', 'mp3', 'flac', 'm4a', 'ogg'}
 ALLOWED_PDF_EXTENSIONS = {'pdf'}
+ALLOWED_SCRIPT_EXTENSIONS = {'txt'}
 
 
 def allowed_file(filename, allowed_extensions):
@@ -45,7 +59,15 @@ def allowed_file(filename, allowed_extensions):
 @app.route('/health', methods=['GET'])
 def health_check():
     """健康检查接口"""
-    return jsonify({"status": "ok", "message": "AI 播客生成服务运行中"})
+    return jsonify({
+        "status": "ok",
+        "message": "AI 播客生成服务运行中",
+        "admission": admission_controller.stats(),
+        "tts_scheduler": tts_scheduler.stats(),
+        "content_cache": content_cache.stats(),
+        "episode_cache": episode_cache.stats(),
+        "batch": batch_runner.stats()
+    })
 
 
 @app.route('/api/default-voices', methods=['GET'])
@@ -65,8 +87,13 @@ def generate_podcast():
 
     请求参数:
     - text_input: 文本输入（可选）
-    - url: 网址输入（可选）
-    - pdf_file: PDF 文件（可选）
+    - url: 网址输入（可选，可重复传多个）
+    - pdf_file: PDF 文件（可选，可上传多个）
+    - long_input: "true" 时启用长文档模式（网页/PDF 解析全文，分段摘要后生成脚本）
+    - long_form: "true" 时启用长节目模式（先生成大纲，各段并行生成与合成）
+    - target_minutes: 长节目目标时长（分钟，默认 30）
+    - script_input: 脚本输入（可选，每行 "Speaker1: 文本" / "Speaker2: 文本"）；
+      提供时跳过解析和脚本生成，全部句子直接并行合成（也可上传 script_file 文本文件）
     - speaker1_type: "default" 或 "custom"
     - speaker1_voice_name: "mini" 或 "max"（default 时）
     - speaker1_audio: 音频文件（custom 时）
@@ -78,8 +105,22 @@ def generate_podcast():
     session_id = str(uuid.uuid4())
     logger.info(f"开始生成播客，Session ID: {session_id}")
 
-    # 提取 API Key
-    user_api_key = request.form.get('api_key', '').strip()
+    # 提取 API Key（首次访问表单时解析上传内容，超过大小上限立即中止）
+    try:
+        user_api_key = request.form.get('api_key', '').strip()
+        request.files
+    except RequestEntityTooLarge as e:
+        logger.warning(f"上传内容超过大小上限: {e.description}")
+        too_large_message = e.description or "上传文件过大"
+
+        def too_large_gen():
+            yield "data: " + json.dumps({
+                "type": "error",
+                "message": too_large_message,
+                "error_code": "upload_too_large"
+            }) + "\n\n"
+        return Response(too_large_gen(), status=413, mimetype='text/event-stream')
+
     if not user_api_key:
         def error_gen():
             yield "data: " + json.dumps({
@@ -88,92 +129,119 @@ def generate_podcast():
             }) + "\n\n"
         return Response(error_gen(), mimetype='text/event-stream')
 
-    # 提取表单数据
-    text_input = request.form.get('text_input', '').strip()
-    url_input = request.form.get('url', '').strip()
-
-    # 提取 PDF 文件
-    pdf_file = None
-    pdf_path = None
-    if 'pdf_file' in request.files:
-        pdf_file_obj = request.files['pdf_file']
-        if pdf_file_obj and allowed_file(pdf_file_obj.filename, ALLOWED_PDF_EXTENSIONS):
-            filename = secure_filename(pdf_file_obj.filename)
-            pdf_path = os.path.join(UPLOAD_DIR, f"{session_id}_{filename}")
-            pdf_file_obj.save(pdf_path)
-            pdf_file = filename
-
-    # 提取音色配置
-    speaker1_type = request.form.get('speaker1_type', 'default')
-    speaker1_voice_name = request.form.get('speaker1_voice_name', 'mini')
-    speaker1_audio_path = None
-    if speaker1_type == 'custom' and 'speaker1_audio' in request.files:
-        audio_file = request.files['speaker1_audio']
-        if audio_file and allowed_file(audio_file.filename, ALLOWED_AUDIO_EXTENSIONS):
-            filename = secure_filename(audio_file.filename)
-            speaker1_audio_path = os.path.join(UPLOAD_DIR, f"{session_id}_speaker1_{filename}")
-            audio_file.save(speaker1_audio_path)
-
-    speaker2_type = request.form.get('speaker2_type', 'default')
-    speaker2_voice_name = request.form.get('speaker2_voice_name', 'max')
-    speaker2_audio_path = None
-    if speaker2_type == 'custom' and 'speaker2_audio' in request.files:
-        audio_file = request.files['speaker2_audio']
-        if audio_file and allowed_file(audio_file.filename, ALLOWED_AUDIO_EXTENSIONS):
-            filename = secure_filename(audio_file.filename)
-            speaker2_audio_path = os.path.join(UPLOAD_DIR, f"{session_id}_speaker2_{filename}")
-            audio_file.save(speaker2_audio_path)
-
-    def generate():
-        """SSE 生成器"""
-        try:
-            # Step 1: 解析输入内容
-            yield f"data: {json.dumps({'type': 'progress', 'step': 'parsing_content', 'message': '正在解析输入内容...'})}\n\n"
-
-            # 处理 PDF 文件
-            pdf_content = ""
-            if pdf_path:
-                yield f"data: {json.dumps({'type': 'log', 'message': f'已上传 PDF: {pdf_file}'})}\n\n"
-
-                pdf_result = content_parser.parse_pdf(pdf_path)
-                if pdf_result["success"]:
-                    pdf_content = pdf_result["content"]
-                    for log in pdf_result["logs"]:
-                        yield f"data: {json.dumps({'type': 'log', 'message': log})}\n\n"
-                else:
-                    yield f"data: {json.dumps({'type': 'error', 'message': pdf_result['error']})}\n\n"
-                    return
+    # 申请准入（队列已满时直接拒绝，避免保存上传文件）
+    ticket = admission_controller.try_enqueue()
+    if ticket is None:
+        retry_after = ADMISSION_CONFIG["retry_after_seconds"]
 
-            # 解析网址（如果提供）
-            url_content = ""
-            if url_input:
-                yield f"data: {json.dumps({'type': 'log', 'message': f'开始解析网址: {url_input}'})}\n\n"
+        def busy_gen():
+            yield "data: " + json.dumps({
+                "type": "error",
+                "message": f"当前生成任务较多，请 {retry_after} 秒后重试",
+                "error_code": "queue_full",
+                "retry_after": retry_after
+            }) + "\n\n"
+        return Response(busy_gen(), status=429, mimetype='text/event-stream',
+                        headers={'Retry-After': str(retry_after)})
 
-                url_result = content_parser.parse_url(url_input)
-                if url_result["success"]:
-                    url_content = url_result["content"]
-                    for log in url_result["logs"]:
-                        yield f"data: {json.dumps({'type': 'log', 'message': log})}\n\n"
-                else:
-                    # 发送友好的错误提示，但不中断流程
-                    error_code = url_result.get('error_code', 'unknown')
-                    yield f"data: {json.dumps({'type': 'url_parse_warning', 'message': url_result['error'], 'error_code': error_code})}\n\n"
-                    for log in url_result["logs"]:
-                        yield f"data: {json.dumps({'type': 'log', 'message': log})}\n\n"
-                    # 不返回，继续处理其他输入内容
+    # 准入凭证已占用：解析表单或保存上传失败时必须释放，否则并发名额永久丢失
+    try:
+        # 提取表单数据
+        text_input = request.form.get('text_input', '').strip()
+        long_input = request.form.get('long_input', '').lower() in ('1', 'true', 'yes', 'on')
+        # 长文档模式下按更高的字符上限解析来源
+        source_max_chars = LONG_INPUT_CONFIG["max_source_chars"] if long_input else None
+
+        # 长节目模式：目标时长限制在配置范围内
+        long_form_minutes = None
+        if request.form.get('long_form', '').lower() in ('1', 'true', 'yes', 'on'):
+            try:
+                long_form_minutes = int(request.form.get('target_minutes') or LONG_FORM_CONFIG["default_minutes"])
+            except ValueError:
+                long_form_minutes = LONG_FORM_CONFIG["default_minutes"]
+            long_form_minutes = min(max(long_form_minutes, LONG_FORM_CONFIG["min_minutes"]), LONG_FORM_CONFIG["max_minutes"])
+        # 脚本输入模式：文本框或 .txt 文件中的现成脚本，不再解析来源、不调用文本模型
+        script_text = request.form.get('script_input', '').strip()
+        script_file_obj = request.files.get('script_file')
+        if not script_text and script_file_obj and allowed_file(script_file_obj.filename, ALLOWED_SCRIPT_EXTENSIONS):
+            script_text = script_file_obj.read(SCRIPT_INPUT_CONFIG["max_chars"] * 4).decode('utf-8', errors='ignore').strip()
+        script_text = script_text[:SCRIPT_INPUT_CONFIG["max_chars"]]
+        if script_text:
+            long_input = False
+            long_form_minutes = None
+
+        # 多个网址按输入顺序去重（规范化后相同视为同一来源）
+        url_inputs = []
+        seen_urls = set()
+        for url in request.form.getlist('url'):
+            url = url.strip()
+            if url and normalize_url(url) not in seen_urls:
+                seen_urls.add(normalize_url(url))
+                url_inputs.append(url)
+        url_inputs = url_inputs[:URL_FETCH_CONFIG["max_urls"]]
+
+        # 提取 PDF 文件（可上传多个，按上传顺序保存）
+        pdf_uploads = []  # [{"name", "path", "size", "sha256"}]，哈希供下游缓存使用
+        for pdf_file_obj in request.files.getlist('pdf_file')[:PDF_PARSE_CONFIG["max_files"]]:
+            if pdf_file_obj and allowed_file(pdf_file_obj.filename, ALLOWED_PDF_EXTENSIONS):
+                filename = secure_filename(pdf_file_obj.filename)
+                pdf_upload = save_upload(pdf_file_obj, os.path.join(UPLOAD_DIR, f"{session_id}_{len(pdf_uploads)}_{filename}"))
+                pdf_uploads.append({"name": filename, **pdf_upload})
+
+        # 提取音色配置
+        speaker1_type = request.form.get('speaker1_type', 'default')
+        speaker1_voice_name = request.form.get('speaker1_voice_name', 'mini')
+        speaker1_audio_path = None
+        speaker1_audio_sha256 = None
+        if speaker1_type == 'custom' and 'speaker1_audio' in request.files:
+            audio_file = request.files['speaker1_audio']
+            if audio_file and allowed_file(audio_file.filename, ALLOWED_AUDIO_EXTENSIONS):
+                filename = secure_filename(audio_file.filename)
+                audio_upload = save_upload(audio_file, os.path.join(UPLOAD_DIR, f"{session_id}_speaker1_{filename}"))
+                speaker1_audio_path = audio_upload["path"]
+                speaker1_audio_sha256 = audio_upload["sha256"]
+
+        speaker2_type = request.form.get('speaker2_type', 'default')
+        speaker2_voice_name = request.form.get('speaker2_voice_name', 'max')
+        speaker2_audio_path = None
+        speaker2_audio_sha256 = None
+        if speaker2_type == 'custom' and 'speaker2_audio' in request.files:
+            audio_file = request.files['speaker2_audio']
+            if audio_file and allowed_file(audio_file.filename, ALLOWED_AUDIO_EXTENSIONS):
+                filename = secure_filename(audio_file.filename)
+                audio_upload = save_upload(audio_file, os.path.join(UPLOAD_DIR, f"{session_id}_speaker2_{filename}"))
+                speaker2_audio_path = audio_upload["path"]
+                speaker2_audio_sha256 = audio_upload["sha256"]
+    except Exception as e:
+        admission_controller.release(ticket)
+        logger.error(f"解析请求失败: {str(e)}", exc_info=True)
+        parse_error_message = f"请求解析失败: {str(e)}"
 
-            # 合并所有内容
-            merged_content = content_parser.merge_contents(text_input, url_content, pdf_content)
+        def parse_error_gen():
+            yield "data: " + json.dumps({
+                "type": "error",
+                "message": parse_error_message
+            }) + "\n\n"
+        return Response(parse_error_gen(), status=400, mimetype='text/event-stream')
 
-            if not merged_content or merged_content == "没有可用的内容":
+    def generate():
+        """SSE 生成器"""
+        try:
+            # Step 0: 等待准入（排队期间定期推送位置和预计开始时间）
+            if not ticket.admitted:
+                while True:
+                    status = admission_controller.queue_status(ticket)
+                    queued_message = f"排队中，前方还有 {status['position'] - 1} 个任务，预计 {status['estimated_wait_seconds']} 秒后开始"
+                    yield f"data: {json.dumps({'type': 'queued', **status, 'message': queued_message})}\n\n"
+                    if admission_controller.wait(ticket, timeout=ADMISSION_CONFIG["queued_event_interval"]):
+                        break
+                yield f"data: {json.dumps({'type': 'log', 'message': '排队结束，开始生成'})}\n\n"
+
+            # Step 1: 校验输入（不涉及网络请求的检查先同步完成）
+            if not (script_text or text_input or url_inputs or pdf_uploads):
                 yield f"data: {json.dumps({'type': 'error', 'message': '请至少提供一种输入内容（文本/网址/PDF）'})}\n\n"
                 return
 
-            yield f"data: {json.dumps({'type': 'log', 'message': f'内容解析完成，共 {len(merged_content)} 字符'})}\n\n"
-
-            # Step 2: 准备音色
-            yield f"data: {json.dumps({'type': 'progress', 'step': 'preparing_voices', 'message': '正在准备音色...'})}\n\n"
-
             # Speaker1 配置
             speaker1_config = {"type": speaker1_type}
 
@@ -182,6 +250,7 @@ def generate_podcast():
             elif speaker1_type == 'custom':
                 if speaker1_audio_path:
                     speaker1_config["audio_file"] = speaker1_audio_path
+                    speaker1_config["audio_sha256"] = speaker1_audio_sha256
                     yield f"data: {json.dumps({'type': 'log', 'message': 'Speaker1 音频已上传'})}\n\n"
                 else:
                     yield f"data: {json.dumps({'type': 'error', 'message': 'Speaker1 选择自定义音色但未上传音频文件'})}\n\n"
@@ -195,45 +264,124 @@ def generate_podcast():
             elif speaker2_type == 'custom':
                 if speaker2_audio_path:
                     speaker2_config["audio_file"] = speaker2_audio_path
+                    speaker2_config["audio_sha256"] = speaker2_audio_sha256
                     yield f"data: {json.dumps({'type': 'log', 'message': 'Speaker2 音频已上传'})}\n\n"
                 else:
                     yield f"data: {json.dumps({'type': 'error', 'message': 'Speaker2 选择自定义音色但未上传音频文件'})}\n\n"
                     return
 
-            # 准备音色（可能涉及克隆）
-            voices_result = voice_manager.prepare_voices(speaker1_config, speaker2_config, api_key=user_api_key)
+            yield f"data: {json.dumps({'type': 'progress', 'step': 'parsing_content', 'message': '正在解析输入内容...'})}\n\n"
 
-            if not voices_result["success"]:
-                yield f"data: {json.dumps({'type': 'error', 'message': voices_result['error']})}\n\n"
-                return
+            # Step 2: 构建阶段图，解析、音色准备与后续生成阶段输入就绪即并发执行
+            graph = StageGraph(session_id)
+
+            def source_event(source, index, name, status, message, **extra):
+                return {'type': 'source_progress', 'source': source, 'index': index, 'name': name,
+                        'status': status, 'message': message, **extra}
 
-            # 发送音色准备日志
-            for log in voices_result["logs"]:
-                yield f"data: {json.dumps({'type': 'log', 'message': log})}\n\n"
-
-            # 发送音色克隆的 Trace ID
-            for key, trace_id in voices_result.get("trace_ids", {}).items():
-                if trace_id:
-                    yield f"data: {json.dumps({'type': 'trace_id', 'api': key, 'trace_id': trace_id})}\n\n"
-
-            speaker1_voice_id = voices_result["speaker1"]
-            speaker2_voice_id = voices_result["speaker2"]
-
-            # Step 3: 流式生成播客
-            for event in podcast_generator.generate_podcast_stream(
-                content=merged_content,
-                speaker1_voice_id=speaker1_voice_id,
-                speaker2_voice_id=speaker2_voice_id,
-                session_id=session_id,
-                api_key=user_api_key
-            ):
+            # 处理 PDF 文件（每个文件一个阶段，并发解析）
+            def make_parse_pdf_stage(index, pdf_upload):
+                def parse_pdf_stage(emit, results):
+                    name = pdf_upload["name"]
+                    emit(source_event('pdf', index, name, 'started', f'已上传 PDF: {name}（{pdf_upload["size"] // 1024} KB）'))
+
+                    pdf_result = content_parser.parse_pdf(pdf_upload["path"], pdf_upload["sha256"], max_chars=source_max_chars)
+                    for log in pdf_result["logs"]:
+                        emit({'type': 'log', 'message': log})
+                    if not pdf_result["success"]:
+                        emit(source_event('pdf', index, name, 'failed', f'PDF {name} 解析失败'))
+                        raise StageError(pdf_result['error'])
+                    emit(source_event('pdf', index, name, 'done', f'PDF {name} 解析完成，共 {len(pdf_result["content"])} 字符',
+                                      chars=len(pdf_result["content"]), cached=pdf_result.get("cached", False)))
+                    return pdf_result["content"]
+                return parse_pdf_stage
+
+            # 解析网址（每个网址一个阶段，共享连接池并按主机限制并发）
+            def make_parse_url_stage(index, url):
+                def parse_url_stage(emit, results):
+                    emit(source_event('url', index, url, 'started', f'开始解析网址: {url}'))
+
+                    url_result = content_parser.parse_url(url, max_chars=source_max_chars)
+                    for log in url_result["logs"]:
+                        emit({'type': 'log', 'message': log})
+                    if url_result["success"]:
+                        emit(source_event('url', index, url, 'done', f'网址解析完成，共 {len(url_result["content"])} 字符',
+                                          chars=len(url_result["content"]), cached=url_result.get("cached", False)))
+                        return url_result["content"]
+
+                    # 发送友好的错误提示，但不中断流程
+                    error_code = url_result.get('error_code', 'unknown')
+                    emit(source_event('url', index, url, 'failed', f'网址解析失败: {url}', error_code=error_code))
+                    emit({'type': 'url_parse_warning', 'message': url_result['error'], 'error_code': error_code,
+                          'url': url, 'index': index})
+                    return ""
+                return parse_url_stage
+
+            # 合并所有内容
+            def content_stage(emit, results):
+                # 按输入顺序合并，与各来源的完成先后无关
+                merged_content = content_parser.merge_contents(
+                    text_input,
+                    [results[f"parse_url_{index}"] for index in range(len(url_inputs))],
+                    [results[f"parse_pdf_{index}"] for index in range(len(pdf_uploads))]
+                )
+                if not merged_content or merged_content == "没有可用的内容":
+                    raise StageError('请至少提供一种输入内容（文本/网址/PDF）')
+
+                emit({'type': 'log', 'message': f'内容解析完成，共 {len(merged_content)} 字符'})
+                return merged_content
+
+            # 准备音色（可能涉及克隆，与内容解析并发）
+            def voices_stage(emit, results):
+                emit({'type': 'progress', 'step': 'preparing_voices', 'message': '正在准备音色...'})
+
+                voices_result = voice_manager.prepare_voices(speaker1_config, speaker2_config, api_key=user_api_key)
+                if not voices_result["success"]:
+                    raise StageError(voices_result['error'])
+
+                # 发送音色准备日志
+                for log in voices_result["logs"]:
+                    emit({'type': 'log', 'message': log})
+
+                # 发送音色克隆的 Trace ID
+                for key, trace_id in voices_result.get("trace_ids", {}).items():
+                    if trace_id:
+                        emit({'type': 'trace_id', 'api': key, 'trace_id': trace_id})
+
+                return {"speaker1": voices_result["speaker1"], "speaker2": voices_result["speaker2"]}
+
+            source_stages = []
+            if script_text:
+                graph.add_stage("content", lambda emit, results: script_text)
+            else:
+                for index, pdf_upload in enumerate(pdf_uploads):
+                    graph.add_stage(f"parse_pdf_{index}", make_parse_pdf_stage(index, pdf_upload))
+                    source_stages.append(f"parse_pdf_{index}")
+                for index, url in enumerate(url_inputs):
+                    graph.add_stage(f"parse_url_{index}", make_parse_url_stage(index, url), critical=False)
+                    source_stages.append(f"parse_url_{index}")
+                graph.add_stage("content", content_stage, deps=source_stages)
+            graph.add_stage("voices", voices_stage)
+            # 不克隆即可确定的音色 ID，节目缓存查找不必等待克隆
+            graph.add_stage("voice_ids", lambda emit, results: voice_manager.resolve_voice_ids(
+                speaker1_config, speaker2_config, api_key=user_api_key))
+
+            # Step 3: 流式生成播客（客户端断开时生成器关闭，阶段图随之取消）
+            for event in podcast_generator.generate_podcast_graph(
+                    graph, session_id, user_api_key, long_input=long_input, long_form_minutes=long_form_minutes,
+                    script_input=bool(script_text)):
                 yield f"data: {json.dumps(event)}\n\n"
 
         except Exception as e:
             logger.error(f"播客生成失败: {str(e)}", exc_info=True)
             yield f"data: {json.dumps({'type': 'error', 'message': f'播客生成失败: {str(e)}'})}\n\n"
+        finally:
+            admission_controller.release(ticket)
 
-    return Response(generate(), mimetype='text/event-stream')
+    response = Response(generate(), mimetype='text/event-stream')
+    # 客户端在生成器启动前断开时 finally 不会执行，这里兜底释放
+    response.call_on_close(lambda: admission_controller.release(ticket))
+    return response
 
 
 @app.route('/api/upload_audio', methods=['POST'])
@@ -255,12 +403,13 @@ def upload_audio():
         filename = f"{session_id}_{speaker}_{int(time.time())}.wav"
         file_path = os.path.join(UPLOAD_DIR, filename)
 
-        audio_file.save(file_path)
+        audio_upload = save_upload(audio_file, file_path)
 
         return jsonify({
             "success": True,
             "filename": filename,
-            "path": file_path
+            "path": file_path,
+            "sha256": audio_upload["sha256"]
         })
 
     except Exception as e:
@@ -268,6 +417,86 @@ def upload_audio():
         return jsonify({"success": False, "error": str(e)})
 
 
+@app.route('/api/episodes/<episode_id>', methods=['GET'])
+def get_episode_manifest(episode_id):
+    """获取节目的句子清单（说话人、文本、音色、片段时长和时间轴偏移）"""
+    manifest = segment_store.load_manifest(episode_id)
+    if manifest is None:
+        return jsonify({"success": False, "error": "节目不存在或片段已被清理"}), 404
+    return jsonify({
+        "success": True,
+        "manifest": manifest,
+        "audio_url": f"/download/audio/{manifest['audio_filename']}",
+        "script_url": f"/download/script/{manifest['script_filename']}"
+    })
+
+
+@app.route('/api/episodes/<episode_id>/regenerate', methods=['POST'])
+def regenerate_episode_lines(episode_id):
+    """
+    重新合成节目中的指定句子，并从已保存的片段重新拼装整期节目
+
+    请求体（JSON）:
+    - api_key: MiniMax API Key
+    - lines: [{"index": 句子序号（从 0 开始）, "text": 修改后的文本（可选）, "voice_id": 音色（可选）}]
+    """
+    payload = request.get_json(silent=True) or {}
+    user_api_key = (payload.get('api_key') or '').strip()
+    if not user_api_key:
+        return jsonify({"success": False, "error": "未提供 API Key"}), 400
+    if not isinstance(payload.get('lines'), list) or not all(isinstance(line, dict) for line in payload['lines']):
+        return jsonify({"success": False, "error": "lines 格式错误"}), 400
+
+    result = segment_store.regenerate(episode_id, payload['lines'], user_api_key)
+    if not result["success"]:
+        status = 404 if segment_store.load_manifest(episode_id) is None else 400
+        return jsonify(result), status
+    return jsonify(result)
+
+
+@app.route('/api/batches', methods=['POST'])
+def create_batch():
+    """
+    提交批量生成任务（在共享的有界线程池中逐条生成，立即返回任务 ID）
+
+    请求体（JSON）:
+    - api_key: MiniMax API Key
+    - items: [{"text_input", "urls": [网址], "script_input", "long_input", "target_minutes",
+               "speaker1_voice_name", "speaker2_voice_name",
+               "speaker1_voice_id", "speaker2_voice_id"}]
+      speakerN_voice_id 为已克隆的音色 ID（优先于 speakerN_voice_name）；批量接口不接收参考音频，不能在提交时克隆
+    """
+    payload = request.get_json(silent=True) or {}
+    user_api_key = (payload.get('api_key') or '').strip()
+    if not user_api_key:
+        return jsonify({"success": False, "error": "未提供 API Key"}), 400
+    if not isinstance(payload.get('items'), list):
+        return jsonify({"success": False, "error": "items 格式错误"}), 400
+
+    result = batch_runner.submit(payload['items'], user_api_key)
+    if result.get("error_code") == "queue_full":
+        retry_after = ADMISSION_CONFIG["retry_after_seconds"]
+        return jsonify(dict(result, retry_after=retry_after)), 429, {'Retry-After': str(retry_after)}
+    if not result["success"]:
+        return jsonify(result), 400
+    job = result["job"]
+    return jsonify({
+        "success": True,
+        "job_id": job["job_id"],
+        "manifest_url": f"/api/batches/{job['job_id']}",
+        "job": job
+    }), 202
+
+
+@app.route('/api/batches/<job_id>', methods=['GET'])
+def get_batch(job_id):
+    """获取批量任务清单（各条状态、音频/脚本/封面地址、耗时，以及吞吐 期/小时）"""
+    job = batch_runner.get_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "批量任务不存在"}), 404
+    return jsonify({"success": True, "job": job})
+
+
 @app.route('/download/audio/<filename>', methods=['GET'])
 def download_audio(filename):
     """下载音频文件"""
@@ -288,33 +517,53 @@ def download_script(filename):
         return jsonify({"error": str(e)}), 404
 
 
-@app.route('/download/cover', methods=['GET'])
-def download_cover():
-    """下载封面图片（从OSS代理下载）"""
+@app.route('/download/cover/<filename>', methods=['GET'])
+def download_local_cover(filename):
+    """从本地提供封面图片（?download=1 时作为附件下载）"""
     try:
-        import requests
-        cover_url = request.args.get('url')
-        if not cover_url:
-            return jsonify({"error": "未提供封面URL"}), 400
+        return send_from_directory(
+            cover_store.directory,
+            filename,
+            as_attachment=request.args.get('download') == '1',
+            max_age=COVER_STORE_CONFIG["cache_max_age"]
+        )
+    except Exception as e:
+        logger.error(f"下载封面失败: {str(e)}")
+        return jsonify({"error": str(e)}), 404
 
-        # 从 OSS 获取图片
-        response = requests.get(cover_url, timeout=30)
-        response.raise_for_status()
 
-        # 生成文件名
-        import time
-        filename = f"podcast_cover_{int(time.time())}.jpg"
+@app.route('/download/cover', methods=['GET'])
+def download_cover():
+    """下载封面图片：已保存到本地的从磁盘提供，否则流式代理白名单主机上的图片"""
+    cover_url = request.args.get('url')
+    if not cover_url:
+        return jsonify({"error": "未提供封面URL"}), 400
 
-        # 返回图片数据，设置下载头
-        from flask import make_response
-        resp = make_response(response.content)
-        resp.headers['Content-Type'] = 'image/jpeg'
-        resp.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return resp
+    filename = cover_store.local_filename(cover_url)
+    if filename:
+        return send_from_directory(cover_store.directory, filename, as_attachment=True,
+                                   max_age=COVER_STORE_CONFIG["cache_max_age"])
 
+    if not cover_store.is_allowed_url(cover_url):
+        return jsonify({"error": "不允许代理该地址"}), 403
+
+    try:
+        response = cover_store.open_stream(cover_url)
+    except CoverTooLarge as e:
+        return jsonify({"error": str(e)}), 413
     except Exception as e:
         logger.error(f"下载封面失败: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"error": str(e)}), 502
+
+    content_type = response.headers.get("Content-Type", "image/jpeg")
+    filename = f"podcast_cover_{int(time.time())}.jpg"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "private, max-age=300"
+    }
+    if response.headers.get("Content-Length"):
+        headers["Content-Length"] = response.headers["Content-Length"]
+    return Response(stream_with_context(cover_store.iter_limited(response)), mimetype=content_type, headers=headers)
 
 
 @app.route('/static/<path:filename>')
@@ -1,18 +1,460 @@
 """
 音频处理工具
 支持 BGM 拼接、音频流式拼接、淡入淡出等功能
+编解码与音量处理可提交到进程池执行，PCM 数据通过共享内存传递
 """
 import os
+import struct
+import audioop
 import logging
 import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory, resource_tracker
 from pydub import AudioSegment
 from pydub.effects import normalize
-from io import BytesIO
+from pydub.silence import detect_leading_silence
+from functools import lru_cache
+from config import AUDIO_PROCESS_POOL_CONFIG, AUDIO_CODEC_CONFIG
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# ========== 编解码后端 ==========
+# pydub 的每次 from_file / export 都会启动一个新的 ffmpeg 子进程。
+# 编解码后端可插拔：
+# - pydub: 原有路径，每次操作一个 ffmpeg 子进程
+# - native: 进程内编解码（WAV 用标准库解析；MP3 解码用 miniaudio，编码用 lameenc），
+#   依赖未安装或格式不支持时逐个操作降级到 pydub（依赖缺失时启动时记录警告）
+
+try:
+    import miniaudio
+except ImportError:
+    miniaudio = None
+
+try:
+    import lameenc
+except ImportError:
+    lameenc = None
+
+
+class PydubCodecBackend:
+    """pydub + ffmpeg 子进程编解码"""
+
+    name = "pydub"
+
+    def decode(self, data: bytes, format: str) -> AudioSegment:
+        # 创建临时文件（delete=False，稍后手动删除以便调试）
+        tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f'.{format}')
+        try:
+            tmp_file.write(data)
+            tmp_file.flush()
+            tmp_file.close()  # 关闭文件以便 ffmpeg 可以正常读取
+
+            # 从临时文件加载
+            audio_segment = AudioSegment.from_file(tmp_file.name, format=format)
+
+            # 强制加载完整数据到内存
+            audio_segment.raw_data
+            return audio_segment
+
+        finally:
+            # 清理临时文件
+            try:
+                if os.path.exists(tmp_file.name):
+                    os.unlink(tmp_file.name)
+            except Exception as cleanup_error:
+                logger.warning(f"删除临时文件失败: {cleanup_error}")
+
+    def decode_file(self, path: str) -> AudioSegment:
+        return AudioSegment.from_file(path)
+
+    def encode(self, segment: AudioSegment, output_path: str, format: str = "mp3", bitrate_kbps: int = None) -> str:
+        segment.export(output_path, format=format, bitrate=f"{bitrate_kbps}k" if bitrate_kbps else None)
+        return output_path
+
+
+class NativeCodecBackend:
+    """进程内编解码，不支持的操作降级到 fallback 后端"""
+
+    name = "native"
+
+    def __init__(self, fallback: PydubCodecBackend, mp3_bitrate_kbps: int = 128):
+        self.fallback = fallback
+        self.mp3_bitrate_kbps = mp3_bitrate_kbps
+
+    def decode(self, data: bytes, format: str) -> AudioSegment:
+        if format == "wav":
+            segment = _decode_wav_bytes(data)
+            if segment is not None:
+                return segment
+        elif format in ("mp3", "flac", "ogg") and miniaudio is not None:
+            # miniaudio 支持 MP3 / FLAC / Vorbis，Opus 等会解码失败并降级
+            try:
+                return _from_miniaudio(miniaudio.decode(data, output_format=miniaudio.SampleFormat.SIGNED16))
+            except miniaudio.DecodeError as e:
+                logger.warning(f"miniaudio 解码失败，降级到 pydub: {str(e)}")
+        return self.fallback.decode(data, format)
+
+    def decode_file(self, path: str) -> AudioSegment:
+        extension = os.path.splitext(path)[1].lower().lstrip('.')
+        if extension in ("wav", "mp3", "flac", "ogg"):
+            with open(path, 'rb') as f:
+                return self.decode(f.read(), extension)
+        return self.fallback.decode_file(path)
+
+    def encode(self, segment: AudioSegment, output_path: str, format: str = "mp3", bitrate_kbps: int = None) -> str:
+        if format == "wav":
+            # pydub 导出 WAV 本身就在进程内完成
+            segment.export(output_path, format="wav")
+            return output_path
+
+        if format == "mp3" and lameenc is not None:
+            pcm = segment if segment.sample_width == 2 else segment.set_sample_width(2)
+            encoder = lameenc.Encoder()
+            encoder.set_bit_rate(bitrate_kbps or self.mp3_bitrate_kbps)
+            encoder.set_in_sample_rate(pcm.frame_rate)
+            encoder.set_channels(pcm.channels)
+            encoder.set_quality(2)
+            mp3_data = encoder.encode(pcm.raw_data) + encoder.flush()
+            with open(output_path, 'wb') as f:
+                f.write(mp3_data)
+            return output_path
+
+        return self.fallback.encode(segment, output_path, format, bitrate_kbps)
+
+
+def _from_miniaudio(decoded) -> AudioSegment:
+    return AudioSegment(
+        data=decoded.samples.tobytes(),
+        sample_width=2,
+        frame_rate=decoded.sample_rate,
+        channels=decoded.nchannels
+    )
+
+
+def _decode_wav_bytes(data: bytes):
+    """
+    解析 RIFF/WAVE（整数 PCM 与 32 位浮点）
+
+    Returns:
+        AudioSegment；格式不支持时返回 None
+    """
+    if len(data) < 12 or data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        return None
+
+    fmt = None
+    fmt_body = b''
+    pcm_data = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        chunk_size = struct.unpack('<I', data[offset + 4:offset + 8])[0]
+        body = data[offset + 8:offset + 8 + chunk_size]
+        if chunk_id == b'fmt ' and len(body) >= 16:
+            fmt = struct.unpack('<HHIIHH', body[:16])
+            fmt_body = body
+        elif chunk_id == b'data':
+            pcm_data = body
+        offset += 8 + chunk_size + (chunk_size & 1)
+
+    if fmt is None or pcm_data is None:
+        return None
+
+    audio_format, channels, sample_rate, _, block_align, bits = fmt
+    if audio_format == 0xFFFE and len(fmt_body) >= 26:
+        # WAVE_FORMAT_EXTENSIBLE：子格式 GUID 的前两个字节即基础格式
+        audio_format = struct.unpack('<H', fmt_body[24:26])[0]
+
+    if audio_format == 1 and bits in (8, 16, 24, 32):
+        sample_width = bits // 8
+        pcm_data = pcm_data[:len(pcm_data) - len(pcm_data) % block_align]
+        if sample_width == 1:
+            # WAV 的 8 位为无符号，AudioSegment 使用有符号
+            pcm_data = audioop.bias(pcm_data, 1, -128)
+        return AudioSegment(data=pcm_data, sample_width=sample_width, frame_rate=sample_rate, channels=channels)
+
+    if audio_format == 3 and bits == 32 and miniaudio is not None:
+        # 32 位浮点由 miniaudio（dr_wav）转为 16 位整数；未安装时返回 None，由 pydub 解码
+        try:
+            return _from_miniaudio(miniaudio.decode(data, output_format=miniaudio.SampleFormat.SIGNED16))
+        except miniaudio.DecodeError as e:
+            logger.warning(f"miniaudio 解码浮点 WAV 失败: {str(e)}")
+
+    return None
+
+
+_codec_backend = None
+
+
+def get_codec_backend():
+    """
+    获取当前配置的编解码后端（每个进程一个实例）
+    """
+    global _codec_backend
+    if _codec_backend is None:
+        fallback = PydubCodecBackend()
+        if AUDIO_CODEC_CONFIG["backend"] == "native":
+            _codec_backend = NativeCodecBackend(fallback, AUDIO_CODEC_CONFIG["mp3_bitrate_kbps"])
+            logger.info(f"编解码后端: native（MP3 解码: {'miniaudio' if miniaudio else 'pydub'}，"
+                        f"MP3 编码: {'lameenc' if lameenc else 'pydub'}）")
+            missing = [name for name, module in (("miniaudio", miniaudio), ("lameenc", lameenc)) if module is None]
+            if missing:
+                logger.warning(f"编解码后端 native 缺少依赖 {'、'.join(missing)}（见 requirements.txt），"
+                               f"相应的 MP3 解码/编码降级为每次启动一个 ffmpeg 子进程")
+        else:
+            _codec_backend = fallback
+            logger.info("编解码后端: pydub")
+    return _codec_backend
+
+
+@lru_cache(maxsize=8)
+def load_bgm(path: str) -> AudioSegment:
+    """
+    加载 BGM（按路径缓存，同一进程内只解码一次）
+    """
+    logger.info(f"加载 BGM: {path}")
+    return get_codec_backend().decode_file(path)
+
+
+# ========== 时长探测 ==========
+# 只读取容器头 / 帧头计算时长，不解码音频数据
+
+_MP3_BITRATES = {
+    (3, 3): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],  # MPEG1 Layer I
+    (3, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],  # MPEG1 Layer II
+    (3, 1): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],  # MPEG1 Layer III
+    (2, 3): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],  # MPEG2/2.5 Layer I
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],  # MPEG2/2.5 Layer II
+    (2, 1): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]  # MPEG2/2.5 Layer III
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def probe_audio_duration(path: str):
+    """
+    读取文件头探测音频时长（WAV / FLAC / MP3 / OGG / M4A）
+
+    Returns:
+        时长（秒）；格式无法识别或文件头不完整时返回 None
+    """
+    try:
+        file_size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            head = f.read(12)
+            f.seek(0)
+            if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+                return _probe_wav(f, file_size)
+            if head[:4] == b'fLaC':
+                return _probe_flac(f)
+            if head[:4] == b'OggS':
+                return _probe_ogg(f, file_size)
+            if head[4:8] == b'ftyp':
+                return _probe_mp4(f, file_size)
+            return _probe_mp3(f.read())
+    except Exception as e:
+        logger.warning(f"探测音频时长失败: {str(e)}")
+        return None
+
+
+def _probe_wav(f, file_size: int):
+    f.seek(12)
+    byte_rate = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        chunk_id, chunk_size = header[:4], struct.unpack('<I', header[4:])[0]
+        if chunk_id == b'fmt ':
+            byte_rate = struct.unpack('<HHII', f.read(12))[3]
+            f.seek(chunk_size - 12 + (chunk_size & 1), os.SEEK_CUR)
+        elif chunk_id == b'data':
+            if not byte_rate:
+                return None
+            # 录音过程中写出的 WAV 可能没有回填 data 大小
+            available = file_size - f.tell()
+            if chunk_size == 0 or chunk_size > available:
+                chunk_size = available
+            return chunk_size / byte_rate
+        else:
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+def _probe_flac(f):
+    f.seek(4)
+    block_header = f.read(4)
+    if len(block_header) < 4 or block_header[0] & 0x7F != 0:
+        return None
+    streaminfo = f.read(34)
+    if len(streaminfo) < 34:
+        return None
+    # 采样率 20 位 | 声道数 3 位 | 位深 5 位 | 总采样数 36 位
+    packed = int.from_bytes(streaminfo[10:18], 'big')
+    sample_rate = packed >> 44
+    total_samples = packed & ((1 << 36) - 1)
+    if not sample_rate or not total_samples:
+        return None
+    return total_samples / sample_rate
+
+
+def _probe_ogg(f, file_size: int):
+    head = f.read(4096)
+    index = head.find(b'\x01vorbis')
+    if index >= 0 and len(head) >= index + 16:
+        sample_rate = struct.unpack('<I', head[index + 12:index + 16])[0]
+        pre_skip = 0
+    else:
+        index = head.find(b'OpusHead')
+        if index < 0 or len(head) < index + 12:
+            return None
+        # Opus 的 granule position 固定按 48kHz 计数
+        sample_rate = 48000
+        pre_skip = struct.unpack('<H', head[index + 10:index + 12])[0]
+
+    # 最后一页的 granule position 即总采样数
+    tail_size = min(file_size, 65536)
+    f.seek(file_size - tail_size)
+    tail = f.read(tail_size)
+    index = tail.rfind(b'OggS')
+    if index < 0 or len(tail) < index + 14 or not sample_rate:
+        return None
+    granule = struct.unpack('<q', tail[index + 6:index + 14])[0]
+    if granule <= 0:
+        return None
+    return max(0, granule - pre_skip) / sample_rate
+
+
+def _probe_mp4(f, file_size: int):
+    moov = _find_mp4_box(f, 0, file_size, b'moov')
+    if moov is None:
+        return None
+    mvhd = _find_mp4_box(f, moov[0], moov[1], b'mvhd')
+    if mvhd is None:
+        return None
+    f.seek(mvhd[0])
+    version = f.read(4)[0]
+    if version == 1:
+        timescale, duration = struct.unpack('>IQ', f.read(28)[16:28])
+    else:
+        timescale, duration = struct.unpack('>II', f.read(16)[8:16])
+    if not timescale:
+        return None
+    return duration / timescale
+
+
+def _find_mp4_box(f, start: int, end: int, box_type: bytes):
+    """在 [start, end) 范围内查找 box，返回 (内容起始, 内容结束)"""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        size, current_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return None
+        if current_type == box_type:
+            return offset + header_size, offset + size
+        offset += size
+    return None
+
+
+def _probe_mp3(data: bytes):
+    offset = 0
+    # 跳过 ID3v2 标签
+    if data[:3] == b'ID3' and len(data) >= 10:
+        tag_size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        offset = 10 + tag_size + (10 if data[5] & 0x10 else 0)
+
+    end = len(data)
+    if end >= 128 and data[end - 128:end - 125] == b'TAG':
+        end -= 128
+
+    # 逐帧读取帧头累计采样数（VBR 文件同样准确）
+    total_samples = 0
+    sample_rate = None
+    frames = 0
+    sync_limit = offset + 65536  # 开头 64KB 内找不到帧同步则认为不是 MP3
+    while offset + 4 <= end:
+        frame = _parse_mp3_frame_header(data[offset:offset + 4])
+        if frame is None:
+            if frames or offset >= sync_limit:
+                # 已同步后遇到非帧数据，视为结束
+                break
+            offset += 1
+            continue
+        frame_length, frame_samples, frame_rate = frame
+        if frames == 0:
+            # 随机数据中可能出现伪帧头，要求紧接着还有一个合法帧头
+            next_offset = offset + frame_length
+            if next_offset + 4 <= end and _parse_mp3_frame_header(data[next_offset:next_offset + 4]) is None:
+                offset += 1
+                continue
+            # 首帧为 Xing/Info/VBRI 头时直接读取总帧数
+            total_frames = _read_mp3_vbr_frames(data, offset)
+            if total_frames:
+                return total_frames * frame_samples / frame_rate
+        total_samples += frame_samples
+        sample_rate = frame_rate
+        frames += 1
+        offset += frame_length
+
+    if not frames or not sample_rate:
+        return None
+    return total_samples / sample_rate
+
+
+def _parse_mp3_frame_header(header: bytes):
+    """解析 MPEG 音频帧头，返回 (帧长度, 每帧采样数, 采样率)"""
+    if header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03  # 0: MPEG2.5, 2: MPEG2, 3: MPEG1
+    layer = (header[1] >> 1) & 0x03  # 1: Layer III, 2: Layer II, 3: Layer I
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    bitrate = _MP3_BITRATES[(3 if version == 3 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][sample_rate_index]
+    if layer == 3:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    if layer == 1 and version != 3:
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+
+
+def _read_mp3_vbr_frames(data: bytes, offset: int):
+    """读取首帧中 Xing/Info 或 VBRI 头记录的总帧数"""
+    version = (data[offset + 1] >> 3) & 0x03
+    mono = (data[offset + 3] >> 6) == 3
+    if version == 3:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+
+    xing = offset + 4 + side_info
+    if data[xing:xing + 4] in (b'Xing', b'Info') and len(data) >= xing + 12:
+        flags = struct.unpack('>I', data[xing + 4:xing + 8])[0]
+        if flags & 0x01:
+            return struct.unpack('>I', data[xing + 8:xing + 12])[0]
+
+    vbri = offset + 36
+    if data[vbri:vbri + 4] == b'VBRI' and len(data) >= vbri + 18:
+        return struct.unpack('>I', data[vbri + 14:vbri + 18])[0]
+    return None
+
+
 def concatenate_audio_files(audio_files, output_path, fade_out_duration=1000):
     """
     拼接多个音频文件
@@ -64,8 +506,11 @@ def adjust_audio_volume(audio_file, output_path, volume_change_db=0):
 
 def get_audio_duration(audio_file):
     """
-    获取音频时长（秒）
+    获取音频时长（秒），优先读取文件头，无法识别时完整解码
     """
+    duration = probe_audio_duration(audio_file)
+    if duration is not None:
+        return duration
     audio = AudioSegment.from_file(audio_file)
     return len(audio) / 1000.0
 
@@ -133,32 +578,9 @@ def hex_to_audio_segment(audio_hex: str) -> AudioSegment:
             logger.warning("跳过空音频数据（0 字节）")
             return None
 
-        # 创建临时文件（delete=False，稍后手动删除以便调试）
-        tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
-        try:
-            tmp_file.write(audio_bytes)
-            tmp_file.flush()
-            tmp_file.close()  # 关闭文件以便 ffmpeg 可以正常读取
-
-            logger.info(f"临时 MP3 文件已创建: {tmp_file.name}")
-
-            # 从临时文件加载
-            audio_segment = AudioSegment.from_file(tmp_file.name, format="mp3")
-
-            # 强制加载完整数据到内存
-            raw_data = audio_segment.raw_data
-            logger.info(f"音频数据加载成功，时长: {len(audio_segment)}ms")
-
-            return audio_segment
-
-        finally:
-            # 清理临时文件
-            try:
-                if os.path.exists(tmp_file.name):
-                    os.unlink(tmp_file.name)
-                    logger.debug(f"临时文件已删除: {tmp_file.name}")
-            except Exception as cleanup_error:
-                logger.warning(f"删除临时文件失败: {cleanup_error}")
+        audio_segment = get_codec_backend().decode(audio_bytes, "mp3")
+        logger.info(f"音频数据加载成功，时长: {len(audio_segment)}ms")
+        return audio_segment
 
     except Exception as e:
         logger.error(f"hex_to_audio_segment 失败: {str(e)}")
@@ -192,7 +614,7 @@ def combine_audio_chunks(audio_hex_list: list, output_path: str) -> str:
             logger.error(f"合并第 {i + 1} 个 chunk 失败: {str(e)}")
 
     # 导出
-    combined.export(output_path, format="mp3")
+    get_codec_backend().encode(combined, output_path, "mp3")
     logger.info(f"成功合并音频，输出: {output_path}")
 
     return output_path
@@ -200,8 +622,9 @@ def combine_audio_chunks(audio_hex_list: list, output_path: str) -> str:
 
 def create_podcast_with_bgm(bgm01_path: str, bgm02_path: str,
                             welcome_audio_hex: str,
-                            dialogue_audio_chunks: list,
-                            output_path: str) -> str:
+                            output_path: str,
+                            dialogue_audio_chunks: list = None,
+                            dialogue_audio_files: list = None) -> str:
     """
     创建完整的播客音频（BGM + 欢迎语 + 对话内容 + BGM）
 
@@ -209,8 +632,9 @@ def create_podcast_with_bgm(bgm01_path: str, bgm02_path: str,
         bgm01_path: BGM01 文件路径
         bgm02_path: BGM02 文件路径
         welcome_audio_hex: 欢迎语音频（十六进制）
-        dialogue_audio_chunks: 对话音频 chunk 列表（十六进制）
         output_path: 输出文件路径
+        dialogue_audio_chunks: 对话音频 chunk 列表（十六进制）
+        dialogue_audio_files: 对话音频文件路径列表（MP3，排在 chunk 之后；生成时句子音频暂存在磁盘上），整数项表示插入的静音毫秒数
 
     Returns:
         输出文件路径
@@ -218,8 +642,8 @@ def create_podcast_with_bgm(bgm01_path: str, bgm02_path: str,
     logger.info("开始创建完整播客...")
 
     # 加载 BGM
-    bgm01 = AudioSegment.from_file(bgm01_path)
-    bgm02 = AudioSegment.from_file(bgm02_path).fade_out(1000)  # BGM02 淡出 1 秒
+    bgm01 = load_bgm(bgm01_path)
+    bgm02 = load_bgm(bgm02_path).fade_out(1000)  # BGM02 淡出 1 秒
 
     # 转换欢迎语音频
     welcome_audio = hex_to_audio_segment(welcome_audio_hex)
@@ -229,13 +653,22 @@ def create_podcast_with_bgm(bgm01_path: str, bgm02_path: str,
 
     # 合并对话内容
     dialogue_audio = AudioSegment.empty()
-    for chunk_hex in dialogue_audio_chunks:
+    for chunk_hex in dialogue_audio_chunks or []:
         try:
             chunk = hex_to_audio_segment(chunk_hex)
             if chunk is not None:  # 跳过空音频
                 dialogue_audio += chunk
         except Exception as e:
             logger.error(f"合并对话 chunk 失败: {str(e)}")
+    for path in dialogue_audio_files or []:
+        if isinstance(path, int):
+            dialogue_audio += AudioSegment.silent(duration=path)
+            continue
+        try:
+            if os.path.getsize(path) > 0:
+                dialogue_audio += get_codec_backend().decode_file(path)
+        except Exception as e:
+            logger.error(f"合并对话音频文件失败: {str(e)}")
 
     # 对欢迎语和对话内容进行 normalize（保证句子间相对音量一致）
     if len(welcome_audio) > 0:
@@ -257,12 +690,50 @@ def create_podcast_with_bgm(bgm01_path: str, bgm02_path: str,
         logger.info(f"最终播客音量已调整到目标 -18 dB，实际: {podcast.dBFS:.2f} dBFS")
 
     # 导出
-    podcast.export(output_path, format="mp3")
+    get_codec_backend().encode(podcast, output_path, "mp3")
     logger.info(f"播客创建完成: {output_path}")
 
     return output_path
 
 
+def prepare_clone_upload(audio: AudioSegment, source_path: str, output_path: str,
+                         min_seconds: float, max_seconds: float, sample_rate: int,
+                         bitrate_kbps: int, silence_threshold_dbfs: float) -> str:
+    """
+    生成音色克隆用的精简音频：去掉首尾静音，截取有效片段，转为单声道低码率 MP3
+
+    Args:
+        audio: 已解码的参考音频
+        source_path: 原始文件路径
+        output_path: 精简音频输出路径
+        min_seconds: 裁剪后至少保留的时长（不足时不去静音）
+        max_seconds: 最长保留时长
+
+    Returns:
+        应上传的文件路径（精简后未变小时返回原始文件路径）
+    """
+    start = detect_leading_silence(audio, silence_threshold=silence_threshold_dbfs)
+    end = len(audio) - detect_leading_silence(audio.reverse(), silence_threshold=silence_threshold_dbfs)
+    if end - start >= min_seconds * 1000:
+        trimmed = audio[start:end]
+    else:
+        trimmed = audio
+    trimmed = trimmed[:int(max_seconds * 1000)]
+
+    compact = trimmed.set_channels(1).set_frame_rate(sample_rate)
+    get_codec_backend().encode(compact, output_path, "mp3", bitrate_kbps=bitrate_kbps)
+
+    source_size = os.path.getsize(source_path)
+    compact_size = os.path.getsize(output_path)
+    if compact_size >= source_size:
+        os.remove(output_path)
+        logger.info(f"精简音频未变小（{compact_size} >= {source_size} 字节），上传原文件")
+        return source_path
+
+    logger.info(f"克隆上传音频已精简: {len(audio)}ms → {len(compact)}ms，{source_size} → {compact_size} 字节")
+    return output_path
+
+
 def save_audio_chunk_to_file(audio_hex: str, output_path: str) -> str:
     """
     将单个音频 chunk 保存为文件
@@ -312,10 +783,311 @@ def save_sentence_audio(audio_hex_list: list, output_path: str) -> str:
         return None
 
     # 导出为 MP3
-    combined.export(output_path, format="mp3")
+    get_codec_backend().encode(combined, output_path, "mp3")
     logger.info(f"句子音频已保存: {output_path}, 时长: {len(combined)}ms")
 
     return output_path
 
 
+# ========== 进程池：编解码与音量处理 ==========
+# MP3 导出、解码和 normalize 都是 CPU 密集型操作，在请求线程中执行会持有 GIL，
+# 拖慢同一进程内其他会话的 SSE 事件推送。以下接口将这些操作提交到独立进程执行，
+# 调用方拿到 Future 后等待结果（等待期间不持有 GIL）。
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_audio_process_pool():
+    """
+    获取音频处理进程池（懒加载）
+
+    Returns:
+        ProcessPoolExecutor；配置关闭时返回 None
+    """
+    global _process_pool
+    if not AUDIO_PROCESS_POOL_CONFIG["enabled"]:
+        return None
+
+    with _process_pool_lock:
+        if _process_pool is None:
+            context = multiprocessing.get_context(AUDIO_PROCESS_POOL_CONFIG["start_method"])
+            _process_pool = ProcessPoolExecutor(
+                max_workers=AUDIO_PROCESS_POOL_CONFIG["max_workers"],
+                mp_context=context
+            )
+            logger.info(f"音频处理进程池已启动，进程数: {AUDIO_PROCESS_POOL_CONFIG['max_workers']}")
+        return _process_pool
+
+
+def _reset_audio_process_pool():
+    """进程池异常（子进程崩溃）后丢弃，下次使用时重建"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+
+def _segment_to_shared_memory(segment: AudioSegment) -> dict:
+    """将 AudioSegment 的 PCM 数据写入共享内存，返回描述信息"""
+    raw_data = segment.raw_data
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(raw_data)))
+    shm.buf[:len(raw_data)] = raw_data
+    descriptor = {
+        "name": shm.name,
+        "size": len(raw_data),
+        "frame_rate": segment.frame_rate,
+        "channels": segment.channels,
+        "sample_width": segment.sample_width
+    }
+    shm.close()
+    return descriptor
+
+
+def _segment_from_shared_memory(descriptor: dict, unlink: bool) -> AudioSegment:
+    """从共享内存重建 AudioSegment（数据会复制出来，之后可安全释放共享内存）"""
+    shm = shared_memory.SharedMemory(name=descriptor["name"])
+    try:
+        raw_data = bytes(shm.buf[:descriptor["size"]])
+    finally:
+        shm.close()
+        if unlink:
+            shm.unlink()
+        else:
+            # 仅读取方：避免 resource_tracker 在子进程退出时误删父进程的共享内存
+            resource_tracker.unregister(shm._name, "shared_memory")
+
+    return AudioSegment(
+        data=raw_data,
+        sample_width=descriptor["sample_width"],
+        frame_rate=descriptor["frame_rate"],
+        channels=descriptor["channels"]
+    )
+
+
+def _release_shared_memory(descriptor: dict):
+    """释放调用方创建的共享内存"""
+    try:
+        shm = shared_memory.SharedMemory(name=descriptor["name"])
+        shm.close()
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def decode_normalized_audio(audio_hex_list: list, target_dBFS: float = None) -> AudioSegment:
+    """
+    解码一组十六进制音频 chunk，拼接后 normalize 并调整到目标音量
+
+    Args:
+        audio_hex_list: 十六进制音频数据列表
+        target_dBFS: 目标音量，None 表示只做 normalize
+
+    Returns:
+        AudioSegment 对象（可能为空音频）
+    """
+    combined = AudioSegment.empty()
+    for chunk_hex in audio_hex_list:
+        chunk = hex_to_audio_segment(chunk_hex)
+        if chunk is not None:
+            combined += chunk
+
+    if len(combined) > 0:
+        combined = normalize(combined)
+        if target_dBFS is not None:
+            combined = combined.apply_gain(target_dBFS - combined.dBFS)
+
+    return combined
+
+
+def _decode_normalized_job(audio_hex_list: list, target_dBFS: float) -> dict:
+    """子进程任务：解码并调整音量，结果通过共享内存返回"""
+    return _segment_to_shared_memory(decode_normalized_audio(audio_hex_list, target_dBFS))
+
+
+def _export_job(descriptor: dict, output_path: str, format: str) -> str:
+    """子进程任务：从共享内存读取 PCM 并导出文件"""
+    segment = _segment_from_shared_memory(descriptor, unlink=False)
+    return get_codec_backend().encode(segment, output_path, format)
+
+
+def _run_inline(fn, *args, **kwargs) -> Future:
+    """在当前线程执行并包装为已完成的 Future（进程池关闭或不可用时的降级路径）"""
+    future = Future()
+    try:
+        future.set_result(fn(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _submit(job, fallback, *args, on_done=None, transform=None):
+    """
+    提交任务到进程池
+
+    Args:
+        job: 子进程中执行的函数
+        fallback: 进程池不可用时在当前线程执行的函数（参数相同）
+        on_done: 任务结束后的清理回调（无论成功失败）
+        transform: 对子进程返回值的转换（在调用方进程执行）
+
+    Returns:
+        Future
+    """
+    pool = get_audio_process_pool()
+    if pool is None:
+        if on_done:
+            on_done()
+        return _run_inline(fallback, *args)
+
+    try:
+        inner = pool.submit(job, *args)
+    except (BrokenProcessPool, RuntimeError) as e:
+        logger.warning(f"音频进程池不可用，降级为当前线程执行: {str(e)}")
+        _reset_audio_process_pool()
+        if on_done:
+            on_done()
+        return _run_inline(fallback, *args)
+
+    outer = Future()
+
+    def _chain(done):
+        try:
+            result = done.result()
+            outer.set_result(transform(result) if transform else result)
+        except BrokenProcessPool as e:
+            _reset_audio_process_pool()
+            outer.set_exception(e)
+        except Exception as e:
+            outer.set_exception(e)
+        finally:
+            if on_done:
+                on_done()
+
+    inner.add_done_callback(_chain)
+    return outer
+
+
+def submit_decode_normalized(audio_hex_list: list, target_dBFS: float = None) -> Future:
+    """
+    提交解码 + 音量处理任务
+
+    Returns:
+        Future[AudioSegment]
+    """
+    return _submit(
+        _decode_normalized_job,
+        decode_normalized_audio,
+        audio_hex_list,
+        target_dBFS,
+        transform=lambda descriptor: _segment_from_shared_memory(descriptor, unlink=True)
+    )
+
+
+def submit_export(segment: AudioSegment, output_path: str, format: str = "mp3") -> Future:
+    """
+    提交音频导出任务（PCM 通过共享内存传给子进程）
+
+    Returns:
+        Future[str]，结果为输出文件路径
+    """
+    if get_audio_process_pool() is None:
+        return _run_inline(_export_segment, segment, output_path, format)
+
+    descriptor = _segment_to_shared_memory(segment)
+    return _submit(
+        _export_job,
+        lambda *_: _export_segment(segment, output_path, format),
+        descriptor,
+        output_path,
+        format,
+        on_done=lambda: _release_shared_memory(descriptor)
+    )
 
+
+def submit_create_podcast_with_bgm(**kwargs) -> Future:
+    """
+    提交完整播客合成任务（参数同 create_podcast_with_bgm）
+
+    Returns:
+        Future[str]，结果为输出文件路径
+    """
+    return _submit(_create_podcast_with_bgm_job, _create_podcast_with_bgm_job, kwargs)
+
+
+def _create_podcast_with_bgm_job(kwargs: dict) -> str:
+    return create_podcast_with_bgm(**kwargs)
+
+
+def _export_segment(segment: AudioSegment, output_path: str, format: str) -> str:
+    return get_codec_backend().encode(segment, output_path, format)
+
+
+# ========== 渐进式音频磁盘缓冲 ==========
+# 渐进式音频随节目增长，整期 PCM 不常驻内存：追加写入会话的缓冲文件，
+# 导出快照时由音频进程池从文件读取已写入的前缀
+
+class PcmSpool:
+    """追加写入的 PCM 缓冲文件（格式取第一段音频，之后的音频转换为相同格式）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.sample_width = None
+        self.frame_rate = None
+        self.channels = None
+        self.nbytes = 0
+        self._file = open(path, 'wb')
+
+    def append(self, segment: AudioSegment) -> None:
+        if len(segment) == 0:
+            return
+        if self.sample_width is None:
+            self.sample_width, self.frame_rate, self.channels = segment.sample_width, segment.frame_rate, segment.channels
+        else:
+            segment = segment.set_frame_rate(self.frame_rate).set_channels(self.channels).set_sample_width(self.sample_width)
+        self._file.write(segment.raw_data)
+        self._file.flush()
+        self.nbytes += len(segment.raw_data)
+
+    @property
+    def duration_ms(self) -> int:
+        if not self.nbytes:
+            return 0
+        return int(self.nbytes / (self.sample_width * self.channels) * 1000 / self.frame_rate)
+
+    def snapshot(self) -> dict:
+        """当前已写入部分的描述（可传给子进程）"""
+        return {
+            "path": self.path,
+            "nbytes": self.nbytes,
+            "sample_width": self.sample_width or 2,
+            "frame_rate": self.frame_rate or 32000,
+            "channels": self.channels or 1,
+            "duration_ms": self.duration_ms
+        }
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_pcm_snapshot(snapshot: dict) -> AudioSegment:
+    """读取缓冲文件中快照对应的前缀"""
+    with open(snapshot["path"], 'rb') as f:
+        data = f.read(snapshot["nbytes"])
+    return AudioSegment(data=data, sample_width=snapshot["sample_width"],
+                        frame_rate=snapshot["frame_rate"], channels=snapshot["channels"])
+
+
+def _export_pcm_snapshot(snapshot: dict, output_path: str, format: str) -> str:
+    return get_codec_backend().encode(read_pcm_snapshot(snapshot), output_path, format)
+
+
+def submit_export_pcm_snapshot(snapshot: dict, output_path: str, format: str = "mp3") -> Future:
+    """
+    提交缓冲快照导出任务（子进程直接读取缓冲文件，不经过共享内存）
+
+    Returns:
+        Future[str]，结果为输出文件路径
+    """
+    return _submit(_export_pcm_snapshot, _export_pcm_snapshot, snapshot, output_path, format)
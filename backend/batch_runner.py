@@ -0,0 +1,349 @@
+"""
+批量生成模块
+一次提交多条输入，在所有批量任务共享的有界线程池中生成节目；同一批次复用开场素材（欢迎语 + BGM），
+任务清单记录每条的状态、音频/脚本/封面地址和耗时，以及整体吞吐（期/小时）
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from config import BATCH_CONFIG, DEFAULT_VOICES, URL_FETCH_CONFIG, LONG_INPUT_CONFIG, LONG_FORM_CONFIG, SCRIPT_INPUT_CONFIG
+from content_parser import content_parser
+from voice_manager import voice_manager
+from podcast_generator import podcast_generator
+from admission_controller import admission_controller
+from stage_graph import StageGraph, StageError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class BatchRunner:
+    """批量任务调度：共享工作线程池 + 任务清单"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.directory = config["dir"]
+        self.max_items = config["max_items"]
+        self.max_jobs = config["max_jobs"]
+        self.max_queued_items = config["max_queued_items"]
+        self.max_workers = config["max_workers"]
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="batch")
+        self._lock = threading.Lock()
+        self._jobs = {}  # job_id → 任务清单（按提交顺序）
+        os.makedirs(self.directory, exist_ok=True)
+
+    def submit(self, items: List[Dict[str, Any]], api_key: str) -> Dict[str, Any]:
+        """
+        提交批量任务，条目按顺序进入共享线程池
+
+        Args:
+            items: [{"text_input": 文本, "urls": [网址], "script_input": "SpeakerN: 文本" 格式的脚本,
+                     "long_input": bool, "target_minutes": 长节目时长（分钟，可选）,
+                     "speaker1_voice_name" / "speaker2_voice_name": 默认音色名（"mini" / "max"）,
+                     "speaker1_voice_id" / "speaker2_voice_id": 已克隆的音色 ID（优先于默认音色名）}]
+            api_key: 本批次所有节目使用的 API Key
+
+        Returns:
+            {"success": bool, "job": 任务清单, "error": 错误信息, "error_code": 排队条目已满时为 "queue_full"}
+        """
+        if not items:
+            return {"success": False, "error": "items 不能为空"}
+        if len(items) > self.max_items:
+            return {"success": False, "error": f"单个批量任务最多 {self.max_items} 条"}
+
+        specs = []
+        for index, item in enumerate(items):
+            spec = self._parse_item(item)
+            if isinstance(spec, str):
+                return {"success": False, "error": f"第 {index + 1} 条: {spec}"}
+            specs.append(spec)
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "items": [{
+                "index": index,
+                "status": "queued",
+                "input": {
+                    "text_chars": len(spec["text_input"]),
+                    "urls": spec["urls"],
+                    "script_input": bool(spec["script_input"]),
+                    "long_input": spec["long_input"],
+                    "long_form_minutes": spec["long_form_minutes"],
+                    "voices": [spec["speaker1"].get("voice_id") or spec["speaker1"]["voice_name"],
+                               spec["speaker2"].get("voice_id") or spec["speaker2"]["voice_name"]]
+                },
+                "session_id": None,
+                "audio_url": "",
+                "script_url": "",
+                "cover_url": "",
+                "cover_local_url": "",
+                "cover_variants": {},
+                "episode_id": "",
+                "cached": False,
+                "error": None,
+                "timings": {}
+            } for index, spec in enumerate(specs)]
+        }
+        with self._lock:
+            queued = sum(1 for entry in self._jobs.values() for item in entry["items"] if item["status"] == "queued")
+            if queued + len(specs) > self.max_queued_items:
+                logger.warning(f"批量排队条目已满（{queued}/{self.max_queued_items}），拒绝任务")
+                return {"success": False, "error": f"批量任务排队条目已达上限（{self.max_queued_items} 条），请稍后重试",
+                        "error_code": "queue_full"}
+            self._jobs[job_id] = job
+            self._prune()
+        self._save(job)
+
+        # 开场素材与内容无关，同一批次第一期合成后其余各期直接复用
+        intro_assets = {}
+        for index, spec in enumerate(specs):
+            self._pool.submit(self._run_item, job, index, spec, api_key, intro_assets)
+        logger.info(f"📦 [批量] 已提交任务 {job_id}，共 {len(specs)} 条")
+        return {"success": True, "job": self.get_job(job_id)}
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """任务清单（含汇总和吞吐）；内存中没有时读取磁盘上的清单，不存在时返回 None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job = json.loads(json.dumps(job))
+        if job is None:
+            job = self._load(job_id)
+            if job is None:
+                return None
+        job["summary"] = self._summary(job)
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        """获取批量任务统计"""
+        with self._lock:
+            item_statuses = [item["status"] for job in self._jobs.values() for item in job["items"]]
+            jobs = len(self._jobs)
+        return {
+            "max_workers": self.max_workers,
+            "jobs": jobs,
+            "running": item_statuses.count("running"),
+            "queued": item_statuses.count("queued"),
+            "done": item_statuses.count("done"),
+            "failed": item_statuses.count("failed")
+        }
+
+    def _parse_item(self, item: Any):
+        """校验并规范化一条输入，错误时返回错误信息"""
+        if not isinstance(item, dict):
+            return "格式错误"
+        text_input = str(item.get("text_input") or "").strip()
+        script_input = str(item.get("script_input") or "").strip()[:SCRIPT_INPUT_CONFIG["max_chars"]]
+        urls = item.get("urls") or ([item["url"]] if item.get("url") else [])
+        if isinstance(urls, str) or not isinstance(urls, list):
+            return "urls 必须是网址列表"
+        urls = list(dict.fromkeys(str(url).strip() for url in urls if str(url).strip()))[:URL_FETCH_CONFIG["max_urls"]]
+        if not (text_input or script_input or urls):
+            return "请至少提供一种输入内容（文本/网址/脚本）"
+
+        # 每条可指定已克隆的音色 ID，否则使用默认音色（批量接口不接收参考音频上传）
+        speaker_configs = []
+        for speaker, default in (("speaker1", "mini"), ("speaker2", "max")):
+            voice_id = str(item.get(f"{speaker}_voice_id") or "").strip()
+            if voice_id:
+                validation = voice_manager.validate_voice_id(voice_id)
+                if not validation["valid"]:
+                    return f"{speaker}_voice_id 校验失败: {', '.join(validation['errors'])}"
+                speaker_configs.append({"type": "custom_id", "voice_id": voice_id})
+                continue
+            voice_name = item.get(f"{speaker}_voice_name") or default
+            if voice_name not in DEFAULT_VOICES:
+                return f"{speaker}_voice_name 必须是 {'/'.join(DEFAULT_VOICES)} 之一"
+            speaker_configs.append({"type": "default", "voice_name": voice_name})
+
+        long_form_minutes = None
+        if item.get("target_minutes") and not script_input:
+            try:
+                long_form_minutes = int(item["target_minutes"])
+            except (TypeError, ValueError):
+                return "target_minutes 必须是整数"
+            long_form_minutes = min(max(long_form_minutes, LONG_FORM_CONFIG["min_minutes"]), LONG_FORM_CONFIG["max_minutes"])
+
+        return {
+            "text_input": text_input,
+            "script_input": script_input,
+            "urls": [] if script_input else urls,
+            "long_input": bool(item.get("long_input")) and not script_input,
+            "long_form_minutes": long_form_minutes,
+            "speaker1": speaker_configs[0],
+            "speaker2": speaker_configs[1]
+        }
+
+    def _run_item(self, job: Dict[str, Any], index: int, spec: Dict[str, Any], api_key: str,
+                  intro_assets: Dict[str, Any]) -> None:
+        """在工作线程中等待准入（与网页请求共用并发名额）后生成一期节目"""
+        ticket = admission_controller.enqueue()
+        try:
+            admission_controller.wait(ticket)
+            self._generate_item(job, index, spec, api_key, intro_assets)
+        finally:
+            admission_controller.release(ticket)
+
+    def _generate_item(self, job: Dict[str, Any], index: int, spec: Dict[str, Any], api_key: str,
+                       intro_assets: Dict[str, Any]) -> None:
+        """生成一期节目，并把结果写入任务清单"""
+        session_id = str(uuid.uuid4())
+        started_at = time.time()
+        with self._lock:
+            item = job["items"][index]
+            item.update(status="running", session_id=session_id)
+            item["timings"]["queued_ms"] = int((started_at - job["created_at"]) * 1000)
+            if job["started_at"] is None:
+                job.update(status="running", started_at=started_at)
+        self._save(job)
+        logger.info(f"📦 [批量] 任务 {job['job_id'][:8]} 第 {index + 1} 条开始生成，Session ID: {session_id}")
+
+        complete = None
+        cover = None
+        error = None
+        try:
+            graph = self._build_graph(session_id, spec, api_key)
+            for event in podcast_generator.generate_podcast_graph(
+                    graph, session_id, api_key,
+                    long_input=spec["long_input"],
+                    long_form_minutes=spec["long_form_minutes"],
+                    script_input=bool(spec["script_input"]),
+                    intro_assets=intro_assets):
+                if event["type"] == "complete":
+                    complete = event
+                elif event["type"] == "cover_image":
+                    cover = event
+                elif event["type"] == "error":
+                    error = event.get("message")
+        except Exception as e:
+            logger.error(f"批量生成第 {index + 1} 条失败: {str(e)}")
+            logger.exception("详细错误:")
+            error = str(e)
+
+        finished_at = time.time()
+        with self._lock:
+            if complete:
+                item.update(
+                    status="done",
+                    audio_url=complete["audio_url"],
+                    script_url=complete["script_url"],
+                    cover_url=(cover or {}).get("image_url") or complete.get("cover_url", ""),
+                    cover_local_url=(cover or {}).get("local_url") or complete.get("cover_local_url", ""),
+                    cover_variants=(cover or {}).get("variants", {}),
+                    episode_id=complete.get("episode_id", ""),
+                    cached=complete.get("cached", False)
+                )
+                item["timings"]["stages"] = complete.get("stage_timings", [])
+            else:
+                item.update(status="failed", error=error or "生成未完成")
+            item["timings"]["elapsed_ms"] = int((finished_at - started_at) * 1000)
+            if all(entry["status"] in ("done", "failed") for entry in job["items"]):
+                job.update(status="done", finished_at=finished_at)
+        self._save(job)
+        logger.info(f"📦 [批量] 任务 {job['job_id'][:8]} 第 {index + 1} 条{'完成' if complete else '失败'}，"
+                    f"耗时 {finished_at - started_at:.1f} 秒")
+
+    def _build_graph(self, session_id: str, spec: Dict[str, Any], api_key: str) -> StageGraph:
+        """构建一期节目的输入阶段：content（网址并发解析后合并）与 voices"""
+        graph = StageGraph(session_id)
+        source_max_chars = LONG_INPUT_CONFIG["max_source_chars"] if spec["long_input"] else None
+
+        def make_parse_url_stage(url):
+            def parse_url_stage(emit, results):
+                url_result = content_parser.parse_url(url, max_chars=source_max_chars)
+                if not url_result["success"]:
+                    logger.warning(f"批量生成网址解析失败: {url}（{url_result['error']}）")
+                    return ""
+                return url_result["content"]
+            return parse_url_stage
+
+        def content_stage(emit, results):
+            if spec["script_input"]:
+                return spec["script_input"]
+            merged_content = content_parser.merge_contents(
+                spec["text_input"],
+                [results[f"parse_url_{index}"] for index in range(len(spec["urls"]))]
+            )
+            if not merged_content or merged_content == "没有可用的内容":
+                raise StageError("没有可用的输入内容（网址解析均失败）")
+            return merged_content
+
+        def voices_stage(emit, results):
+            voices_result = voice_manager.prepare_voices(spec["speaker1"], spec["speaker2"], api_key=api_key)
+            if not voices_result["success"]:
+                raise StageError(voices_result["error"])
+            return {"speaker1": voices_result["speaker1"], "speaker2": voices_result["speaker2"]}
+
+        source_stages = []
+        for index, url in enumerate(spec["urls"]):
+            graph.add_stage(f"parse_url_{index}", make_parse_url_stage(url), critical=False)
+            source_stages.append(f"parse_url_{index}")
+        graph.add_stage("content", content_stage, deps=source_stages)
+        graph.add_stage("voices", voices_stage)
+        return graph
+
+    def _summary(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """条目计数和吞吐：已完成期数 ÷ 从第一条开始到最后一条结束（或当前）的时长"""
+        statuses = [item["status"] for item in job["items"]]
+        done = statuses.count("done")
+        wall_seconds = None
+        episodes_per_hour = None
+        if job["started_at"]:
+            wall_seconds = (job["finished_at"] or time.time()) - job["started_at"]
+            if done and wall_seconds > 0:
+                episodes_per_hour = round(done * 3600 / wall_seconds, 1)
+        return {
+            "total": len(statuses),
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "done": done,
+            "failed": statuses.count("failed"),
+            "wall_seconds": round(wall_seconds, 1) if wall_seconds is not None else None,
+            "episodes_per_hour": episodes_per_hour
+        }
+
+    def _save(self, job: Dict[str, Any]) -> None:
+        """写入任务清单（临时文件后原子替换）"""
+        with self._lock:
+            data = dict(job, summary=self._summary(job))
+            payload = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".batch_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, os.path.join(self.directory, f"{job['job_id']}.json"))
+        except Exception as e:
+            # 清单写入失败不影响生成，内存中的清单仍可查询
+            logger.warning(f"保存批量任务清单失败: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{job_id}.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _prune(self) -> None:
+        """内存中只保留最近的 max_jobs 个任务，优先丢弃最早结束的（调用方持有锁）"""
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] == "done"]
+        while len(self._jobs) > self.max_jobs and finished:
+            del self._jobs[finished.pop(0)]
+
+
+# 单例实例
+batch_runner = BatchRunner(BATCH_CONFIG)
@@ -52,6 +52,12 @@ MINIMAX_API_ENDPOINTS = {
     "image_generation": "https://api.minimaxi.com/v1/image_generation"
 }
 
+# API 连接池（TTS 并发上限见 TTS_SCHEDULER_CONFIG，连接数不低于它）
+MINIMAX_HTTP_CONFIG = {
+    "pool_connections": 4,  # 缓存连接池的主机数
+    "pool_maxsize": 16  # 每个主机保持的连接数
+}
+
 # ========== 模型配置 ==========
 MODELS = {
     "text": "MiniMax-M2-Preview",
@@ -68,6 +74,85 @@ PODCAST_CONFIG = {
     "speakers": ["Speaker1", "Speaker2"]
 }
 
+# ========== 脚本 Prompt 精简配置 ==========
+# 解析内容送入脚本模型前：压缩空白、去除样板文字和近似重复行，再按 token 预算截断
+PROMPT_REDUCTION_CONFIG = {
+    "enabled": True,
+    "token_budget": 6000,  # 材料内容的 token 上限（估算值）
+    "cjk_tokens_per_char": 0.7,  # 中日韩字符的 token 估算系数
+    "chars_per_token": 4,  # 其他字符（英文、数字、标点）每个 token 约对应的字符数
+    "boilerplate_max_chars": 16  # 只对抓取正文中的短行做整行导航文字匹配，避免误删正文
+}
+
+# ========== 长文档模式配置 ==========
+# 网页/PDF 按更高的字符上限解析，切分后并行调用文本模型摘要，合并摘要作为脚本材料
+LONG_INPUT_CONFIG = {
+    "max_source_chars": 200000,  # 长文档模式下单个来源的解析字符上限
+    "chunk_chars": 8000,  # 每段最少字符数（按段落边界切分）
+    "max_chunks": 16,  # 段数上限：内容更长时加大每段字符数，使全部摘要在一轮并发内完成
+    "max_chunk_chars": 24000,  # 每段字符数上限（超出时段数可能多于 max_chunks）
+    "max_parallel": 16,  # 同时进行的摘要请求数
+    "summary_chars": 800,  # 每段摘要的最大长度
+    "min_summary_chars": 200,  # 段数很多时每段摘要的最小长度
+    "digest_token_budget": 12000  # 合并后摘要材料的 token 预算（替代普通模式的精简预算），各段摘要按段数均分
+}
+
+# ========== 长节目模式配置 ==========
+# 先生成大纲，再并行生成各段脚本，每段独立的 TTS 通道，按顺序拼接到同一条时间线
+# 总耗时取决于单段长度而不是整期长度
+LONG_FORM_CONFIG = {
+    "default_minutes": 30,
+    "min_minutes": 10,
+    "max_minutes": 60,
+    "section_minutes": 5,  # 每段目标时长
+    "max_parallel_sections": 4,  # 同时生成的段数（脚本 + TTS）
+    "section_gap_ms": 600  # 段与段之间的停顿
+}
+
+# ========== 流水线阶段队列配置 ==========
+# 各阶段之间的有界队列：达到 high_water 后生产者阻塞，回落到 low_water 后恢复
+# 脚本生成与按行切分（后处理）在同一线程内完成，因此 sentence 队列即 脚本/后处理 → TTS
+PIPELINE_QUEUE_CONFIG = {
+    "sentence": {"maxsize": 16, "high_water": 12, "low_water": 4},  # 脚本/后处理 → TTS
+    "tts": {"maxsize": 8, "high_water": 6, "low_water": 2},  # TTS → 混音
+    "encode": {"maxsize": 2, "high_water": 2, "low_water": 0},  # 混音 → MP3 编码
+    "section": {"maxsize": 8, "high_water": 6, "low_water": 2}  # 长节目各段已合成的句子 → 按段落顺序拼接
+}
+
+# ========== 准入控制配置 ==========
+ADMISSION_CONFIG = {
+    "max_concurrent_episodes": 4,  # 同时生成的播客数量上限
+    "max_queue_size": 20,  # 排队上限，超出后直接拒绝并提示稍后重试
+    "queued_event_interval": 3,  # 排队期间推送 queued 事件的间隔（秒）
+    "default_episode_seconds": 180,  # 尚无历史数据时估算单集生成耗时（秒）
+    "retry_after_seconds": 60  # 队列已满时建议客户端重试的间隔（秒）
+}
+
+# ========== 跨会话 TTS 调度配置 ==========
+TTS_SCHEDULER_CONFIG = {
+    "max_concurrent_requests": 8,  # 所有会话共享的上游 TTS 并发数
+    "yield_ahead_ms": 30000,  # 已交付音频领先播放位置超过该值的会话让出额度
+    "reserved_urgent_slots": 2,  # 为新会话/缓冲不足会话保留的额度
+    "inflight_estimate_ms": 4000,  # 正在合成的句子按该时长计入缓冲
+    "session_ttl_seconds": 3600  # 未正常注销的会话状态保留时长
+}
+
+# ========== 音频处理进程池配置 ==========
+# MP3 编解码与 normalize 在独立进程中执行，避免持有 GIL 阻塞其他会话的 SSE 推送
+AUDIO_PROCESS_POOL_CONFIG = {
+    "enabled": True,
+    "max_workers": 2,
+    "start_method": "spawn"  # Flask 多线程环境下 fork 不安全
+}
+
+# ========== 编解码后端配置 ==========
+# "native": 进程内编解码（依赖 miniaudio / lameenc，见 requirements.txt），缺少依赖或不支持的操作降级到 pydub
+# "pydub": 每次编解码启动一个 ffmpeg 子进程（原有方式）
+AUDIO_CODEC_CONFIG = {
+    "backend": "native",
+    "mp3_bitrate_kbps": 128
+}
+
 # ========== 超时配置（秒）==========
 TIMEOUTS = {
     "url_parsing": 30,
@@ -76,16 +161,111 @@ TIMEOUTS = {
     "script_generation": 120,
     "tts_per_sentence": 30,
     "cover_prompt_generation": 60,  # 封面 Prompt 生成超时
-    "image_generation": 90  # 图像生成超时（增加到90秒）
+    "chunk_summary": 60,  # 长文档分段摘要超时
+    "outline_generation": 90,  # 长节目大纲生成超时
+    "image_generation": 90,  # 图像生成超时（增加到90秒）
+    "cover_after_complete": 30  # 完成事件发出后最多再等封面的时间，超时不再发送封面
+}
+
+# ========== PDF 解析配置 ==========
+# 按字符预算提取：累计文本超过 max_chars 后不再提取剩余页面
+# 大文档可选多进程并行提取页面区间（按批提交，预算用完即停止）
+PDF_PARSE_CONFIG = {
+    "max_chars": 10000,
+    "parallel": False,
+    "parallel_min_pages": 40,  # 页数达到该值才启用并行
+    "pages_per_task": 8,  # 每个任务提取的页数（也是并行前先顺序提取的页数）
+    "max_workers": 4,
+    "max_files": 5  # 单次生成最多接受的 PDF 数量
+}
+
+# ========== 网页抓取配置 ==========
+# 流式读取网页：超过字节上限或已解析出足够正文后停止下载
+URL_FETCH_CONFIG = {
+    "max_bytes": 3 * 1024 * 1024,  # 单个网页最多读取的字节数（解压后）
+    "chunk_size": 64 * 1024,
+    "max_chars": 10000,  # 提取文本长度上限
+    "early_stop_chars": 30000,  # 已解析的段落文本达到该长度即停止下载
+    "min_main_chars": 200,  # 正文候选区域少于该长度时退回整页文本
+    "max_urls": 5,  # 单次生成最多接受的网址数量
+    "pool_size": 16,  # 共享 Session 的连接池大小
+    "per_host_limit": 2  # 同一主机的最大并发请求数
 }
 
 # ========== 文件路径配置 ==========
 UPLOAD_DIR = os.path.join(BASE_DIR, "backend", "uploads")
 OUTPUT_DIR = os.path.join(BASE_DIR, "backend", "outputs")
+CACHE_DIR = os.path.join(BASE_DIR, "backend", "cache")
+SPOOL_DIR = os.path.join(OUTPUT_DIR, "spool")  # 生成过程中的句子音频和渐进式 PCM，会话结束后删除
 
 # 确保目录存在
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+# ========== 上传限制配置 ==========
+UPLOAD_LIMITS = {
+    "max_request_bytes": 120 * 1024 * 1024,  # 单个请求总大小（按 Content-Length 提前拒绝）
+    "pdf_max_bytes": 50 * 1024 * 1024,
+    "audio_max_bytes": 30 * 1024 * 1024,
+    "other_max_bytes": 10 * 1024 * 1024,
+    "chunk_size": 1024 * 1024  # 分块写入大小
+}
+
+# ========== 克隆音色缓存配置 ==========
+# 同一段参考音频（按解码后的 PCM 计算指纹）+ 同一个 API Key 复用已克隆的 Voice ID
+# MiniMax 克隆音色在 7 天内未被使用会被删除，缓存有效期需短于该时间
+VOICE_CLONE_CACHE_CONFIG = {
+    "enabled": True,
+    "path": os.path.join(CACHE_DIR, "voice_clone_cache.json"),
+    "ttl_seconds": 6 * 24 * 3600,
+    # TTS 返回这些状态码时视为克隆音色已失效（服务端已删除）：移除缓存并用原参考音频重新克隆
+    "invalid_voice_status_codes": [2054],
+    "max_tracked_sources": 256  # 记住最近克隆音色对应的参考音频，用于重新克隆
+}
+
+# ========== 解析内容缓存配置 ==========
+# PDF 按上传文件 sha256、网址按规范化 URL 缓存提取后的文本
+# 网址缓存超过 url_fresh_seconds 后用 ETag / Last-Modified 条件请求重新验证
+CONTENT_CACHE_CONFIG = {
+    "enabled": True,
+    "dir": os.path.join(CACHE_DIR, "content"),
+    "max_bytes": 64 * 1024 * 1024,  # 缓存文本总大小上限，超出按最近最少使用淘汰
+    "max_entries": 2000,
+    "url_fresh_seconds": 300  # 在此时间内直接使用缓存，不发起请求
+}
+
+# ========== 脚本输入模式配置 ==========
+# 直接提供脚本（每行 "SpeakerN: 文本"，即服务保存的 script_*.txt 格式）时跳过脚本生成，
+# 全部句子已知，立即并行合成
+SCRIPT_INPUT_CONFIG = {
+    "max_chars": 50000,
+    "max_lines": 500,
+    "max_parallel_tts": 8  # 单个会话同时合成的句数（仍受跨会话 TTS 调度的总额度限制）
+}
+
+# ========== 脚本与节目缓存配置 ==========
+# 脚本缓存：合并内容 + 文本模型 + 脚本设置相同时复用脚本（只换音色时仅重新合成语音）
+# 节目缓存：脚本缓存键 + 两个音色 + TTS 模型与音频设置相同时直接回放已生成的节目
+EPISODE_CACHE_CONFIG = {
+    "enabled": True,
+    "script_dir": os.path.join(CACHE_DIR, "scripts"),
+    "episode_dir": os.path.join(CACHE_DIR, "episodes"),
+    "max_bytes": 32 * 1024 * 1024,
+    "max_entries": 1000,
+    "cover_ttl_seconds": 12 * 3600  # 封面图片 URL 有时效，超过该时间不再复用
+}
+
+# ========== 音色克隆上传配置 ==========
+# 上传前去掉首尾静音、截取有效片段并转为单声道低码率 MP3，减少上传字节数和克隆耗时
+VOICE_CLONE_UPLOAD_CONFIG = {
+    "compact": True,
+    "min_seconds": 10,  # 音色克隆要求的最短时长
+    "max_seconds": 60,  # 上传片段的最长时长
+    "sample_rate": 32000,
+    "bitrate_kbps": 64,
+    "silence_threshold_dbfs": -50.0  # 首尾低于该音量的部分视为静音
+}
 
 # ========== Voice ID 生成配置 ==========
 VOICE_ID_CONFIG = {
@@ -112,6 +292,61 @@ IMAGE_GENERATION_CONFIG = {
     "n": 1
 }
 
+# ========== 句子片段存储配置 ==========
+# 每期节目完成后保存各句的原始 TTS 音频和清单，可只重新合成个别句子并重新拼装整期节目
+SEGMENT_STORE_CONFIG = {
+    "enabled": True,
+    "dir": os.path.join(OUTPUT_DIR, "segments"),
+    "max_episodes": 200,  # 超出后删除最早的节目片段
+    "max_parallel_tts": 4,  # 重新合成时的并发数
+    "max_lines_per_request": 20,
+    "save_workers": 2  # 后台保存片段的线程数
+}
+
+# ========== 批量生成配置 ==========
+# 所有批量任务共享一个有界工作线程池，每条在生成前向准入控制申请名额（与网页请求共用并发上限），TTS 额度仍由跨会话调度统一分配
+BATCH_CONFIG = {
+    "max_workers": 2,  # 所有批量任务同时等待或占用准入名额的条目数
+    "max_items": 50,  # 单个批量任务的条目数上限
+    "max_jobs": 100,  # 内存中保留的任务数，超出后丢弃最早结束的任务（清单文件保留在磁盘上）
+    "max_queued_items": 200,  # 所有任务中尚未开始的条目上限，超出后拒绝新任务
+    "dir": os.path.join(OUTPUT_DIR, "batches")  # 任务清单（JSON）
+}
+
+# ========== 封面本地存储配置 ==========
+# 封面生成后立即下载到本地，之后从磁盘提供（带缓存头）；仍需代理时只允许白名单主机，按块转发并限制大小
+COVER_STORE_CONFIG = {
+    "dir": os.path.join(OUTPUT_DIR, "covers"),
+    "max_bytes": 10 * 1024 * 1024,
+    "chunk_size": 64 * 1024,
+    "timeout": 30,
+    "cache_max_age": 7 * 24 * 3600,  # 本地封面文件名唯一，可长期缓存
+    # 图片生成接口返回的图片托管在 MiniMax 的对象存储桶上（按主机名后缀匹配，不放行整个 aliyuncs.com）
+    "allowed_hosts": [
+        "hailuo-image-algeng-data.oss-cn-wulanchabu.aliyuncs.com",
+        "hailuo-image-algeng-data-us.oss-us-east-1.aliyuncs.com",
+        "minimaxi.com", "minimax.io", "minimaxi.chat"
+    ],
+    "max_redirects": 3,  # 手动跟随重定向，每一跳都重新校验白名单
+    # 预生成的缩略图（最长边像素），用于预览和列表；依赖 Pillow（requirements.txt），缺失时启动告警并只提供原图
+    "variants": {"thumb": 160, "small": 320, "medium": 640},
+    "variant_format": "webp",  # Pillow 不支持 WebP 时改用 JPEG
+    "variant_quality": 80
+}
+
+# ========== 封面 Prompt 配置 ==========
+# mode:
+#   "script"   从最先流式生成的几句脚本中提取关键词拼成图片 Prompt（不额外调用文本模型）
+#   "keywords" 直接从解析内容中提取关键词，内容就绪即开始生成图片（最早开始）
+#   "llm"      先调用文本模型生成图片 Prompt，再生成图片（两次串行请求）
+COVER_PROMPT_CONFIG = {
+    "mode": "script",
+    "script_lines": 4,  # 收集到的脚本句数
+    "script_wait_seconds": 20,  # 等待脚本句子的上限，超时改用解析内容提取关键词
+    "max_keywords": 3,
+    "default_prompt": "一男一女两个人坐在播客录音室里，漫画风格"
+}
+
 # ========== 日志配置 ==========
 LOG_LEVEL = "INFO"
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
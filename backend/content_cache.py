@@ -0,0 +1,234 @@
+"""
+解析内容缓存模块
+PDF 按上传文件 sha256、网址按规范化 URL 持久化提取后的文本，
+网址缓存同时保存 ETag / Last-Modified，过期后用条件请求重新验证
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from typing import Dict, Any, Optional
+from config import CONTENT_CACHE_CONFIG
+
+try:
+    import fcntl  # 跨进程文件锁（仅 POSIX）
+except ImportError:
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def normalize_url(url: str) -> str:
+    """
+    规范化 URL，使等价写法映射到同一个缓存键
+
+    协议和主机名转小写、去掉默认端口和片段（#...）、查询参数按键排序、空路径补为 "/"；
+    无法解析的 URL（如非数字端口）原样返回，由后续解析报告错误
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url.strip()
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        host = f"{userinfo}@{host}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+class ContentCache:
+    """按大小上限淘汰的解析内容磁盘缓存（线程安全、多进程安全）"""
+
+    def __init__(self, directory: str, max_bytes: int, max_entries: int, enabled: bool = True):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock_path = self.index_path + ".lock"
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "revalidated": 0, "stale": 0, "evictions": 0}
+        if enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    def pdf_key(self, file_sha256: str, max_chars: int) -> str:
+        """PDF 缓存键：文件哈希 + 字符预算（预算不同提取结果不同）"""
+        return hashlib.sha256(f"pdf:{file_sha256}:{max_chars}".encode()).hexdigest()
+
+    def url_key(self, url: str, max_chars: int) -> str:
+        """网址缓存键：规范化后的 URL + 文本长度上限"""
+        return hashlib.sha256(f"url:{normalize_url(url)}:{max_chars}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存项并计入命中/未命中
+
+        Returns:
+            {"content": 文本, "meta": 元数据, "checked_at": 上次验证时间}；未命中返回 None
+        """
+        if not self.enabled:
+            return None
+
+        with self._locked():
+            index = self._load_index()
+            entry = index.get(key)
+            content = self._read_content(key) if entry else None
+            if content is None:
+                if entry:
+                    # 索引与内容文件不一致，丢弃该项
+                    index.pop(key, None)
+                    self._save_index(index)
+                self._counters["misses"] += 1
+                return None
+
+            entry["last_used_at"] = time.time()
+            self._save_index(index)
+            self._counters["hits"] += 1
+            return {"content": content, "meta": entry.get("meta", {}), "checked_at": entry.get("checked_at", 0)}
+
+    def put(self, key: str, content: str, meta: Optional[Dict[str, Any]] = None) -> None:
+        """写入缓存项，超出大小或数量上限时按最近最少使用淘汰"""
+        if not self.enabled:
+            return
+
+        data = content.encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+
+        with self._locked():
+            index = self._load_index()
+            self._atomic_write(self._content_path(key), data)
+            now = time.time()
+            index[key] = {
+                "size": len(data),
+                "meta": meta or {},
+                "created_at": now,
+                "last_used_at": now,
+                "checked_at": now
+            }
+            self._evict(index)
+            self._save_index(index)
+
+    def mark_revalidated(self, key: str, meta: Optional[Dict[str, Any]] = None) -> None:
+        """条件请求返回 304 时刷新验证时间（可同时更新验证器）"""
+        if not self.enabled:
+            return
+
+        with self._locked():
+            index = self._load_index()
+            entry = index.get(key)
+            if entry is None:
+                return
+            entry["checked_at"] = time.time()
+            if meta:
+                entry["meta"].update(meta)
+            self._save_index(index)
+            self._counters["revalidated"] += 1
+
+    def record_stale(self) -> None:
+        """缓存内容已过期（源站返回了新内容）"""
+        with self._lock:
+            self._counters["stale"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        if not self.enabled:
+            return {"enabled": False}
+
+        with self._locked():
+            index = self._load_index()
+            counters = dict(self._counters)
+        return {
+            "enabled": True,
+            "entries": len(index),
+            "bytes": sum(entry.get("size", 0) for entry in index.values()),
+            "max_bytes": self.max_bytes,
+            **counters
+        }
+
+    def _evict(self, index: Dict[str, Any]) -> None:
+        """按最近使用时间淘汰，直到满足大小和数量上限（调用方需持有锁）"""
+        total = sum(entry.get("size", 0) for entry in index.values())
+        if total <= self.max_bytes and len(index) <= self.max_entries:
+            return
+
+        for key in sorted(index, key=lambda k: index[k].get("last_used_at", 0)):
+            if total <= self.max_bytes and len(index) <= self.max_entries:
+                break
+            total -= index.pop(key).get("size", 0)
+            path = self._content_path(key)
+            if os.path.exists(path):
+                os.remove(path)
+            self._counters["evictions"] += 1
+            logger.info(f"解析内容缓存已淘汰: {key[:12]}")
+
+    def _content_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.txt")
+
+    def _read_content(self, key: str) -> Optional[str]:
+        try:
+            with open(self._content_path(key), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def _locked(self):
+        """进程内线程锁 + 跨进程文件锁"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_index(self) -> Dict[str, Any]:
+        """读取索引（调用方需持有锁）"""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"解析内容缓存索引损坏，已忽略: {str(e)}")
+            return {}
+
+    def _save_index(self, index: Dict[str, Any]) -> None:
+        self._atomic_write(self.index_path, json.dumps(index, ensure_ascii=False).encode("utf-8"))
+
+    def _atomic_write(self, path: str, data: bytes) -> None:
+        """写入临时文件后原子替换（调用方需持有锁）"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".content_cache_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+# 单例实例
+content_cache = ContentCache(
+    directory=CONTENT_CACHE_CONFIG["dir"],
+    max_bytes=CONTENT_CACHE_CONFIG["max_bytes"],
+    max_entries=CONTENT_CACHE_CONFIG["max_entries"],
+    enabled=CONTENT_CACHE_CONFIG["enabled"]
+)
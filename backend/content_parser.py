@@ -1,28 +1,286 @@
 """
 内容解析模块
-支持网页解析（BeautifulSoup）和 PDF 解析（PyPDF2）
+支持网页解析（lxml）和 PDF 解析（PyPDF2）
 """
 
+import re
+import time
+import codecs
 import logging
+import threading
+import multiprocessing
+from contextlib import contextmanager
 import requests
-from bs4 import BeautifulSoup
+import http.cookiejar
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree
 from PyPDF2 import PdfReader
-from typing import Dict, Any
-from config import TIMEOUTS
+from typing import Dict, Any, Optional
+from config import TIMEOUTS, PDF_PARSE_CONFIG, CONTENT_CACHE_CONFIG, URL_FETCH_CONFIG
+from content_cache import content_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# merge_contents 合并多个来源时使用的分隔符
+SOURCE_SEPARATOR = "\n\n==========\n\n"
+# 各来源的标题：用户输入原样保留，网页 / PDF 抓取的正文才做样板过滤
+USER_INPUT_TITLE = "【用户输入】"
+SCRAPED_SOURCE_LABELS = ("网页内容", "PDF 内容")
+
+
+# ========== 网页正文提取 ==========
+
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_\-]+)', re.I)
+_NOISE_TAGS = ('script', 'style', 'noscript', 'template', 'iframe', 'svg', 'nav', 'footer', 'header', 'aside', 'form')
+_BLOCK_TAGS = {
+    'p', 'div', 'section', 'article', 'main', 'li', 'ul', 'ol', 'pre', 'blockquote', 'br', 'tr', 'td', 'th',
+    'table', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'dt', 'dd', 'figcaption', 'title', 'body'
+}
+_PARAGRAPH_TAGS = ('p', 'pre', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+
+def _lookup_encoding(name) -> Optional[str]:
+    """校验编码名称，gb2312 / gbk 统一按超集 gb18030 解码"""
+    if not name:
+        return None
+    try:
+        encoding = codecs.lookup(name.decode("ascii") if isinstance(name, bytes) else name).name
+    except (LookupError, UnicodeDecodeError):
+        return None
+    return "gb18030" if encoding in ("gb2312", "gbk") else encoding
+
+
+def _detect_encoding(content_type: str, head: bytes) -> str:
+    """
+    确定网页编码：BOM > 响应头 charset > <meta> 声明 > 首块内容检测，不对整个响应体做字符集探测
+    """
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+
+    for param in (content_type or "").split(";")[1:]:
+        key, _, value = param.partition("=")
+        if key.strip().lower() == "charset":
+            encoding = _lookup_encoding(value.strip().strip('"\''))
+            if encoding:
+                return encoding
+
+    match = _META_CHARSET_RE.search(head[:8192])
+    encoding = _lookup_encoding(match.group(1)) if match else None
+    if encoding:
+        return encoding
+
+    try:
+        head.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        if e.start >= len(head) - 3:  # 仅末尾的多字节字符被截断
+            return "utf-8"
+
+    try:
+        from charset_normalizer import from_bytes
+        best = from_bytes(head).best()
+        if best and _lookup_encoding(best.encoding):
+            return _lookup_encoding(best.encoding)
+    except ImportError:
+        pass
+    return "utf-8"
+
+
+def _remove_element(element) -> None:
+    """删除元素但保留其后的文本（tail）"""
+    parent = element.getparent()
+    if parent is None:
+        return
+    if element.tail:
+        previous = element.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or "") + element.tail
+        else:
+            parent.text = (parent.text or "") + element.tail
+    parent.remove(element)
+
+
+def _text_length(element) -> int:
+    return sum(len(text.strip()) for text in element.itertext())
+
+
+def _find_main_element(root):
+    """
+    定位正文区域：优先 <article> / <main> / role=main，否则按段落文本量给容器打分
+    """
+    min_chars = URL_FETCH_CONFIG["min_main_chars"]
+
+    candidates = root.xpath('//article | //main | //*[@role="main"]')
+    if candidates:
+        best = max(candidates, key=_text_length)
+        if _text_length(best) >= min_chars:
+            return best
+
+    scores = {}
+    for paragraph in root.iter('p', 'pre'):
+        length = _text_length(paragraph)
+        if length < 25:
+            continue
+        parent = paragraph.getparent()
+        if parent is None:
+            continue
+        scores[parent] = scores.get(parent, 0) + length
+        grandparent = parent.getparent()
+        if grandparent is not None:
+            scores[grandparent] = scores.get(grandparent, 0) + length / 2
+
+    if scores:
+        best = max(scores, key=scores.get)
+        if _text_length(best) >= min_chars:
+            return best
+
+    body = root.find('body')
+    return body if body is not None else root
+
+
+def _element_text(element) -> str:
+    """按块级元素换行拼接文本，行内元素（a / span / strong 等）不拆行"""
+    parts = []
+    for event, node in etree.iterwalk(element, events=("start", "end")):
+        if not isinstance(node.tag, str):
+            continue
+        if event == "start":
+            if node.tag in _BLOCK_TAGS:
+                parts.append("\n")
+            if node.text:
+                parts.append(node.text)
+        else:
+            if node.tag in _BLOCK_TAGS:
+                parts.append("\n")
+            if node.tail and node is not element:
+                parts.append(node.tail)
+    lines = [" ".join(line.split()) for line in "".join(parts).split("\n")]
+    return "\n".join(line for line in lines if line)
+
+
+def _extract_main_text(root) -> str:
+    """去掉脚本、导航等噪声元素后提取正文文本（标题放在第一行）"""
+    title = " ".join((root.findtext('.//title') or "").split())
+
+    for element in list(root.iter(*_NOISE_TAGS)):
+        _remove_element(element)
+
+    text = _element_text(_find_main_element(root))
+    if title and not text.startswith(title):
+        text = f"{title}\n{text}" if text else title
+    return text
+
+
+# ========== 共享 HTTP 连接池 ==========
+
+# 使用更真实的浏览器请求头
+_BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'gzip, deflate',  # requests 默认不支持解码 br
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Fetch-User': '?1',
+    'Cache-Control': 'max-age=0',
+    'Referer': 'https://www.google.com/',  # 添加 Referer，伪装成从搜索引擎来的
+    'DNT': '1'
+}
+
+_http_session = None
+_host_semaphores = {}  # host -> [BoundedSemaphore, 引用数]，没有请求持有或等待时移除，不随用户提交的主机数增长
+_http_lock = threading.Lock()
+
+
+def _get_http_session() -> requests.Session:
+    """获取共享 Session（懒加载），多个网址复用连接池"""
+    global _http_session
+    with _http_lock:
+        if _http_session is None:
+            session = requests.Session()
+            session.headers.update(_BROWSER_HEADERS)
+            # 不同用户的请求共用此 Session，拒绝保存任何 Cookie，避免一个用户的会话带到另一个用户的请求里
+            session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+            adapter = HTTPAdapter(pool_connections=URL_FETCH_CONFIG["pool_size"],
+                                  pool_maxsize=URL_FETCH_CONFIG["pool_size"])
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_session = session
+        return _http_session
+
+
+@contextmanager
+def _host_semaphore(url: str):
+    """按主机限制并发请求数，避免同一站点被并发请求触发限流"""
+    host = (urlsplit(url).hostname or "").lower()
+    with _http_lock:
+        entry = _host_semaphores.setdefault(host, [threading.BoundedSemaphore(URL_FETCH_CONFIG["per_host_limit"]), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _http_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _host_semaphores[host]
+
+
+# ========== PDF 页面提取 ==========
+
+_pdf_process_pool = None
+_pdf_process_pool_lock = threading.Lock()
+
+
+def _get_pdf_process_pool() -> ProcessPoolExecutor:
+    """获取 PDF 并行提取进程池（懒加载）"""
+    global _pdf_process_pool
+    with _pdf_process_pool_lock:
+        if _pdf_process_pool is None:
+            _pdf_process_pool = ProcessPoolExecutor(
+                max_workers=PDF_PARSE_CONFIG["max_workers"],
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"PDF 提取进程池已启动，进程数: {PDF_PARSE_CONFIG['max_workers']}")
+        return _pdf_process_pool
+
+
+def _extract_page(page, index: int) -> Dict[str, Any]:
+    """提取单页文本并计时"""
+    start = time.time()
+    text = ""
+    error = None
+    try:
+        text = page.extract_text() or ""
+    except Exception as e:
+        error = str(e)
+    return {"index": index, "text": text, "elapsed_ms": int((time.time() - start) * 1000), "error": error}
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> list:
+    """在子进程中提取 [start, end) 页的文本"""
+    reader = PdfReader(pdf_path)
+    return [_extract_page(reader.pages[index], index) for index in range(start, end)]
+
 
 class ContentParser:
     """内容解析器"""
 
-    def parse_url(self, url: str) -> Dict[str, Any]:
+    def parse_url(self, url: str, max_chars: int = None) -> Dict[str, Any]:
         """
         解析网页内容
 
         Args:
             url: 网页 URL
+            max_chars: 提取文本长度上限（默认使用配置，长文档模式下更大）
 
         Returns:
             包含解析文本和日志的字典
@@ -30,56 +288,58 @@ class ContentParser:
         logs = []
         logs.append(f"开始解析网址: {url}")
 
-        try:
-            # 发送 HTTP 请求，使用更真实的浏览器请求头
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Fetch-User': '?1',
-                'Cache-Control': 'max-age=0',
-                'Referer': 'https://www.google.com/',  # 添加 Referer，伪装成从搜索引擎来的
-                'DNT': '1'
-            }
-
-            # 创建 session 以保持 cookies
-            session = requests.Session()
-            session.headers.update(headers)
-
-            response = session.get(url, timeout=TIMEOUTS["url_parsing"], allow_redirects=True)
-            response.raise_for_status()
-            response.encoding = response.apparent_encoding
-
-            logs.append(f"成功获取网页内容，状态码: {response.status_code}")
-
-            # 使用 BeautifulSoup 解析 HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
+        max_length = max_chars or URL_FETCH_CONFIG["max_chars"]
+        cache_key = content_cache.url_key(url, max_length)
+        cached = content_cache.get(cache_key)
+        if cached and time.time() - cached["checked_at"] < CONTENT_CACHE_CONFIG["url_fresh_seconds"]:
+            logs.append(f"命中解析缓存，共 {len(cached['content'])} 字符")
+            return self._cached_url_result(cached, url, logs)
 
-            # 移除 script 和 style 标签
-            for script in soup(['script', 'style', 'nav', 'footer', 'header']):
-                script.decompose()
-
-            # 提取文本内容
-            text = soup.get_text(separator='\n', strip=True)
-
-            # 清理多余的空行
-            lines = [line.strip() for line in text.split('\n') if line.strip()]
-            content = '\n'.join(lines)
+        try:
+            # 缓存已过新鲜期：带验证器发起条件请求
+            request_headers = {}
+            validators = cached["meta"] if cached else {}
+            if validators.get("etag"):
+                request_headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                request_headers["If-Modified-Since"] = validators["last_modified"]
+
+            session = _get_http_session()
+            with _host_semaphore(url), session.get(url, headers=request_headers, timeout=TIMEOUTS["url_parsing"],
+                                                   allow_redirects=True, stream=True) as response:
+                if response.status_code == 304 and cached:
+                    content_cache.mark_revalidated(cache_key)
+                    logs.append(f"网页未修改（304），使用解析缓存，共 {len(cached['content'])} 字符")
+                    return self._cached_url_result(cached, url, logs)
+                response.raise_for_status()
+                if cached:
+                    content_cache.record_stale()
+
+                logs.append(f"成功获取网页内容，状态码: {response.status_code}")
+                # 提前停止下载的阈值随文本上限放大，保证正文候选足够
+                early_stop_chars = max(URL_FETCH_CONFIG["early_stop_chars"], max_length * 3)
+                root = self._stream_html(response, logs, early_stop_chars)
+
+            # 提取正文文本
+            extract_start = time.time()
+            content = _extract_main_text(root)
+            logs.append(f"正文提取耗时 {int((time.time() - extract_start) * 1000)}ms")
+
+            if not content:
+                raise ValueError("网页中没有可提取的文本")
 
             # 限制长度（防止内容过长）
-            max_length = 10000
             if len(content) > max_length:
                 content = content[:max_length] + "\n...(内容过长，已截断)"
                 logs.append(f"内容过长，已截断至 {max_length} 字符")
 
             logs.append(f"成功提取文本，共 {len(content)} 字符")
 
+            content_cache.put(cache_key, content, {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified")
+            })
+
             return {
                 "success": True,
                 "content": content,
@@ -129,38 +389,77 @@ class ContentParser:
                 "source": "url"
             }
 
-    def parse_pdf(self, pdf_path: str) -> Dict[str, Any]:
+    def parse_pdf(self, pdf_path: str, file_sha256: str = None, max_chars: int = None) -> Dict[str, Any]:
         """
-        解析 PDF 文件
+        解析 PDF 文件（按字符预算提取，预算用完后跳过剩余页面）
 
         Args:
             pdf_path: PDF 文件路径
+            file_sha256: 文件哈希（提供时使用解析内容缓存）
+            max_chars: 字符预算（默认使用配置，长文档模式下更大）
 
         Returns:
             包含解析文本和日志的字典
         """
         logs = []
         logs.append(f"开始解析 PDF: {pdf_path}")
+        max_length = max_chars or PDF_PARSE_CONFIG["max_chars"]
+
+        cache_key = content_cache.pdf_key(file_sha256, max_length) if file_sha256 else None
+        cached = content_cache.get(cache_key) if cache_key else None
+        if cached:
+            logs.append(f"命中解析缓存，共 {len(cached['content'])} 字符")
+            return {
+                "success": True,
+                "content": cached["content"],
+                "logs": logs,
+                "source": "pdf",
+                "num_pages": cached["meta"].get("num_pages"),
+                "cached": True
+            }
 
         try:
+            parse_start = time.time()
             # 使用 PyPDF2 读取 PDF
             reader = PdfReader(pdf_path)
             num_pages = len(reader.pages)
 
             logs.append(f"PDF 共 {num_pages} 页")
 
-            # 提取所有页面的文本
             all_text = []
-            for i, page in enumerate(reader.pages):
-                try:
-                    text = page.extract_text()
-                    if text.strip():
-                        all_text.append(text)
-                        logs.append(f"成功提取第 {i + 1} 页内容")
-                    else:
-                        logs.append(f"警告: 第 {i + 1} 页无法提取文本（可能是扫描版）")
-                except Exception as e:
-                    logs.append(f"警告: 第 {i + 1} 页提取失败: {str(e)}")
+            text_length = 0  # '\n'.join(all_text) 的长度
+
+            def collect(page_result) -> bool:
+                """记录单页结果，返回累计文本是否已超出预算"""
+                nonlocal text_length
+                page_number = page_result["index"] + 1
+                elapsed_ms = page_result["elapsed_ms"]
+                if page_result["error"]:
+                    logs.append(f"警告: 第 {page_number} 页提取失败: {page_result['error']}")
+                elif page_result["text"].strip():
+                    text_length += len(page_result["text"]) + (1 if all_text else 0)
+                    all_text.append(page_result["text"])
+                    logs.append(f"成功提取第 {page_number} 页内容（{len(page_result['text'])} 字符，{elapsed_ms}ms）")
+                else:
+                    logs.append(f"警告: 第 {page_number} 页无法提取文本（可能是扫描版，{elapsed_ms}ms）")
+                return text_length > max_length
+
+            # 大文档可选并行：先顺序提取一批页面，预算仍未用完再按页面区间并行提取
+            use_parallel = PDF_PARSE_CONFIG["parallel"] and num_pages >= PDF_PARSE_CONFIG["parallel_min_pages"]
+            sequential_pages = min(num_pages, PDF_PARSE_CONFIG["pages_per_task"]) if use_parallel else num_pages
+
+            next_page = 0
+            exceeded = False
+            while next_page < sequential_pages and not exceeded:
+                exceeded = collect(_extract_page(reader.pages[next_page], next_page))
+                next_page += 1
+
+            if use_parallel and not exceeded and next_page < num_pages:
+                exceeded, next_page = self._extract_pages_parallel(pdf_path, next_page, num_pages, collect, logs)
+
+            if exceeded and next_page < num_pages:
+                logs.append(f"已达到 {max_length} 字符预算，跳过剩余 {num_pages - next_page} 页")
+            logs.append(f"PDF 文本提取耗时 {int((time.time() - parse_start) * 1000)}ms（处理 {next_page}/{num_pages} 页）")
 
             if not all_text:
                 error_msg = "PDF 无法提取文本，可能是扫描版 PDF，不支持此格式"
@@ -175,13 +474,15 @@ class ContentParser:
             content = '\n'.join(all_text)
 
             # 限制长度
-            max_length = 10000
             if len(content) > max_length:
                 content = content[:max_length] + "\n...(内容过长，已截断)"
                 logs.append(f"内容过长，已截断至 {max_length} 字符")
 
             logs.append(f"成功提取文本，共 {len(content)} 字符")
 
+            if cache_key:
+                content_cache.put(cache_key, content, {"num_pages": num_pages})
+
             return {
                 "success": True,
                 "content": content,
@@ -201,14 +502,117 @@ class ContentParser:
                 "source": "pdf"
             }
 
-    def merge_contents(self, text_input: str = "", url_content: str = "", pdf_content: str = "") -> str:
+    def _extract_pages_parallel(self, pdf_path: str, start_page: int, num_pages: int, collect, logs) -> tuple:
+        """
+        在进程池中按页面区间并行提取，每批最多 max_workers 个区间，预算用完后不再提交
+
+        Returns:
+            (是否超出预算, 已处理到的页码)
+        """
+        pages_per_task = PDF_PARSE_CONFIG["pages_per_task"]
+        max_workers = PDF_PARSE_CONFIG["max_workers"]
+        next_page = start_page
+
+        try:
+            pool = _get_pdf_process_pool()
+            while next_page < num_pages:
+                ranges = []
+                range_start = next_page
+                while range_start < num_pages and len(ranges) < max_workers:
+                    ranges.append((range_start, min(range_start + pages_per_task, num_pages)))
+                    range_start += pages_per_task
+
+                wave_start = time.time()
+                futures = [pool.submit(_extract_page_range, pdf_path, begin, end) for begin, end in ranges]
+                logs.append(f"并行提取第 {ranges[0][0] + 1}-{ranges[-1][1]} 页（{len(ranges)} 个进程任务）")
+
+                # 按页码顺序合并，超出预算后丢弃本批剩余结果
+                for future in futures:
+                    for page_result in future.result():
+                        next_page = page_result["index"] + 1
+                        if collect(page_result):
+                            for pending in futures:
+                                pending.cancel()
+                            logs.append(f"本批并行提取耗时 {int((time.time() - wave_start) * 1000)}ms")
+                            return True, next_page
+                logs.append(f"本批并行提取耗时 {int((time.time() - wave_start) * 1000)}ms")
+            return False, next_page
+
+        except Exception as e:
+            # 进程池不可用时顺序提取剩余页面
+            logger.warning(f"PDF 并行提取失败，改为顺序提取: {str(e)}")
+            logs.append("并行提取失败，改为顺序提取剩余页面")
+            reader = PdfReader(pdf_path)
+            while next_page < num_pages:
+                page_index = next_page
+                next_page += 1
+                if collect(_extract_page(reader.pages[page_index], page_index)):
+                    return True, next_page
+            return False, next_page
+
+    def _stream_html(self, response, logs: list, early_stop_chars: int):
+        """
+        分块读取响应并增量解析 HTML，达到字节上限或已解析出足够段落文本时停止下载
+
+        Returns:
+            lxml 根元素
+        """
+        max_bytes = URL_FETCH_CONFIG["max_bytes"]
+        fetch_start = time.time()
+
+        parser = None
+        encoding = None
+        received = 0
+        text_chars = 0
+        stop_reason = None
+
+        for chunk in response.iter_content(chunk_size=URL_FETCH_CONFIG["chunk_size"]):
+            if not chunk:
+                continue
+            if parser is None:
+                encoding = _detect_encoding(response.headers.get("Content-Type", ""), chunk)
+                parser = etree.HTMLPullParser(events=("end",), tag=_PARAGRAPH_TAGS, encoding=encoding, remove_comments=True)
+
+            if received + len(chunk) > max_bytes:
+                chunk = chunk[:max_bytes - received]
+                stop_reason = f"已达到 {max_bytes // 1024} KB 下载上限，停止读取"
+            received += len(chunk)
+            parser.feed(chunk)
+
+            for _, element in parser.read_events():
+                text_chars += _text_length(element)
+            if stop_reason is None and text_chars >= early_stop_chars:
+                stop_reason = f"已解析 {text_chars} 字符段落文本，提前结束下载"
+            if stop_reason:
+                logs.append(stop_reason)
+                break
+
+        if parser is None:
+            raise ValueError("网页内容为空")
+
+        root = parser.close()
+        logs.append(f"网页读取与解析耗时 {int((time.time() - fetch_start) * 1000)}ms（{received // 1024} KB，编码 {encoding}）")
+        return root
+
+    def _cached_url_result(self, cached: Dict[str, Any], url: str, logs: list) -> Dict[str, Any]:
+        """由缓存项构造网址解析结果"""
+        return {
+            "success": True,
+            "content": cached["content"],
+            "logs": logs,
+            "source": "url",
+            "url": url,
+            "cached": True
+        }
+
+    def merge_contents(self, text_input: str = "", url_content=None, pdf_content=None) -> str:
         """
         合并多种来源的内容
 
         Args:
             text_input: 用户输入的文本
-            url_content: 网页解析的内容
-            pdf_content: PDF 解析的内容
+            url_content: 网页解析的内容（多个网址时为按输入顺序排列的列表）
+            pdf_content: PDF 解析的内容（多个 PDF 时为按上传顺序排列的列表）
 
         Returns:
             合并后的文本
@@ -216,18 +620,21 @@ class ContentParser:
         contents = []
 
         if text_input and text_input.strip():
-            contents.append(f"【用户输入】\n{text_input.strip()}")
-
-        if url_content and url_content.strip():
-            contents.append(f"【网页内容】\n{url_content.strip()}")
+            contents.append(f"{USER_INPUT_TITLE}\n{text_input.strip()}")
 
-        if pdf_content and pdf_content.strip():
-            contents.append(f"【PDF 内容】\n{pdf_content.strip()}")
+        for label, items in zip(SCRAPED_SOURCE_LABELS, (url_content, pdf_content)):
+            if isinstance(items, str) or items is None:
+                items = [items]
+            items = [item.strip() for item in items if item and item.strip()]
+            for index, item in enumerate(items, 1):
+                # 同类来源只有一个时保持原标题，多个时按顺序编号
+                title = f"{label} {index}" if len(items) > 1 else label
+                contents.append(f"【{title}】\n{item}")
 
         if not contents:
             return "没有可用的内容"
 
-        merged = "\n\n==========\n\n".join(contents)
+        merged = SOURCE_SEPARATOR.join(contents)
         logger.info(f"成功合并 {len(contents)} 个来源的内容，总长度: {len(merged)}")
 
         return merged
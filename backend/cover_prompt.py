@@ -0,0 +1,75 @@
+"""
+封面 Prompt 本地生成模块
+从脚本开头或解析内容中提取关键词拼成图片描述，省去封面 Prompt 的文本模型调用
+"""
+
+import re
+import logging
+from typing import List
+from config import COVER_PROMPT_CONFIG
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_SPEAKER_RE = re.compile(r'Speaker\d+\s*[:：]')
+_CJK_RUN_RE = re.compile(r'[一-鿿]{2,}')
+_LATIN_WORD_RE = re.compile(r'[A-Za-z][A-Za-z0-9+\-]{2,}')
+
+# 出现在词首或词尾时基本不是实词的汉字（虚词、代词、语气词、量词）
+_CJK_STOP_CHARS = set("的了是在我你他她它们这那就都也和与或而及个一不有没很吧呢吗啊呀哦嗯么啦哈把被给让从说要可以还又再更最已着过之其各该此每些什怎为所如")
+_LATIN_STOP_WORDS = {
+    "the", "and", "for", "are", "but", "not", "you", "all", "can", "was", "one", "our", "out", "has", "have",
+    "this", "that", "with", "from", "they", "will", "what", "when", "your", "about", "there", "their", "which",
+    "would", "into", "more", "some", "than", "then", "also", "just", "like", "speaker"
+}
+
+
+def extract_keywords(text: str, max_keywords: int = None) -> List[str]:
+    """
+    不依赖分词器的关键词提取：统计 2~4 字中文片段和英文单词的出现次数，
+    按 次数 × 长度 打分，去掉互相包含的候选
+
+    Args:
+        text: 脚本句子或解析内容
+        max_keywords: 返回的关键词个数（默认使用配置）
+
+    Returns:
+        按重要性排序的关键词列表
+    """
+    max_keywords = max_keywords or COVER_PROMPT_CONFIG["max_keywords"]
+    text = _SPEAKER_RE.sub(" ", text)
+
+    counts = {}
+    for run in _CJK_RUN_RE.findall(text):
+        for size in (2, 3, 4):
+            for start in range(len(run) - size + 1):
+                gram = run[start:start + size]
+                if gram[0] in _CJK_STOP_CHARS or gram[-1] in _CJK_STOP_CHARS:
+                    continue
+                counts[gram] = counts.get(gram, 0) + 1
+    for word in _LATIN_WORD_RE.findall(text):
+        if word.lower() not in _LATIN_STOP_WORDS:
+            counts[word] = counts.get(word, 0) + 1
+
+    # 只出现一次的片段多为偶然组合，候选充足时排除
+    if sum(1 for count in counts.values() if count > 1) >= max_keywords:
+        counts = {gram: count for gram, count in counts.items() if count > 1}
+
+    keywords = []
+    for gram in sorted(counts, key=lambda g: (counts[g] * min(len(g), 4), len(g)), reverse=True):
+        if any(gram in kept or kept in gram for kept in keywords):
+            continue
+        keywords.append(gram)
+        if len(keywords) >= max_keywords:
+            break
+    return keywords
+
+
+def build_cover_prompt(text: str) -> str:
+    """由关键词拼出简短的封面图片描述，提取不到关键词时返回默认描述"""
+    keywords = extract_keywords(text)
+    if not keywords:
+        return COVER_PROMPT_CONFIG["default_prompt"]
+    prompt = f"两位主持人在播客录音室里讨论{'、'.join(keywords)}，漫画风格"
+    logger.info(f"本地生成的封面 Prompt: {prompt}")
+    return prompt
@@ -0,0 +1,217 @@
+"""
+封面本地存储模块
+封面生成后立即下载到本地（按会话命名）并预生成缩略图，之后从磁盘提供；
+仍需代理的请求只允许白名单主机，按块流式转发并限制大小
+"""
+
+import os
+import re
+import logging
+import tempfile
+import threading
+import requests
+from urllib.parse import urlsplit, urljoin
+from typing import Dict, Any, Iterator, Optional
+from config import COVER_STORE_CONFIG
+
+try:
+    from PIL import Image, features as image_features
+except ImportError:
+    Image = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_FILENAME_RE = re.compile(r'^[\w\-.]+$')
+_CONTENT_TYPE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif"
+}
+
+
+class CoverTooLarge(Exception):
+    """封面图片超过大小上限"""
+    pass
+
+
+class CoverStore:
+    """封面图片本地存储 + 受限的流式代理"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.directory = config["dir"]
+        self.max_bytes = config["max_bytes"]
+        self.chunk_size = config["chunk_size"]
+        self.timeout = config["timeout"]
+        self.max_redirects = config.get("max_redirects", 3)
+        self.allowed_hosts = [host.lower().lstrip(".") for host in config["allowed_hosts"]]
+        self.variants = config["variants"]
+        self.variant_quality = config["variant_quality"]
+        self.variant_format = config["variant_format"]
+        if Image is not None and self.variant_format == "webp" and not image_features.check("webp"):
+            self.variant_format = "jpeg"
+        self._lock = threading.Lock()
+        self._url_index = {}  # 原始图片 URL → 本地文件名
+        os.makedirs(self.directory, exist_ok=True)
+        if Image is None and self.variants:
+            logger.warning("未安装 Pillow，封面缩略图已关闭，只提供原图（pip install -r requirements.txt）")
+
+    def is_allowed_url(self, url: str) -> bool:
+        """仅允许 http(s) 且主机名在白名单内（含子域名）的图片地址"""
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        if parts.scheme not in ("http", "https") or not host:
+            return False
+        return any(host == allowed or host.endswith("." + allowed) for allowed in self.allowed_hosts)
+
+    def path(self, filename: str) -> Optional[str]:
+        """本地封面文件路径（文件名非法或文件不存在时返回 None）"""
+        if not filename or not _FILENAME_RE.match(filename):
+            return None
+        path = os.path.join(self.directory, filename)
+        return path if os.path.exists(path) else None
+
+    def local_filename(self, url: str) -> Optional[str]:
+        """已下载到本地的封面文件名"""
+        with self._lock:
+            filename = self._url_index.get(url)
+        return filename if filename and self.path(filename) else None
+
+    def open_stream(self, url: str) -> requests.Response:
+        """
+        发起流式请求（调用方负责读取和关闭）
+
+        Raises:
+            ValueError: 主机（含重定向目标）不在白名单内，或重定向次数过多
+            CoverTooLarge: Content-Length 超过上限
+            requests.RequestException: 请求失败
+        """
+        for _ in range(self.max_redirects + 1):
+            if not self.is_allowed_url(url):
+                raise ValueError(f"不允许的封面地址: {urlsplit(url).hostname}")
+            # 不让 requests 自动跟随重定向，否则白名单主机可以把请求转到任意地址
+            response = requests.get(url, stream=True, timeout=self.timeout, allow_redirects=False)
+            if not response.is_redirect:
+                break
+            url = urljoin(url, response.headers.get("Location", ""))
+            response.close()
+        else:
+            raise ValueError(f"封面地址重定向次数超过 {self.max_redirects} 次")
+
+        try:
+            response.raise_for_status()
+            content_length = response.headers.get("Content-Length")
+            if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+                raise CoverTooLarge(f"封面图片过大: {int(content_length) // 1024} KB")
+        except Exception:
+            response.close()
+            raise
+        return response
+
+    def iter_limited(self, response: requests.Response) -> Iterator[bytes]:
+        """按块读取响应，累计超过上限时中止（没有 Content-Length 的响应也受限）"""
+        received = 0
+        try:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                received += len(chunk)
+                if received > self.max_bytes:
+                    raise CoverTooLarge(f"封面图片超过 {self.max_bytes // 1024} KB 上限")
+                yield chunk
+        finally:
+            response.close()
+
+    def fetch(self, url: str, session_id: str) -> Dict[str, Any]:
+        """
+        下载封面图片到本地
+
+        Returns:
+            {"success": bool, "filename": 本地文件名, "local_url": 本地访问地址, "size": 字节数, "error": 错误信息}
+        """
+        filename = self.local_filename(url)
+        if filename:
+            return {"success": True, "filename": filename, "local_url": f"/download/cover/{filename}",
+                    "size": os.path.getsize(os.path.join(self.directory, filename))}
+
+        tmp_path = None
+        try:
+            response = self.open_stream(url)
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            extension = _CONTENT_TYPE_EXTENSIONS.get(content_type, "jpg")
+            filename = f"cover_{session_id}.{extension}"
+
+            size = 0
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".cover_", suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                for chunk in self.iter_limited(response):
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, os.path.join(self.directory, filename))
+            tmp_path = None
+
+            with self._lock:
+                self._url_index[url] = filename
+            logger.info(f"封面已保存到本地: {filename}（{size // 1024} KB）")
+            return {"success": True, "filename": filename, "local_url": f"/download/cover/{filename}", "size": size}
+
+        except Exception as e:
+            logger.warning(f"下载封面到本地失败: {str(e)}")
+            return {"success": False, "error": str(e)}
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def make_variants(self, filename: str) -> Dict[str, Dict[str, Any]]:
+        """
+        由本地封面生成缩小的紧凑格式版本（只生成比原图小的尺寸）
+
+        Returns:
+            {名称: {"url": 本地访问地址, "filename", "width", "height", "size": 字节数}}；
+            Pillow 未安装或原图无法解码时返回空字典
+        """
+        path = self.path(filename)
+        if Image is None or path is None:
+            return {}
+
+        stem = os.path.splitext(filename)[0]
+        extension = "webp" if self.variant_format == "webp" else "jpg"
+        variants = {}
+        try:
+            with Image.open(path) as original:
+                original.load()
+                image = original.convert("RGB")
+            for name, max_side in sorted(self.variants.items(), key=lambda item: item[1]):
+                if max(image.size) <= max_side:
+                    continue
+                resized = image.copy()
+                resized.thumbnail((max_side, max_side), Image.LANCZOS)
+                variant_filename = f"{stem}_{name}.{extension}"
+                variant_path = os.path.join(self.directory, variant_filename)
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".cover_", suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        resized.save(f, format=self.variant_format.upper(), quality=self.variant_quality)
+                    os.replace(tmp_path, variant_path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                variants[name] = {
+                    "url": f"/download/cover/{variant_filename}",
+                    "filename": variant_filename,
+                    "width": resized.width,
+                    "height": resized.height,
+                    "size": os.path.getsize(variant_path)
+                }
+        except Exception as e:
+            logger.warning(f"生成封面缩略图失败: {str(e)}")
+            return variants
+
+        if variants:
+            logger.info("封面缩略图已生成: " + "，".join(
+                f"{name} {variant['width']}x{variant['height']} {variant['size'] // 1024} KB" for name, variant in variants.items()))
+        return variants
+
+
+# 单例实例
+cover_store = CoverStore(COVER_STORE_CONFIG)
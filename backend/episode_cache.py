@@ -0,0 +1,170 @@
+"""
+脚本与节目缓存模块
+合并内容和脚本设置相同时复用已生成的脚本（只换音色时仅重新合成语音），
+内容、音色和音频设置都相同时直接回放已生成的节目
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, Any, List, Optional
+from config import (
+    EPISODE_CACHE_CONFIG,
+    MODELS,
+    PODCAST_CONFIG,
+    PROMPT_REDUCTION_CONFIG,
+    LONG_INPUT_CONFIG,
+    LONG_FORM_CONFIG,
+    TTS_AUDIO_SETTINGS,
+    WELCOME_TEXT,
+    WELCOME_VOICE_ID,
+    BGM_FILES,
+    OUTPUT_DIR
+)
+from content_cache import ContentCache
+from cover_store import cover_store
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _hash(parts: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class EpisodeCache:
+    """脚本缓存 + 节目缓存（均以 ContentCache 持久化，JSON 存储）"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.enabled = config["enabled"]
+        self.cover_ttl_seconds = config["cover_ttl_seconds"]
+        self.scripts = ContentCache(config["script_dir"], config["max_bytes"], config["max_entries"], config["enabled"])
+        self.episodes = ContentCache(config["episode_dir"], config["max_bytes"], config["max_entries"], config["enabled"])
+
+    def script_key(self, content: str, long_input: bool = False, long_form_minutes: Optional[int] = None,
+                   script_input: bool = False) -> str:
+        """脚本缓存键：合并内容 + 文本模型 + 影响脚本的设置"""
+        return _hash({
+            "content": content,
+            "script_input": script_input,
+            "text_model": MODELS["text"],
+            "duration": [PODCAST_CONFIG["target_duration_min"], PODCAST_CONFIG["target_duration_max"]],
+            "style": PODCAST_CONFIG["style"],
+            "reduction": PROMPT_REDUCTION_CONFIG["enabled"] and PROMPT_REDUCTION_CONFIG["token_budget"],
+            "long_input": long_input and [LONG_INPUT_CONFIG["chunk_chars"], LONG_INPUT_CONFIG["max_chunks"],
+                                          LONG_INPUT_CONFIG["summary_chars"], LONG_INPUT_CONFIG["digest_token_budget"]],
+            "long_form": long_form_minutes and [long_form_minutes, LONG_FORM_CONFIG["section_minutes"]]
+        })
+
+    def episode_key(self, script_key: str, speaker1_voice_id: str, speaker2_voice_id: str) -> str:
+        """节目缓存键：脚本缓存键 + 两个音色 + TTS 模型和音频设置 + 开场素材"""
+        return _hash({
+            "script": script_key,
+            "voices": [speaker1_voice_id, speaker2_voice_id],
+            "tts_model": MODELS["tts"],
+            "audio": TTS_AUDIO_SETTINGS,
+            "welcome": [WELCOME_TEXT, WELCOME_VOICE_ID],
+            "bgm": [os.path.basename(BGM_FILES["bgm01"]), os.path.basename(BGM_FILES["bgm02"])]
+        })
+
+    def get_script(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取已缓存的脚本
+
+        Returns:
+            {"lines": [[speaker, text], ...], "sections": 长节目各段 [{"title", "lines"}] 或 None,
+             "cover": 未过期的封面结果或 None}；未命中返回 None
+        """
+        cached = self.scripts.get(key)
+        if cached is None:
+            return None
+        record = self._load(cached)
+        if record is None or not record.get("lines"):
+            return None
+        record["cover"] = self._fresh_cover(record.get("cover"))
+        return record
+
+    def get_episode(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取已缓存的节目（音频文件已被清理时视为未命中）
+
+        Returns:
+            {"lines", "audio_filename", "script_filename", "duration_ms", "cover", "episode_id"}；未命中返回 None
+        """
+        cached = self.episodes.get(key)
+        if cached is None:
+            return None
+        record = self._load(cached)
+        if record is None:
+            return None
+        for filename in (record.get("audio_filename"), record.get("script_filename")):
+            if not filename or not os.path.exists(os.path.join(OUTPUT_DIR, filename)):
+                logger.info(f"节目缓存 {key[:12]} 的输出文件已不存在，重新生成")
+                return None
+        record["cover"] = self._fresh_cover(record.get("cover"))
+        return record
+
+    def put_script(self,
+                   script_key: str,
+                   lines: List[List[str]],
+                   sections: Optional[List[Dict[str, Any]]] = None,
+                   cover: Optional[Dict[str, Any]] = None) -> None:
+        """保存一次成功生成的脚本（及其封面）"""
+        if not self.enabled or not lines:
+            return
+        self._put(self.scripts, script_key, {"lines": lines, "sections": sections, "cover": cover})
+
+    def put_episode(self,
+                    episode_key: str,
+                    lines: List[List[str]],
+                    audio_filename: str,
+                    script_filename: str,
+                    duration_ms: int,
+                    cover: Optional[Dict[str, Any]] = None,
+                    episode_id: str = "") -> None:
+        """保存一次完整生成的节目（每句都合成成功）"""
+        if not self.enabled or not lines:
+            return
+        self._put(self.episodes, episode_key, {
+            "lines": lines,
+            "audio_filename": audio_filename,
+            "script_filename": script_filename,
+            "duration_ms": duration_ms,
+            "cover": cover,
+            "episode_id": episode_id  # 句子片段清单所属的节目 ID
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        return {"scripts": self.scripts.stats(), "episodes": self.episodes.stats()}
+
+    def _fresh_cover(self, cover: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """已保存到本地的封面一直可以复用；只有图片 URL 的封面有时效，超过 cover_ttl_seconds 的不再复用"""
+        if not cover:
+            return None
+        if cover.get("filename") and cover_store.path(cover["filename"]):
+            variants = {name: variant for name, variant in (cover.get("variants") or {}).items()
+                        if cover_store.path(variant["filename"])}
+            return dict(cover, variants=variants)
+        if time.time() - cover.get("created_at", 0) > self.cover_ttl_seconds:
+            return None
+        return dict(cover, filename="", local_url="", variants={})
+
+    def _put(self, cache: ContentCache, key: str, record: Dict[str, Any]) -> None:
+        try:
+            cache.put(key, json.dumps(record, ensure_ascii=False))
+        except Exception as e:
+            # 缓存写入失败不影响本次生成结果
+            logger.warning(f"保存脚本/节目缓存失败: {str(e)}")
+
+    def _load(self, cached: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(cached["content"])
+        except ValueError:
+            return None
+
+
+# 单例实例
+episode_cache = EpisodeCache(EPISODE_CACHE_CONFIG)
@@ -0,0 +1,163 @@
+"""
+长文档模式
+把超长的来源按段落切分，并行调用文本模型摘要（map），再按原顺序合并为脚本材料（reduce），
+整篇文档的处理耗时约等于一段摘要 + 一次脚本生成；
+段数不超过 max_chunks（一轮并发完成），各段摘要长度按段数均分 digest_token_budget，合并后的材料不会被精简阶段截断
+"""
+
+import re
+import math
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Callable, Optional
+from config import LONG_INPUT_CONFIG, PROMPT_REDUCTION_CONFIG
+from content_parser import SOURCE_SEPARATOR
+from minimax_client import minimax_client
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_SECTION_TITLE_RE = re.compile(r'^【[^】]+】$')
+
+
+def split_into_chunks(text: str, chunk_chars: int) -> List[str]:
+    """按段落边界切分文本，超长段落按字符切开"""
+    chunks = []
+    current = []
+    current_length = 0
+    for line in text.split("\n"):
+        while len(line) > chunk_chars:
+            if current:
+                chunks.append("\n".join(current))
+                current, current_length = [], 0
+            chunks.append(line[:chunk_chars])
+            line = line[chunk_chars:]
+        if current and current_length + len(line) + 1 > chunk_chars:
+            chunks.append("\n".join(current))
+            current, current_length = [], 0
+        if line:
+            current.append(line)
+            current_length += len(line) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def summarize_long_content(content: str,
+                           api_key: Optional[str] = None,
+                           emit: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    摘要合并后的长内容：短于一段的来源（如用户输入的话题）原样保留，其余来源分段并行摘要
+
+    Args:
+        content: merge_contents 合并后的内容
+        api_key: 用户提供的 MiniMax API Key
+        emit: 进度事件回调
+
+    Returns:
+        {
+            "success": 是否至少有一段摘要成功（无需摘要时为 True）,
+            "content": 合并后的摘要材料,
+            "summarized": 是否进行了摘要,
+            "chunks": 摘要段数,
+            "failed": 失败段数（失败段使用原文开头代替）,
+            "trace_ids": {段序号: trace_id},
+            "elapsed_ms": 耗时
+        }
+    """
+    emit = emit or (lambda event: None)
+
+    # 拆分来源：[(标题行, 正文)]
+    sections = []
+    for section in content.split(SOURCE_SEPARATOR):
+        lines = section.split("\n", 1)
+        if _SECTION_TITLE_RE.match(lines[0].strip()):
+            sections.append((lines[0].strip(), lines[1] if len(lines) > 1 else ""))
+        else:
+            sections.append(("", section))
+
+    # 需要摘要的段：(来源序号, 段文本)；内容越长每段越大，段数控制在一轮并发内
+    chunk_chars = LONG_INPUT_CONFIG["chunk_chars"]
+    long_bodies = [(section_index, body) for section_index, (_, body) in enumerate(sections) if len(body) > chunk_chars]
+    total_chars = sum(len(body) for _, body in long_bodies)
+    chunk_chars = min(max(chunk_chars, math.ceil(total_chars / LONG_INPUT_CONFIG["max_chunks"])),
+                      LONG_INPUT_CONFIG["max_chunk_chars"])
+    while True:
+        jobs = []
+        for section_index, body in long_bodies:
+            jobs.extend((section_index, chunk) for chunk in split_into_chunks(body, chunk_chars))
+        # 按段落边界切分时每段不满，段数超出上限则适当加大段长
+        if len(jobs) <= LONG_INPUT_CONFIG["max_chunks"] or chunk_chars >= LONG_INPUT_CONFIG["max_chunk_chars"]:
+            break
+        chunk_chars = min(int(chunk_chars * 1.1) + 1, LONG_INPUT_CONFIG["max_chunk_chars"])
+
+    if not jobs:
+        return {"success": True, "content": content, "summarized": False, "chunks": 0, "failed": 0,
+                "trace_ids": {}, "elapsed_ms": 0}
+
+    # 各段摘要均分 token 预算（按中文字符估算，偏保守），合并后的材料整体不超出预算
+    summary_chars = int(LONG_INPUT_CONFIG["digest_token_budget"] / PROMPT_REDUCTION_CONFIG["cjk_tokens_per_char"] / len(jobs))
+    summary_chars = max(LONG_INPUT_CONFIG["min_summary_chars"], min(LONG_INPUT_CONFIG["summary_chars"], summary_chars))
+
+    start = time.time()
+    total = len(jobs)
+    emit({
+        "type": "progress",
+        "step": "summarizing",
+        "message": f"长文档模式：共 {total} 段，正在并行摘要..."
+    })
+    logger.info(f"长文档摘要开始：{total} 段（每段约 {chunk_chars} 字符，摘要 {summary_chars} 字以内），"
+                f"并发 {min(LONG_INPUT_CONFIG['max_parallel'], total)}")
+
+    summaries = [None] * total
+    trace_ids = {}
+    failed = 0
+    # 有界并发：同时最多 max_parallel 个摘要请求
+    with ThreadPoolExecutor(max_workers=min(LONG_INPUT_CONFIG["max_parallel"], total),
+                            thread_name_prefix="chunk-summary") as pool:
+        futures = {
+            pool.submit(minimax_client.summarize_chunk, chunk, index + 1, total, summary_chars, api_key): index
+            for index, (_, chunk) in enumerate(jobs)
+        }
+        try:
+            for done_count, future in enumerate(as_completed(futures), 1):
+                index = futures[future]
+                result = future.result()
+                if result.get("trace_id"):
+                    trace_ids[index + 1] = result["trace_id"]
+                if result["success"]:
+                    summaries[index] = result["summary"]
+                else:
+                    failed += 1
+                    summaries[index] = jobs[index][1][:summary_chars]
+                    emit({"type": "log", "message": f"⚠️ {result['error']}，使用原文开头代替"})
+                emit({"type": "log", "message": f"已完成 {done_count}/{total} 段摘要"})
+        except BaseException:
+            # 流程被取消时不再等待排队中的摘要请求
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    # 按来源和段落原顺序合并
+    section_summaries = {}
+    for (section_index, _), summary in zip(jobs, summaries):
+        section_summaries.setdefault(section_index, []).append(summary)
+
+    merged_sections = []
+    for section_index, (title, body) in enumerate(sections):
+        body = "\n\n".join(section_summaries[section_index]) if section_index in section_summaries else body
+        merged_sections.append(f"{title}\n{body}" if title else body)
+    digest = SOURCE_SEPARATOR.join(merged_sections)
+
+    elapsed_ms = int((time.time() - start) * 1000)
+    logger.info(f"长文档摘要完成：{total} 段（失败 {failed}），{len(content)} → {len(digest)} 字符，耗时 {elapsed_ms}ms")
+
+    return {
+        "success": failed < total,
+        "content": digest,
+        "summarized": True,
+        "chunks": total,
+        "failed": failed,
+        "trace_ids": trace_ids,
+        "elapsed_ms": elapsed_ms
+    }
@@ -3,8 +3,11 @@ MiniMax API 客户端封装
 统一管理所有 MiniMax API 调用，包括 M2 文本模型、TTS、音色克隆、文生图
 """
 
+import re
 import requests
 import json
+import http.cookiejar
+from requests.adapters import HTTPAdapter
 import logging
 from typing import Iterator, Dict, Any, Optional
 from config import (
@@ -14,6 +17,7 @@ from config import (
     MODELS,
     TTS_AUDIO_SETTINGS,
     IMAGE_GENERATION_CONFIG,
+    MINIMAX_HTTP_CONFIG,
     TIMEOUTS
 )
 
@@ -30,6 +34,14 @@ class MinimaxClient:
         self.other_api_key = MINIMAX_OTHER_API_KEY
         self.endpoints = MINIMAX_API_ENDPOINTS
         self.models = MODELS
+        # 所有请求共享连接池，多个会话/批量任务复用与 API 的 TLS 连接
+        self.http = requests.Session()
+        # 不同用户的 API Key 共用此 Session，拒绝保存任何 Cookie，避免上游的 Set-Cookie 在用户之间重放
+        self.http.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(pool_connections=MINIMAX_HTTP_CONFIG["pool_connections"],
+                              pool_maxsize=MINIMAX_HTTP_CONFIG["pool_maxsize"])
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
 
     def _get_headers(self, api_type: str = "other", api_key: Optional[str] = None) -> Dict[str, str]:
         """
@@ -84,10 +96,6 @@ class MinimaxClient:
         """
         logger.info(f"开始生成播客脚本，内容长度: {len(content)} 字符，目标时长: {duration_min}-{duration_max} 分钟")
 
-        # 文本模型使用用户提供的 API Key
-        url = self.endpoints["text_completion"]
-        headers = self._get_headers("text", api_key=api_key)
-
         # 构建 prompt
         prompt = f"""你是一个专业的播客脚本编写助手。请基于以下材料，生成一段 {duration_min}-{duration_max} 分钟的双人播客对话脚本。
 
@@ -109,6 +117,149 @@ class MinimaxClient:
 
 请开始生成播客脚本。再次强调：输出的对话内容中绝对不能包含任何括号内的动作描述、心理活动或场景说明，如（笑）（停顿）（思考）等，只生成纯对话文本。"""
 
+        yield from self._stream_script_completion(prompt, api_key=api_key)
+
+    def generate_outline(self, content: str, section_count: int, section_minutes: int, api_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        生成长节目大纲（长节目模式的第一步）
+
+        Args:
+            content: 解析后的内容文本
+            section_count: 段落数
+            section_minutes: 每段目标时长（分钟）
+            api_key: 可选的自定义 API Key
+
+        Returns:
+            {"success": bool, "sections": [{"title": 标题, "points": [要点]}], "trace_id": ...}
+        """
+        prompt = f"""你是一个专业的播客策划。请基于以下材料，为一期约 {section_count * section_minutes} 分钟的双人播客设计大纲，
+分成 {section_count} 个段落，每段约 {section_minutes} 分钟，段落之间要有清晰的递进关系，不要重复。
+
+输出要求：只输出 JSON 数组，不要有任何其他文字，格式如下：
+[{{"title": "段落标题", "points": ["要点1", "要点2", "要点3"]}}]
+
+材料内容：
+{content}"""
+
+        url = self.endpoints["text_completion"]
+        headers = self._get_headers("text", api_key=api_key)
+        payload = {
+            "model": self.models["text"],
+            "messages": [
+                {"role": "system", "name": "MiniMax AI"},
+                {"role": "user", "content": prompt}
+            ],
+            "stream": False
+        }
+
+        trace_id = None
+        try:
+            logger.info(f"开始生成长节目大纲：{section_count} 段 × {section_minutes} 分钟")
+            response = self.http.post(url, headers=headers, json=payload, timeout=TIMEOUTS["outline_generation"])
+            trace_id = self._extract_trace_id(response)
+            response.raise_for_status()
+
+            text = response.json().get("choices", [{}])[0].get("message", {}).get("content", "")
+            # 去掉推理模型可能附带的思考过程，截取 JSON 数组部分
+            text = re.sub(r"<think>.*?</think>", "", text, flags=re.S)
+            start, end = text.find("["), text.rfind("]")
+            if start < 0 or end <= start:
+                raise ValueError("大纲中没有 JSON 数组")
+
+            sections = []
+            for item in json.loads(text[start:end + 1]):
+                if isinstance(item, dict) and item.get("title"):
+                    points = item.get("points") or []
+                    sections.append({
+                        "title": str(item["title"]).strip(),
+                        "points": [str(point).strip() for point in points if str(point).strip()]
+                    })
+            if not sections:
+                raise ValueError("大纲为空")
+
+            return {"success": True, "sections": sections[:section_count], "trace_id": trace_id}
+
+        except Exception as e:
+            if trace_id is None and hasattr(e, 'response') and e.response is not None:
+                trace_id = self._extract_trace_id(e.response)
+            error_msg = f"大纲生成失败: {str(e)}"
+            logger.error(error_msg)
+            return {"success": False, "error": error_msg, "trace_id": trace_id}
+
+    def generate_section_script_stream(self,
+                                       content: str,
+                                       sections: list,
+                                       index: int,
+                                       section_minutes: int,
+                                       api_key: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        流式生成长节目中某一段的脚本（各段并行生成）
+
+        Args:
+            content: 解析后的内容文本
+            sections: 完整大纲 [{"title", "points"}]
+            index: 当前段序号（从 0 开始）
+            section_minutes: 本段目标时长（分钟）
+            api_key: 可选的自定义 API Key
+
+        Yields:
+            包含脚本 chunk 和 trace_id 的字典
+        """
+        section = sections[index]
+        total = len(sections)
+        outline_text = "\n".join(f"{i + 1}. {item['title']}" for i, item in enumerate(sections))
+        points_text = "\n".join(f"- {point}" for point in section["points"]) or "- 围绕本段标题展开"
+
+        # 衔接说明：各段并行生成，靠大纲中的前后段标题保持连贯
+        if index == 0:
+            position = "这是节目的第一段：以开场白开始，简单介绍本期话题，然后进入本段内容；结尾自然引出下一段"
+        elif index == total - 1:
+            position = f"这是节目的最后一段：开头用一两句话承接上一段「{sections[index - 1]['title']}」，结尾对整期节目做总结并道别"
+        else:
+            position = (f"这是节目的中间段落：不要开场白和道别，开头用一两句话承接上一段「{sections[index - 1]['title']}」，"
+                        f"结尾自然引出下一段「{sections[index + 1]['title']}」")
+
+        logger.info(f"开始生成第 {index + 1}/{total} 段脚本: {section['title']}")
+
+        prompt = f"""你是一个专业的播客脚本编写助手。一期双人播客分为 {total} 个段落，各段落分别编写。
+请编写第 {index + 1} 段「{section['title']}」的对话脚本，时长约 {section_minutes} 分钟。
+
+播客节目信息：
+- 节目名称：MiniMax AI 播客节目
+- 主持人：Mini（Speaker1）和 Max（Speaker2）
+
+整期大纲：
+{outline_text}
+
+本段要点：
+{points_text}
+
+要求：
+1. {position}
+2. 对话风格：轻松幽默，自然流畅；只讨论本段要点，不要提前展开其他段落的内容
+3. 说话人：Speaker1（Mini，活泼亲切，引导话题）和 Speaker2（Max，稳重专业，深度分析）
+4. 每句话单独一行，格式为：Speaker1: 内容 或 Speaker2: 内容
+5. 不要有多余的说明文字，只输出对话内容
+6. 对话内容中不能包含（笑）（停顿）（思考）等动作、心理活动或场景描述，只生成纯对话文本
+
+材料内容：
+{content}
+
+请开始编写第 {index + 1} 段脚本。"""
+
+        yield from self._stream_script_completion(prompt, api_key=api_key)
+
+    def _stream_script_completion(self, prompt: str, api_key: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        流式调用文本模型生成脚本（整期脚本和长节目分段脚本共用）
+
+        Yields:
+            script_chunk / script_complete / error 事件
+        """
+        # 文本模型使用用户提供的 API Key
+        url = self.endpoints["text_completion"]
+        headers = self._get_headers("text", api_key=api_key)
+
         payload = {
             "model": self.models["text"],
             "messages": [
@@ -123,7 +274,7 @@ class MinimaxClient:
 
         trace_id = None
         try:
-            response = requests.post(
+            response = self.http.post(
                 url,
                 headers=headers,
                 json=payload,
@@ -215,6 +366,64 @@ class MinimaxClient:
                 "trace_id": trace_id
             }
 
+    def summarize_chunk(self, text: str, part: int, total: int, target_chars: int = 800, api_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        摘要长文档中的一段（长文档模式的 map 阶段）
+
+        Args:
+            text: 该段原文
+            part: 段序号（从 1 开始）
+            total: 总段数
+            target_chars: 摘要目标长度
+            api_key: 可选的自定义 API Key
+
+        Returns:
+            包含摘要和 trace_id 的字典
+        """
+        prompt = f"""以下是一份长文档的第 {part}/{total} 部分。请提炼这一部分的核心观点、关键事实、数据和结论，供后续编写播客脚本使用。
+
+要求：
+1. 使用中文，{target_chars} 字以内
+2. 保留具体的数字、人名、机构名和案例
+3. 不要添加原文没有的信息，不要有多余说明
+
+原文：
+{text}
+
+请直接输出摘要："""
+
+        url = self.endpoints["text_completion"]
+        headers = self._get_headers("text", api_key=api_key)
+        payload = {
+            "model": self.models["text"],
+            "messages": [
+                {"role": "system", "name": "MiniMax AI"},
+                {"role": "user", "content": prompt}
+            ],
+            "stream": False
+        }
+
+        trace_id = None
+        try:
+            response = self.http.post(url, headers=headers, json=payload, timeout=TIMEOUTS["chunk_summary"])
+            trace_id = self._extract_trace_id(response)
+            response.raise_for_status()
+
+            summary = response.json().get("choices", [{}])[0].get("message", {}).get("content", "")
+            # 去掉推理模型可能附带的思考过程
+            summary = re.sub(r"<think>.*?</think>", "", summary, flags=re.S).strip()
+            if not summary:
+                raise ValueError("摘要为空")
+
+            return {"success": True, "summary": summary, "trace_id": trace_id}
+
+        except Exception as e:
+            if trace_id is None and hasattr(e, 'response') and e.response is not None:
+                trace_id = self._extract_trace_id(e.response)
+            error_msg = f"第 {part}/{total} 段摘要失败: {str(e)}"
+            logger.error(error_msg)
+            return {"success": False, "error": error_msg, "trace_id": trace_id}
+
     def synthesize_speech_stream(self, text: str, voice_id: str, api_key: Optional[str] = None) -> Iterator[Dict[str, Any]]:
         """
         语音合成（非流式，一次性返回完整音频）
@@ -246,7 +455,7 @@ class MinimaxClient:
 
         trace_id = None
         try:
-            response = requests.post(
+            response = self.http.post(
                 url,
                 headers=headers,
                 json=payload,
@@ -271,6 +480,7 @@ class MinimaxClient:
                 yield {
                     "type": "error",
                     "message": f"语音合成失败: {error_msg}",
+                    "status_code": base_resp.get('status_code'),
                     "trace_id": trace_id
                 }
                 return
@@ -337,7 +547,7 @@ class MinimaxClient:
             with open(audio_file_path, 'rb') as f:
                 files = {'file': f}
                 data = {'purpose': 'voice_clone'}
-                response_upload = requests.post(
+                response_upload = self.http.post(
                     upload_url,
                     headers=headers_upload,
                     data=data,
@@ -368,7 +578,7 @@ class MinimaxClient:
             }
 
             logger.info(f"音色克隆请求 payload: {payload}")
-            response_clone = requests.post(
+            response_clone = self.http.post(
                 clone_url,
                 headers=headers_clone,
                 json=payload,
@@ -410,13 +620,17 @@ class MinimaxClient:
                 "message": f"音色克隆失败: {str(e)}"
             }
 
-    def generate_cover_image(self, content_summary: str, api_key: Optional[str] = None) -> Dict[str, Any]:
+    def generate_cover_image(self,
+                             content_summary: str,
+                             api_key: Optional[str] = None,
+                             image_prompt: Optional[str] = None) -> Dict[str, Any]:
         """
         生成播客封面图
 
         Args:
             content_summary: 内容摘要
             api_key: 可选的自定义 API Key
+            image_prompt: 已生成的图片描述（提供时跳过文本模型生成 Prompt，直接生成图片）
 
         Returns:
             包含图片 URL 和 trace_id 的字典
@@ -434,42 +648,45 @@ class MinimaxClient:
 
         text_trace_id = None
         try:
-            # Step 1: 调用 M2 生成 prompt（文本模型使用用户提供的 API Key）
-            logger.info("开始生成封面图 Prompt...")
-            url_text = self.endpoints["text_completion"]
-            headers_text = self._get_headers("text", api_key=api_key)
-
-            payload_text = {
-                "model": self.models["text"],
-                "messages": [
-                    {"role": "system", "name": "MiniMax AI"},
-                    {"role": "user", "content": prompt_generation_prompt}
-                ],
-                "stream": False
-            }
+            if image_prompt:
+                logger.info(f"使用已提供的图片 Prompt: {image_prompt}")
+            else:
+                # Step 1: 调用 M2 生成 prompt（文本模型使用用户提供的 API Key）
+                logger.info("开始生成封面图 Prompt...")
+                url_text = self.endpoints["text_completion"]
+                headers_text = self._get_headers("text", api_key=api_key)
+
+                payload_text = {
+                    "model": self.models["text"],
+                    "messages": [
+                        {"role": "system", "name": "MiniMax AI"},
+                        {"role": "user", "content": prompt_generation_prompt}
+                    ],
+                    "stream": False
+                }
 
-            logger.info(f"发送 Prompt 生成请求到: {url_text}")
-            response_text = requests.post(
-                url_text,
-                headers=headers_text,
-                json=payload_text,
-                timeout=TIMEOUTS["cover_prompt_generation"]
-            )
+                logger.info(f"发送 Prompt 生成请求到: {url_text}")
+                response_text = self.http.post(
+                    url_text,
+                    headers=headers_text,
+                    json=payload_text,
+                    timeout=TIMEOUTS["cover_prompt_generation"]
+                )
 
-            # 立即提取 Trace ID
-            text_trace_id = self._extract_trace_id(response_text)
-            logger.info(f"Prompt 生成响应状态码: {response_text.status_code}")
+                # 立即提取 Trace ID
+                text_trace_id = self._extract_trace_id(response_text)
+                logger.info(f"Prompt 生成响应状态码: {response_text.status_code}")
 
-            response_text.raise_for_status()
+                response_text.raise_for_status()
 
-            text_result = response_text.json()
-            image_prompt = text_result.get("choices", [{}])[0].get("message", {}).get("content", "")
+                text_result = response_text.json()
+                image_prompt = text_result.get("choices", [{}])[0].get("message", {}).get("content", "")
 
-            logger.info(f"生成的图片 Prompt: {image_prompt}")
+                logger.info(f"生成的图片 Prompt: {image_prompt}")
 
-            if not image_prompt:
-                image_prompt = "一男一女两个人坐在播客录音室里，漫画风格"
-                logger.info(f"使用默认 Prompt: {image_prompt}")
+                if not image_prompt:
+                    image_prompt = "一男一女两个人坐在播客录音室里，漫画风格"
+                    logger.info(f"使用默认 Prompt: {image_prompt}")
 
             # Step 2: 调用文生图 API
             logger.info("开始生成封面图...")
@@ -492,7 +709,7 @@ class MinimaxClient:
             logger.info(f"图像生成 API: {url_image}")
             logger.info(f"图像生成请求 payload: {payload_image}")
 
-            response_image = requests.post(
+            response_image = self.http.post(
                 url_image,
                 headers=headers_image,
                 json=payload_image,
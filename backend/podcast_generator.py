@@ -1,29 +1,62 @@
 """
 播客生成核心逻辑
 协调并行任务、流式脚本生成与语音合成同步
+各阶段以依赖图的形式调度，输入就绪即并发执行
 """
 
 import os
+import re
+import shutil
+import math
 import time
 import logging
 import threading
-from typing import Dict, Any, Iterator
-from queue import Queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, Optional
+from pydub import AudioSegment
 from config import (
     BGM_FILES,
     WELCOME_TEXT,
     WELCOME_VOICE_ID,
     PODCAST_CONFIG,
-    OUTPUT_DIR
+    PROMPT_REDUCTION_CONFIG,
+    COVER_PROMPT_CONFIG,
+    LONG_INPUT_CONFIG,
+    LONG_FORM_CONFIG,
+    SCRIPT_INPUT_CONFIG,
+    PIPELINE_QUEUE_CONFIG,
+    TIMEOUTS,
+    OUTPUT_DIR,
+    SPOOL_DIR,
+    VOICE_CLONE_CACHE_CONFIG
 )
 from minimax_client import minimax_client
 from content_parser import content_parser
 from voice_manager import voice_manager
-from audio_utils import create_podcast_with_bgm, save_sentence_audio
+from audio_utils import (
+    load_bgm,
+    save_sentence_audio,
+    submit_decode_normalized,
+    submit_export,
+    submit_create_podcast_with_bgm,
+    submit_export_pcm_snapshot,
+    PcmSpool
+)
+from stage_queue import create_stage_queue, StageQueueClosed
+from tts_scheduler import tts_scheduler, TTSSessionClosed
+from stage_graph import StageGraph, StageError
+from prompt_reducer import reduce_content, estimate_tokens
+from long_input import summarize_long_content
+from episode_cache import episode_cache
+from cover_prompt import build_cover_prompt
+from cover_store import cover_store
+from segment_store import segment_store
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_SCRIPT_INPUT_LINE_RE = re.compile(r'^\s*Speaker\s*([12])\s*[:：]\s*(.*?)\s*$', re.IGNORECASE)
+
 
 class PodcastGenerator:
     """播客生成器"""
@@ -69,6 +102,57 @@ class PodcastGenerator:
             return True
         return False
 
+    def _iter_script_sentences(self, script_events: Iterator[Dict[str, Any]]) -> Iterator[tuple]:
+        """
+        把流式脚本 chunk 切分为完整句子
+
+        Yields:
+            ("sentence", speaker, text) / ("complete", trace_id) / ("error", message)
+        """
+        script_buffer = ""
+        for script_event in script_events:
+            if script_event["type"] == "script_chunk":
+                script_buffer += script_event["content"]
+
+                # 检查是否形成完整句子
+                while self._is_complete_sentence(script_buffer):
+                    # 提取完整句子
+                    if '\n' in script_buffer:
+                        line, script_buffer = script_buffer.split('\n', 1)
+                    else:
+                        line = script_buffer
+                        script_buffer = ""
+
+                    if line.strip():
+                        speaker, text = self._parse_speaker_line(line)
+                        if speaker and text:
+                            yield ("sentence", speaker, text)
+
+            elif script_event["type"] == "script_complete":
+                # 处理剩余buffer
+                if script_buffer.strip():
+                    speaker, text = self._parse_speaker_line(script_buffer)
+                    if speaker and text:
+                        yield ("sentence", speaker, text)
+                yield ("complete", script_event.get("trace_id"))
+
+            elif script_event["type"] == "error":
+                yield ("error", script_event.get("message"))
+
+    def parse_script_text(self, script_text: str) -> list:
+        """
+        解析脚本输入（每行 "SpeakerN: 文本"，与保存的 script_*.txt 格式一致）
+
+        Returns:
+            [(speaker, text)]，无法识别的行和空文本行被忽略
+        """
+        lines = []
+        for line in script_text.splitlines():
+            match = _SCRIPT_INPUT_LINE_RE.match(line)
+            if match and match.group(2):
+                lines.append((f"Speaker{match.group(1)}", match.group(2)))
+        return lines
+
     def generate_podcast_stream(self,
                                 content: str,
                                 speaker1_voice_id: str,
@@ -88,358 +172,942 @@ class PodcastGenerator:
         Yields:
             包含各种事件的字典
         """
-        # 语音 ID 映射
-        voice_mapping = {
-            "Speaker1": speaker1_voice_id,
-            "Speaker2": speaker2_voice_id
-        }
+        graph = StageGraph(session_id)
+        graph.add_stage("content", lambda emit, results: content)
+        graph.add_stage("voices", lambda emit, results: {"speaker1": speaker1_voice_id, "speaker2": speaker2_voice_id})
+        yield from self.generate_podcast_graph(graph, session_id, api_key)
+
+    def generate_podcast_graph(self,
+                               graph: StageGraph,
+                               session_id: str,
+                               api_key: str,
+                               long_input: bool = False,
+                               long_form_minutes: int = None,
+                               script_input: bool = False,
+                               intro_assets: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        在阶段图上追加播客生成阶段并流式输出事件
+
+        各阶段在依赖就绪后立即并发执行：
+            intro（欢迎语 + 开场音频）     无依赖（前端事件等 episode 有结果后再发送，命中时丢弃）
+            memo（查找脚本缓存）            依赖 content
+            episode（查找节目缓存）         依赖 memo、voice_ids（没有该阶段时为 voices；命中时关闭流水线，直接回放已生成的节目）
+            digest（长文档分段摘要）        依赖 content、memo
+            reduce（Prompt 精简）          依赖 digest
+            script / cover                依赖 reduce、memo（命中脚本缓存时不调用模型）
+            tts                           依赖 voices、episode
+            （长节目模式下 script / tts 换成：outline 依赖 reduce，sections 依赖 outline，
+              各段并行生成脚本，音色就绪后各自合成，按段落顺序交给混音）
+            （脚本输入模式下 script / tts 换成：lines 依赖 content，tts 依赖 lines、voices、episode，
+              不调用文本模型，全部句子立即并行合成）
+            mix                           依赖 intro（渐进式音频以开场音频开头）
+            encode                        无依赖（消费混音快照）
+
+        Args:
+            graph: 已添加 "content"（返回合并后的内容）和 "voices"
+                   （返回 {"speaker1": 音色 ID, "speaker2": 音色 ID}）阶段的阶段图；
+                   可选的 "voice_ids" 阶段返回同样格式、无需克隆即可确定的音色 ID（未知时为 None），
+                   节目缓存查找只等待它
+            session_id: 会话 ID
+            api_key: 用户提供的 MiniMax API Key
+            long_input: 长文档模式（内容超出 token 预算时先并行分段摘要）
+            long_form_minutes: 长节目模式的目标时长（分钟），为空时生成普通的短节目
+            script_input: 脚本输入模式（"content" 阶段返回的是 "SpeakerN: 文本" 格式的脚本）
+            intro_assets: 多个节目共享的开场素材字典（批量生成时传入，首个节目合成欢迎语后写入，之后的节目直接复用）
+
+        Yields:
+            包含各种事件的字典
 
-        # 存储所有音频 chunk
-        all_audio_chunks = []
+        句子音频和渐进式音频暂存在会话的磁盘缓冲目录（SPOOL_DIR/<session_id>），结束或中断后删除
+        """
+        spool_dir = os.path.join(SPOOL_DIR, session_id)
+        os.makedirs(spool_dir, exist_ok=True)
+        try:
+            yield from self._generate_podcast_graph(graph, session_id, api_key, long_input, long_form_minutes,
+                                                    script_input, intro_assets, spool_dir)
+        finally:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+    def _generate_podcast_graph(self,
+                                graph: StageGraph,
+                                session_id: str,
+                                api_key: str,
+                                long_input: bool,
+                                long_form_minutes: Optional[int],
+                                script_input: bool,
+                                intro_assets: Optional[Dict[str, Any]],
+                                spool_dir: str) -> Iterator[Dict[str, Any]]:
+        """generate_podcast_graph 的实现（spool_dir 为本次生成的磁盘缓冲目录）"""
+        # 各句音频写入磁盘缓冲目录（按顺序），合并完整音频时由音频进程池读取；整数项为段间静音（毫秒）
+        dialogue_audio_files = []
         all_script_lines = []
+        script_records = []  # [speaker, text]，用于写入脚本缓存
+        section_records = []  # 长节目各段的句子，用于写入脚本缓存
+        sentence_segments = []  # 各句音频文件和时长，用于保存句子片段
+        script_status = {"complete": False, "tts_failed": False}
+        replaying = threading.Event()  # 命中节目缓存，停止生成
+        script_preview = []  # 最先生成的几句脚本，用于本地生成封面 Prompt
+        script_preview_ready = threading.Event()
         trace_ids = {}
 
-        # 渐进式音频文件路径和内存中的 AudioSegment 对象
+        # 渐进式音频文件路径
         progressive_filename = f"progressive_{session_id}.mp3"
         progressive_path = os.path.join(OUTPUT_DIR, progressive_filename)
-        progressive_audio_in_memory = None  # 在内存中累积,避免多次 MP3 编码/解码
-
-        # Step 1: 生成并播放欢迎音频
-        yield {
-            "type": "progress",
-            "step": "welcome_audio",
-            "message": "正在播放欢迎音频..."
-        }
 
-        # 播放 BGM01
-        yield {
-            "type": "bgm",
-            "bgm_type": "bgm01",
-            "path": self.bgm01_path
-        }
+        # 有界阶段队列：脚本/后处理 → TTS → 混音 → 编码，保证长脚本下内存有界
+        sentence_queue = create_stage_queue("sentence", PIPELINE_QUEUE_CONFIG["sentence"])  # 待合成的句子队列
+        tts_audio_queue = create_stage_queue("tts", PIPELINE_QUEUE_CONFIG["tts"])  # 已合成待混音的句子音频
+        encode_queue = create_stage_queue("encode", PIPELINE_QUEUE_CONFIG["encode"])  # 待导出的渐进式音频快照
+        stage_queues = [sentence_queue, tts_audio_queue, encode_queue]
 
-        # 合成欢迎语
-        welcome_audio_chunks = []
-        for tts_event in minimax_client.synthesize_speech_stream(self.welcome_text, self.welcome_voice_id, api_key=api_key):
-            if tts_event["type"] == "audio_chunk":
-                welcome_audio_chunks.append(tts_event["audio"])
-                # 不发送 audio chunk 到前端（数据太大，前端不需要）
-            elif tts_event["type"] == "tts_complete":
-                trace_ids["welcome_tts"] = tts_event.get("trace_id")
-                yield {
-                    "type": "trace_id",
-                    "api": "欢迎语合成",
-                    "trace_id": tts_event.get("trace_id")
-                }
+        def close_stage_queues():
+            for stage_queue in stage_queues:
+                stage_queue.close()
+            tts_scheduler.unregister_session(session_id)
 
-        # 播放 BGM02（淡出）
-        yield {
-            "type": "bgm",
-            "bgm_type": "bgm02_fadeout",
-            "path": self.bgm02_path
-        }
+        # 流程失败或客户端断开时关闭队列，让各阶段尽快退出
+        graph.on_cancel(close_stage_queues)
 
-        # 合并 BGM1 + 欢迎语 + BGM2 作为开场音频
-        logger.info("开始生成开场音频（BGM1 + 欢迎语 + BGM2）")
-        logger.info(f"欢迎语音频 chunks 数量: {len(welcome_audio_chunks)}")
-        try:
-            from pydub import AudioSegment
-            from pydub.effects import normalize
-
-            logger.info(f"加载 BGM01: {self.bgm01_path}")
-            bgm01 = AudioSegment.from_file(self.bgm01_path)
-            logger.info(f"BGM01 时长: {len(bgm01)}ms")
-
-            logger.info(f"加载 BGM02: {self.bgm02_path}")
-            bgm02 = AudioSegment.from_file(self.bgm02_path).fade_out(1000)
-            logger.info(f"BGM02 时长: {len(bgm02)}ms")
-
-            # 转换欢迎语音频
-            from audio_utils import hex_to_audio_segment
-            welcome_audio = AudioSegment.empty()
-            for i, chunk_hex in enumerate(welcome_audio_chunks):
-                logger.info(f"处理欢迎语 chunk {i + 1}/{len(welcome_audio_chunks)}")
-                chunk = hex_to_audio_segment(chunk_hex)
-                if chunk:
-                    welcome_audio += chunk
-                    logger.info(f"欢迎语累计时长: {len(welcome_audio)}ms")
-
-            logger.info(f"欢迎语总时长: {len(welcome_audio)}ms")
-
-            # 对欢迎语音频进行 normalize 并调整到 -18 dB
-            if len(welcome_audio) > 0:
-                welcome_audio = normalize(welcome_audio)
-                logger.info(f"欢迎语音频已标准化，音量: {welcome_audio.dBFS:.2f} dBFS")
-                target_dBFS = -18.0
-                change_in_dBFS = target_dBFS - welcome_audio.dBFS
-                welcome_audio = welcome_audio.apply_gain(change_in_dBFS)
-                logger.info(f"欢迎语音量已调整到 -18 dB，实际: {welcome_audio.dBFS:.2f} dBFS")
-
-            # 对 BGM 也调整到 -18 dB
-            bgm01_adjusted = bgm01.apply_gain(-18.0 - bgm01.dBFS)
-            bgm02_adjusted = bgm02.apply_gain(-18.0 - bgm02.dBFS)
+        def pipeline_stopped():
+            return graph.cancelled or replaying.is_set()
 
-            # 合并：BGM1 + 欢迎语 + BGM2（所有部分都已经是 -18 dB）
-            intro_audio = bgm01_adjusted + welcome_audio + bgm02_adjusted
-            logger.info(f"开场音频总时长: {len(intro_audio)}ms，音量: {intro_audio.dBFS:.2f} dBFS")
+        def preview_script_line(text):
+            """收集脚本开头的句子，够数后通知封面阶段"""
+            if not script_preview_ready.is_set():
+                script_preview.append(text)
+                if len(script_preview) >= COVER_PROMPT_CONFIG["script_lines"]:
+                    script_preview_ready.set()
 
-            # 保存到内存
-            progressive_audio_in_memory = intro_audio
+        graph.on_cancel(script_preview_ready.set)
 
-            # 导出到文件（仅用于前端播放）
-            logger.info(f"开始导出开场音频到渐进式文件: {progressive_path}")
-            progressive_audio_in_memory.export(progressive_path, format="mp3")
-            logger.info(f"开场音频已保存到: {progressive_path}")
+        def put_complete(stage_queue):
+            """向下游发送完成信号（下游已关闭时忽略）"""
+            try:
+                stage_queue.put(("complete", None, None))
+            except StageQueueClosed:
+                pass
+
+        def episode_hit():
+            """节目缓存查找已完成且命中"""
+            episode = graph.result("episode") if graph.is_finished("episode") else None
+            return bool(episode and episode["record"])
+
+        # 开场阶段：合成欢迎语并生成开场音频（不依赖内容和音色，请求一开始就执行）
+        # 发往前端的事件先暂存，节目缓存查找有结果后再发送；命中时全部丢弃，也不导出开场音频
+        def intro_stage(emit, results):
+            empty_intro = {"welcome_audio_chunks": [], "intro_audio": None}
+            if pipeline_stopped() or episode_hit():
+                return empty_intro
+
+            held_events = [
+                {
+                    "type": "progress",
+                    "step": "welcome_audio",
+                    "message": "正在播放欢迎音频..."
+                },
+                # 播放 BGM01
+                {
+                    "type": "bgm",
+                    "bgm_type": "bgm01",
+                    "path": self.bgm01_path
+                }
+            ]
+
+            # 合成欢迎语（新会话在跨会话 TTS 调度中优先级最高）；批量生成时复用同一批次已生成的开场素材
+            shared_intro = intro_assets.get("intro") if intro_assets is not None else None
+            welcome_audio_chunks, intro_audio = shared_intro or ([], None)
+            welcome_tts_complete = False
+            if shared_intro is None:
+                try:
+                    with tts_scheduler.slot(session_id):
+                        for tts_event in minimax_client.synthesize_speech_stream(self.welcome_text, self.welcome_voice_id, api_key=api_key):
+                            if tts_event["type"] == "audio_chunk":
+                                welcome_audio_chunks.append(tts_event["audio"])
+                                # 不发送 audio chunk 到前端（数据太大，前端不需要）
+                            elif tts_event["type"] == "tts_complete":
+                                trace_ids["welcome_tts"] = tts_event.get("trace_id")
+                                welcome_tts_complete = True
+                except TTSSessionClosed:
+                    logger.info("🎬 [开场阶段] 会话已结束，停止欢迎语合成")
+                    return empty_intro
+                except Exception as e:
+                    # 欢迎语失败不影响正文，混音阶段从空音频开始
+                    logger.error(f"欢迎语合成失败: {str(e)}")
+
+            if welcome_tts_complete:
+                held_events.append({
+                    "type": "trace_id",
+                    "api": "欢迎语合成",
+                    "trace_id": trace_ids.get("welcome_tts")
+                })
+
+            # 播放 BGM02（淡出）
+            held_events.append({
+                "type": "bgm",
+                "bgm_type": "bgm02_fadeout",
+                "path": self.bgm02_path
+            })
+
+            # 合并 BGM1 + 欢迎语 + BGM2 作为开场音频
+            logger.info("开始生成开场音频（BGM1 + 欢迎语 + BGM2）")
+            logger.info(f"欢迎语音频 chunks 数量: {len(welcome_audio_chunks)}")
+            try:
+                if intro_audio is None:
+                    logger.info(f"加载 BGM01: {self.bgm01_path}")
+                    bgm01 = load_bgm(self.bgm01_path)
+                    logger.info(f"BGM01 时长: {len(bgm01)}ms")
+
+                    logger.info(f"加载 BGM02: {self.bgm02_path}")
+                    bgm02 = load_bgm(self.bgm02_path).fade_out(1000)
+                    logger.info(f"BGM02 时长: {len(bgm02)}ms")
+
+                    # 转换欢迎语音频，normalize 并调整到 -18 dB（在音频进程池中执行）
+                    welcome_audio = submit_decode_normalized(welcome_audio_chunks, -18.0).result()
+                    logger.info(f"欢迎语总时长: {len(welcome_audio)}ms，音量: {welcome_audio.dBFS:.2f} dBFS")
+
+                    # 对 BGM 也调整到 -18 dB
+                    bgm01_adjusted = bgm01.apply_gain(-18.0 - bgm01.dBFS)
+                    bgm02_adjusted = bgm02.apply_gain(-18.0 - bgm02.dBFS)
+
+                    # 合并：BGM1 + 欢迎语 + BGM2（所有部分都已经是 -18 dB）
+                    intro_audio = bgm01_adjusted + welcome_audio + bgm02_adjusted
+                    logger.info(f"开场音频总时长: {len(intro_audio)}ms，音量: {intro_audio.dBFS:.2f} dBFS")
+                    if welcome_tts_complete and intro_assets is not None:
+                        intro_assets.setdefault("intro", (welcome_audio_chunks, intro_audio))
+                else:
+                    logger.info("🎬 [开场阶段] 复用本批次已生成的开场音频")
+            except Exception as e:
+                logger.error(f"生成开场音频失败: {str(e)}")
+                logger.exception("详细错误:")
 
-            # 发送渐进式音频 URL
-            yield {
-                "type": "progressive_audio",
-                "audio_url": f"/download/audio/{progressive_filename}?t={int(time.time())}",
-                "duration_ms": len(intro_audio),
-                "message": "开场音频已生成（BGM1 + 欢迎语 + BGM2）"
-            }
-            logger.info("开场音频 URL 已发送到前端")
-        except Exception as e:
-            logger.error(f"生成开场音频失败: {str(e)}")
-            logger.exception("详细错误:")
+            # 等待节目缓存查找（只依赖内容和音色 ID，不等待音色克隆）；命中或流程已停止时不发送任何开场事件
+            graph.result("episode")
+            if pipeline_stopped() or episode_hit():
+                logger.info("🎬 [开场阶段] 命中节目缓存或流程已停止，丢弃开场音频")
+                return empty_intro
 
-        # Step 2: 并发开始脚本生成和封面生成
-        yield {
-            "type": "progress",
-            "step": "script_generation",
-            "message": "正在生成播客脚本和封面..."
-        }
+            for event in held_events:
+                emit(event)
+            if intro_audio is None:
+                return {"welcome_audio_chunks": welcome_audio_chunks, "intro_audio": None}
 
-        script_buffer = ""
-        current_speaker = None
-        current_text = ""
-        sentence_queue = Queue()  # 待合成的句子队列
-        cover_result = {"success": False}  # 封面生成结果
-
-        # 封面生成线程（并发）
-        def cover_generation_thread():
-            nonlocal cover_result
             try:
-                logger.info("🎨 [封面线程] 开始执行封面生成任务（并发）")
-                # 提取内容摘要（取前500字符）
-                content_summary = content[:500] if len(content) > 500 else content
-
-                cover_result = minimax_client.generate_cover_image(content_summary, api_key=api_key)
-
-                # 发送 Trace IDs
-                if cover_result.get("text_trace_id"):
-                    trace_ids["cover_prompt_generation"] = cover_result.get("text_trace_id")
+                # 导出到文件（仅用于前端播放）
+                logger.info(f"开始导出开场音频到渐进式文件: {progressive_path}")
+                submit_export(intro_audio, progressive_path, "mp3").result()
+                logger.info(f"开场音频已保存到: {progressive_path}")
+                tts_scheduler.update_buffered_audio(session_id, len(intro_audio))
+
+                # 发送渐进式音频 URL
+                emit({
+                    "type": "progressive_audio",
+                    "audio_url": f"/download/audio/{progressive_filename}?t={int(time.time())}",
+                    "duration_ms": len(intro_audio),
+                    "message": "开场音频已生成（BGM1 + 欢迎语 + BGM2）"
+                })
+                tts_scheduler.mark_playback_started(session_id)
+                logger.info("开场音频 URL 已发送到前端")
+            except Exception as e:
+                logger.error(f"导出开场音频失败: {str(e)}")
+                logger.exception("详细错误:")
 
-                if cover_result.get("image_trace_id"):
-                    trace_ids["cover_image_generation"] = cover_result.get("image_trace_id")
+            return {"welcome_audio_chunks": welcome_audio_chunks, "intro_audio": intro_audio}
 
-                logger.info(f"🎨 [封面线程] 封面生成完成，成功={cover_result['success']}")
+        # 脚本缓存阶段：合并内容和脚本设置未变化时复用已生成的脚本，只重新合成语音
+        def memo_stage(emit, results):
+            script_key = episode_cache.script_key(results["content"], long_input, long_form_minutes, script_input)
+            cached_script = None
+            try:
+                cached_script = episode_cache.get_script(script_key)
             except Exception as e:
-                logger.error(f"🎨 [封面线程] 封面生成线程异常: {str(e)}")
-                logger.exception("详细错误:")
+                logger.warning(f"读取脚本缓存失败: {str(e)}")
+            if cached_script:
+                emit({
+                    "type": "log",
+                    "message": f"命中脚本缓存：复用已生成的脚本（{len(cached_script['lines'])} 句），跳过脚本生成"
+                })
+            return {"script_key": script_key, "script": cached_script}
+
+        # 节目缓存阶段：内容、音色和音频设置都未变化时关闭流水线，由主线程回放已生成的节目
+        # 音色 ID 优先取 "voice_ids" 阶段（无需克隆即可确定），不等待音色克隆完成
+        lookup_voices = "voice_ids" if graph.has_stage("voice_ids") else "voices"
+
+        def episode_stage(emit, results):
+            memo = results["memo"]
+            voices = results[lookup_voices]
+            if not voices["speaker1"] or not voices["speaker2"]:
+                # 需要重新克隆的音色会得到新的 Voice ID，不可能命中
+                return {"record": None}
+            episode_key = episode_cache.episode_key(memo["script_key"], voices["speaker1"], voices["speaker2"])
+            record = None
+            if memo["script"]:
+                try:
+                    record = episode_cache.get_episode(episode_key)
+                except Exception as e:
+                    logger.warning(f"读取节目缓存失败: {str(e)}")
+            if record:
+                logger.info(f"♻️ [节目缓存] 命中 {episode_key[:12]}，停止生成并回放已生成的节目")
+                replaying.set()
+                close_stage_queues()
+            return {"record": record}
+
+        # 长文档摘要阶段：内容超出预算时分段并行摘要，让脚本覆盖全文而不是只看开头
+        def digest_stage(emit, results):
+            content = results["content"]
+            if results["memo"]["script"] or script_input:
+                # 已有脚本，摘要只会用于封面，不再调用模型
+                return content
+            if not long_input or estimate_tokens(content) <= LONG_INPUT_CONFIG["digest_token_budget"]:
+                return content
+
+            digest = summarize_long_content(content, api_key=api_key, emit=emit)
+            for part, trace_id in digest["trace_ids"].items():
+                trace_ids[f"chunk_summary_{part}"] = trace_id
+            if not digest["success"]:
+                emit({"type": "log", "message": "⚠️ 分段摘要全部失败，改用截断后的原文生成脚本"})
+                return content
+
+            if digest["summarized"]:
+                emit({
+                    "type": "log",
+                    "message": f"分段摘要完成：{digest['chunks']} 段，{len(content)} → {len(digest['content'])} 字符，"
+                               f"耗时 {digest['elapsed_ms'] / 1000:.1f} 秒"
+                })
+            return digest["content"]
+
+        # Prompt 精简阶段：去除样板和重复行并按 token 预算截断，缩短脚本模型的首 token 延迟
+        def reduce_stage(emit, results):
+            content = results["digest"]
+            if not PROMPT_REDUCTION_CONFIG["enabled"]:
+                return content
+
+            # 长文档模式的摘要材料已按 digest_token_budget 控制长度，使用同一预算，避免截掉文档后半部分
+            reduction = reduce_content(content, LONG_INPUT_CONFIG["digest_token_budget"] if long_input else None)
+            emit({
+                "type": "prompt_reduction",
+                "tokens_before": reduction["tokens_before"],
+                "tokens_after": reduction["tokens_after"],
+                "chars_before": reduction["chars_before"],
+                "chars_after": reduction["chars_after"],
+                "duplicates_removed": reduction["duplicates_removed"],
+                "boilerplate_removed": reduction["boilerplate_removed"],
+                "truncated": reduction["truncated"]
+            })
+            emit({
+                "type": "log",
+                "message": f"内容精简：约 {reduction['tokens_before']} → {reduction['tokens_after']} tokens"
+                           f"（去除重复 {reduction['duplicates_removed']} 行、样板 {reduction['boilerplate_removed']} 行"
+                           f"{'，已按预算截断' if reduction['truncated'] else ''}）"
+            })
+            return reduction["content"]
+
+        # 封面生成阶段（内容就绪即开始，不等待音色和开场音频）
+        def cover_stage(emit, results):
+            cached_script = results["memo"]["script"]
+            if cached_script and cached_script["cover"]:
+                logger.info("🎨 [封面阶段] 复用缓存的封面")
+                return dict(cached_script["cover"], success=True)
+
+            logger.info("🎨 [封面阶段] 开始执行封面生成任务（并发）")
+            content = results["reduce"]
+            # 提取内容摘要（取前500字符）
+            content_summary = content[:500] if len(content) > 500 else content
+
+            # 本地生成图片 Prompt，省去一次文本模型调用，图片生成与 TTS 并行
+            image_prompt = None
+            if COVER_PROMPT_CONFIG["mode"] == "script":
+                script_preview_ready.wait(COVER_PROMPT_CONFIG["script_wait_seconds"])
+                image_prompt = build_cover_prompt("\n".join(script_preview) or content_summary)
+            elif COVER_PROMPT_CONFIG["mode"] == "keywords":
+                image_prompt = build_cover_prompt(content_summary)
+
+            cover_result = minimax_client.generate_cover_image(content_summary, api_key=api_key,
+                                                               image_prompt=image_prompt)
+
+            # 记录 Trace IDs
+            if cover_result.get("text_trace_id"):
+                trace_ids["cover_prompt_generation"] = cover_result.get("text_trace_id")
+
+            if cover_result.get("image_trace_id"):
+                trace_ids["cover_image_generation"] = cover_result.get("image_trace_id")
+
+            # 立即保存到本地，之后从磁盘提供，不再每次经代理访问图片地址
+            if cover_result["success"]:
+                stored = cover_store.fetch(cover_result["image_url"], session_id)
+                if stored["success"]:
+                    cover_result["filename"] = stored["filename"]
+                    cover_result["local_url"] = stored["local_url"]
+                    # 预览和列表使用缩小的紧凑格式版本
+                    cover_result["variants"] = cover_store.make_variants(stored["filename"])
+
+            logger.info(f"🎨 [封面阶段] 封面生成完成，成功={cover_result['success']}")
+            return cover_result
+
+        # 脚本生成阶段（同时完成按行切分的后处理）
+        def script_stage(emit, results):
+            emit({
+                "type": "progress",
+                "step": "script_generation",
+                "message": "正在生成播客脚本和封面..."
+            })
 
-        # 脚本生成线程
-        def script_generation_thread():
-            nonlocal script_buffer
             try:
-                logger.info("📝 [脚本线程] 开始执行脚本生成任务")
-                for script_event in minimax_client.generate_script_stream(
-                    content,
+                cached_script = results["memo"]["script"]
+                if cached_script:
+                    logger.info("📝 [脚本阶段] 使用缓存的脚本")
+                    for speaker, text in cached_script["lines"]:
+                        sentence_queue.put(("sentence", speaker, text))
+                        preview_script_line(text)
+                    script_status["complete"] = True
+                    put_complete(sentence_queue)
+                    return
+
+                logger.info("📝 [脚本阶段] 开始执行脚本生成任务")
+                script_events = minimax_client.generate_script_stream(
+                    results["reduce"],
                     PODCAST_CONFIG["target_duration_min"],
                     PODCAST_CONFIG["target_duration_max"],
                     api_key=api_key
-                ):
-                    if script_event["type"] == "script_chunk":
-                        chunk = script_event["content"]
-                        script_buffer += chunk
-
-                        # 检查是否形成完整句子
-                        while self._is_complete_sentence(script_buffer):
-                            # 提取完整句子
-                            if '\n' in script_buffer:
-                                line, script_buffer = script_buffer.split('\n', 1)
-                            else:
-                                line = script_buffer
-                                script_buffer = ""
-
-                            if line.strip():
-                                speaker, text = self._parse_speaker_line(line)
-                                if speaker and text:
-                                    sentence_queue.put(("sentence", speaker, text))
-                                    logger.info(f"入队句子: {speaker}: {text[:30]}...")
-
-                    elif script_event["type"] == "script_complete":
-                        # 处理剩余buffer
-                        if script_buffer.strip():
-                            speaker, text = self._parse_speaker_line(script_buffer)
-                            if speaker and text:
-                                sentence_queue.put(("sentence", speaker, text))
-
-                        trace_ids["script_generation"] = script_event.get("trace_id")
+                )
+                for item in self._iter_script_sentences(script_events):
+                    if item[0] == "sentence":
+                        _, speaker, text = item
+                        # 队列达到高水位时在此阻塞，脚本生成不会无限领先于语音合成
+                        sentence_queue.put(("sentence", speaker, text))
+                        preview_script_line(text)
+                        logger.info(f"入队句子: {speaker}: {text[:30]}...")
+
+                    elif item[0] == "complete":
+                        trace_ids["script_generation"] = item[1]
+                        script_status["complete"] = True
                         logger.info("脚本生成完成，发送完成信号")
-                        sentence_queue.put(("complete", None, None))
+                        put_complete(sentence_queue)
 
-                    elif script_event["type"] == "error":
-                        logger.error(f"脚本生成错误: {script_event.get('message')}")
+                    else:
+                        logger.error(f"脚本生成错误: {item[1]}")
                         # 发送错误后仍需要发送完成信号
-                        sentence_queue.put(("complete", None, None))
+                        put_complete(sentence_queue)
 
+            except StageQueueClosed:
+                logger.info("📝 [脚本阶段] 下游队列已关闭，停止脚本生成")
             except Exception as e:
-                logger.error(f"脚本生成线程异常: {str(e)}")
+                logger.error(f"脚本生成阶段异常: {str(e)}")
                 logger.exception("详细错误:")
-                # 确保发送完成信号，避免主线程永久阻塞
-                sentence_queue.put(("complete", None, None))
-
-        # 启动脚本生成线程和封面生成线程（并发）
-        script_thread = threading.Thread(target=script_generation_thread)
-        cover_thread = threading.Thread(target=cover_generation_thread)
-
-        logger.info("🚀 准备启动两个并发线程：脚本生成 + 封面生成")
-        script_thread.start()
-        logger.info("📝 [主线程] 脚本生成线程已启动")
-        cover_thread.start()
-        logger.info("🎨 [主线程] 封面生成线程已启动")
-
-        # 主线程：消费句子队列，进行语音合成
-        tts_sentence_count = 0  # 总句子数
-        update_counter = 0  # 累积计数器（用于判断是否需要发送更新）
-        import math
-
-        while True:
-            item = sentence_queue.get()
-            if item[0] == "complete":
-                break
-
-            _, speaker, text = item
-            tts_sentence_count += 1
-
-            # 发送脚本内容到前端
-            full_line = f"{speaker}: {text}"
-            all_script_lines.append(full_line)
-            yield {
-                "type": "script_chunk",
-                "speaker": speaker,
-                "text": text,
-                "full_line": full_line
+                # 确保发送完成信号，避免下游永久阻塞
+                put_complete(sentence_queue)
+            finally:
+                # 脚本不足预期句数时封面阶段不再等待
+                script_preview_ready.set()
+
+        voice_replacements = {}  # 已失效的克隆音色 -> 重新克隆得到的音色
+
+        def synthesize_sentence(text, voice_id):
+            """合成一句话，返回 (音频 chunk 列表, 其余 TTS 事件)；克隆音色失效时重新克隆后重试一次"""
+            for attempt in range(2):
+                voice_id = voice_replacements.get(voice_id, voice_id)
+                sentence_audio_chunks = []
+                tts_events = []
+                # 合成额度由跨会话调度器分配：领先播放进度越多的会话越靠后
+                with tts_scheduler.slot(session_id):
+                    for tts_event in minimax_client.synthesize_speech_stream(text, voice_id, api_key=api_key):
+                        if tts_event["type"] == "audio_chunk":
+                            # 不发送 audio_chunk 到前端（数据太大，前端也不需要）
+                            sentence_audio_chunks.append(tts_event["audio"])
+                        else:
+                            tts_events.append(tts_event)
+
+                invalid_voice = any(tts_event["type"] == "error" and
+                                    tts_event.get("status_code") in VOICE_CLONE_CACHE_CONFIG["invalid_voice_status_codes"]
+                                    for tts_event in tts_events)
+                if sentence_audio_chunks or not invalid_voice or attempt > 0:
+                    break
+                new_voice_id = voice_manager.recover_voice(voice_id, api_key=api_key)
+                if not new_voice_id:
+                    break
+                voice_replacements[voice_id] = new_voice_id
+            return sentence_audio_chunks, tts_events
+
+        # TTS 阶段：消费句子队列，进行语音合成（音色就绪后开始）
+        def tts_stage(emit, results):
+            if results["episode"]["record"]:
+                # 命中节目缓存：队列已关闭，但其中剩余的句子仍可取出，不再合成
+                return
+            voices = results["voices"]
+            # 语音 ID 映射
+            voice_mapping = {
+                "Speaker1": voices["speaker1"],
+                "Speaker2": voices["speaker2"]
             }
 
-            # 获取对应音色
-            voice_id = voice_mapping.get(speaker, speaker1_voice_id)
+            tts_sentence_count = 0  # 总句子数
+            try:
+                while True:
+                    item = sentence_queue.get()
+                    if item[0] == "complete":
+                        break
+
+                    _, speaker, text = item
+                    tts_sentence_count += 1
+
+                    # 发送脚本内容到前端
+                    full_line = f"{speaker}: {text}"
+                    emit({
+                        "type": "script_chunk",
+                        "speaker": speaker,
+                        "text": text,
+                        "full_line": full_line
+                    })
+
+                    # 获取对应音色
+                    voice_id = voice_mapping.get(speaker, voices["speaker1"])
+
+                    # 语音合成，音频与其余事件一并交给混音阶段按顺序处理
+                    sentence_audio_chunks, tts_events = synthesize_sentence(text, voice_id)
+                    tts_audio_queue.put(("sentence", (tts_sentence_count, speaker, full_line), (sentence_audio_chunks, tts_events)))
+            except (StageQueueClosed, TTSSessionClosed):
+                logger.info("🔊 [TTS阶段] 队列已关闭，停止语音合成")
+            except Exception as e:
+                logger.error(f"TTS 阶段异常: {str(e)}")
+                logger.exception("详细错误:")
+            finally:
+                put_complete(tts_audio_queue)
+
+        # 脚本输入阶段：解析用户提供的脚本，不调用文本模型
+        def lines_stage(emit, results):
+            lines = self.parse_script_text(results["content"])[:SCRIPT_INPUT_CONFIG["max_lines"]]
+            if not lines:
+                raise StageError('脚本中没有可识别的 "Speaker1: 文本" / "Speaker2: 文本" 行')
+            for _, text in lines:
+                preview_script_line(text)
+            script_preview_ready.set()
+            script_status["complete"] = True
+            emit({"type": "log", "message": f"脚本输入：共 {len(lines)} 句，跳过脚本生成，全部句子并行合成"})
+            return lines
+
+        # 并行 TTS 阶段：全部句子已知，立即提交合成，按原顺序交给混音
+        def parallel_tts_stage(emit, results):
+            if results["episode"]["record"]:
+                return
+            lines = results["lines"]
+            voices = results["voices"]
+            voice_mapping = {
+                "Speaker1": voices["speaker1"],
+                "Speaker2": voices["speaker2"]
+            }
 
-            # 流式语音合成
-            sentence_audio_chunks = []
-            for tts_event in minimax_client.synthesize_speech_stream(text, voice_id, api_key=api_key):
-                if tts_event["type"] == "audio_chunk":
-                    audio_chunk = tts_event["audio"]
-                    sentence_audio_chunks.append(audio_chunk)
-                    all_audio_chunks.append(audio_chunk)
+            emit({
+                "type": "progress",
+                "step": "script_generation",
+                "message": f"正在并行合成 {len(lines)} 句..."
+            })
+            tts_pool = ThreadPoolExecutor(max_workers=SCRIPT_INPUT_CONFIG["max_parallel_tts"],
+                                          thread_name_prefix=f"script-tts-{session_id[:8]}")
+            futures = [tts_pool.submit(synthesize_sentence, text, voice_mapping.get(speaker, voices["speaker1"]))
+                       for speaker, text in lines]
+            try:
+                for sentence_number, ((speaker, text), future) in enumerate(zip(lines, futures), 1):
+                    sentence_audio_chunks, tts_events = future.result()
+                    full_line = f"{speaker}: {text}"
+                    emit({
+                        "type": "script_chunk",
+                        "speaker": speaker,
+                        "text": text,
+                        "full_line": full_line
+                    })
+                    tts_audio_queue.put(("sentence", (sentence_number, speaker, full_line), (sentence_audio_chunks, tts_events)))
+            except (StageQueueClosed, TTSSessionClosed):
+                logger.info("🔊 [并行TTS阶段] 队列已关闭，停止语音合成")
+            except Exception as e:
+                logger.error(f"并行 TTS 阶段异常: {str(e)}")
+                logger.exception("详细错误:")
+            finally:
+                tts_pool.shutdown(wait=False, cancel_futures=True)
+                put_complete(tts_audio_queue)
 
-                    # 不发送 audio_chunk 到前端（数据太大，前端也不需要）
-                    # 前端只需要 complete 事件中的最终音频 URL
+        section_minutes = LONG_FORM_CONFIG["section_minutes"]
 
-                elif tts_event["type"] == "tts_complete":
-                    trace_id = tts_event.get("trace_id")
-                    trace_ids[f"tts_sentence_{tts_sentence_count}"] = trace_id
-                    yield {
-                        "type": "trace_id",
-                        "api": f"{speaker} 第 {tts_sentence_count} 句合成",
-                        "trace_id": trace_id
+        # 长节目大纲阶段：确定段落划分，各段据此并行生成
+        def outline_stage(emit, results):
+            emit({
+                "type": "progress",
+                "step": "outline_generation",
+                "message": "正在生成节目大纲..."
+            })
+            cached_script = results["memo"]["script"]
+            if cached_script and cached_script.get("sections"):
+                # 缓存的各段脚本随大纲一起交给分段阶段
+                sections = [{"title": section["title"], "points": [], "lines": section["lines"]}
+                            for section in cached_script["sections"]]
+                emit({
+                    "type": "outline",
+                    "sections": [section["title"] for section in sections],
+                    "section_minutes": section_minutes
+                })
+                return sections
+
+            section_count = max(1, round(long_form_minutes / section_minutes))
+            outline = minimax_client.generate_outline(results["reduce"], section_count, section_minutes, api_key=api_key)
+            if outline.get("trace_id"):
+                trace_ids["outline_generation"] = outline["trace_id"]
+
+            if outline["success"]:
+                sections = outline["sections"]
+            else:
+                # 大纲失败时按材料顺序平均分段，仍然并行生成
+                emit({"type": "log", "message": f"⚠️ {outline['error']}，按材料顺序分段生成"})
+                sections = [{"title": f"第 {index + 1} 部分", "points": [f"按材料顺序讲解第 {index + 1}/{section_count} 部分的内容"]}
+                            for index in range(section_count)]
+
+            emit({
+                "type": "outline",
+                "sections": [section["title"] for section in sections],
+                "section_minutes": section_minutes
+            })
+            emit({"type": "log", "message": f"节目大纲：{len(sections)} 段，" + "、".join(section["title"] for section in sections)})
+            return sections
+
+        # 长节目分段阶段：每段独立的脚本流 + TTS 通道并行执行，按段落顺序拼接后交给混音
+        # 只依赖大纲，脚本生成不等待音色克隆；各段 TTS 通道在音色就绪后开始
+        def sections_stage(emit, results):
+            sections = results["outline"]
+            content = graph.result("reduce")
+            total = len(sections)
+
+            emit({
+                "type": "progress",
+                "step": "script_generation",
+                "message": f"正在并行生成 {total} 段脚本和封面..."
+            })
+
+            # 每段的输出通道：已合成的句子按顺序缓存，直到拼接到该段
+            # 有界：后面的段落最多领先几句，之后阻塞到拼接进度赶上（段落按顺序提交到线程池，不会死锁）
+            lanes = [create_stage_queue(f"section_{index + 1}", PIPELINE_QUEUE_CONFIG["section"]) for index in range(total)]
+            stage_queues.extend(lanes)
+            if pipeline_stopped():
+                for lane in lanes:
+                    lane.close()
+            section_records.extend({"title": section["title"], "lines": []} for section in sections)
+            section_errors = []
+
+            def run_section(index):
+                lane = lanes[index]
+                section_sentences = create_stage_queue(f"section_{index + 1}_sentence", PIPELINE_QUEUE_CONFIG["sentence"])
+                stage_queues.append(section_sentences)
+                if pipeline_stopped():
+                    section_sentences.close()
+
+                # 脚本线程：流式生成本段脚本并切分句子
+                def script_worker():
+                    try:
+                        if sections[index].get("lines") is not None:
+                            for speaker, text in sections[index]["lines"]:
+                                section_sentences.put(("sentence", speaker, text))
+                                if index == 0:
+                                    preview_script_line(text)
+                            return
+
+                        script_events = minimax_client.generate_section_script_stream(
+                            content, sections, index, section_minutes, api_key=api_key
+                        )
+                        for item in self._iter_script_sentences(script_events):
+                            if item[0] == "sentence":
+                                section_sentences.put(("sentence", item[1], item[2]))
+                                if index == 0:
+                                    preview_script_line(item[2])
+                            elif item[0] == "complete":
+                                trace_ids[f"section_{index + 1}_script"] = item[1]
+                            else:
+                                section_errors.append(index)
+                                logger.error(f"第 {index + 1} 段脚本生成错误: {item[1]}")
+                                emit({"type": "log", "message": f"⚠️ 第 {index + 1} 段脚本生成失败: {item[1]}"})
+                    except StageQueueClosed:
+                        pass
+                    except Exception as e:
+                        section_errors.append(index)
+                        logger.error(f"第 {index + 1} 段脚本生成异常: {str(e)}")
+                    finally:
+                        put_complete(section_sentences)
+                        if index == 0:
+                            script_preview_ready.set()
+
+                threading.Thread(target=script_worker, name=f"section-{index + 1}-script", daemon=True).start()
+
+                # 本段 TTS 通道
+                try:
+                    episode = graph.result("episode")
+                    if not episode or episode["record"]:
+                        # 音色准备失败（流程已取消）或命中节目缓存
+                        section_sentences.close()
+                        return
+                    voices = graph.result("voices")
+                    voice_mapping = {
+                        "Speaker1": voices["speaker1"],
+                        "Speaker2": voices["speaker2"]
                     }
-
-                    # 立即追加到渐进式音频文件
+                    while True:
+                        item = section_sentences.get()
+                        if item[0] == "complete":
+                            break
+                        _, speaker, text = item
+                        voice_id = voice_mapping.get(speaker, voices["speaker1"])
+                        lane.put(("sentence", (speaker, text), synthesize_sentence(text, voice_id)))
+                except (StageQueueClosed, TTSSessionClosed):
+                    section_sentences.close()
+                except Exception as e:
+                    logger.error(f"第 {index + 1} 段 TTS 异常: {str(e)}")
+                    section_sentences.close()
+                finally:
+                    put_complete(lane)
+
+            # 按段落顺序提交，同时最多 max_parallel_sections 段在生成
+            section_pool = ThreadPoolExecutor(max_workers=LONG_FORM_CONFIG["max_parallel_sections"],
+                                              thread_name_prefix=f"sections-{session_id[:8]}")
+            for index in range(total):
+                section_pool.submit(run_section, index)
+
+            # 拼接：依次转发各段句子，全局句子编号连续
+            sentence_count = 0
+            try:
+                for index, lane in enumerate(lanes):
+                    emit({
+                        "type": "section_progress",
+                        "index": index,
+                        "total": total,
+                        "title": sections[index]["title"],
+                        "message": f"第 {index + 1}/{total} 段：{sections[index]['title']}"
+                    })
+                    section_start = sentence_count
+                    if sentence_count > 0:
+                        # 段与段之间插入停顿
+                        tts_audio_queue.put(("gap", LONG_FORM_CONFIG["section_gap_ms"]))
+                    while True:
+                        item = lane.get()
+                        if item[0] == "complete":
+                            break
+                        _, (speaker, text), (sentence_audio_chunks, tts_events) = item
+                        sentence_count += 1
+                        section_records[index]["lines"].append([speaker, text])
+                        full_line = f"{speaker}: {text}"
+                        emit({
+                            "type": "script_chunk",
+                            "speaker": speaker,
+                            "text": text,
+                            "full_line": full_line
+                        })
+                        tts_audio_queue.put(("sentence", (sentence_count, speaker, full_line), (sentence_audio_chunks, tts_events)))
+                    logger.info(f"🧩 [分段阶段] 第 {index + 1}/{total} 段已拼接，{sentence_count - section_start} 句")
+                script_status["complete"] = not section_errors
+            except StageQueueClosed:
+                logger.info("🧩 [分段阶段] 队列已关闭，停止拼接")
+            finally:
+                section_pool.shutdown(wait=False, cancel_futures=True)
+                put_complete(tts_audio_queue)
+
+        # 混音阶段：在开场音频之后按顺序累积句子音频，并决定何时导出渐进式音频
+        def mix_stage(emit, results):
+            if pipeline_stopped():
+                # 命中节目缓存或流程已取消：缓冲目录可能已被删除
+                put_complete(encode_queue)
+                return None
+            # 渐进式音频追加写入磁盘缓冲（PCM，避免多次 MP3 解码），整期音频不常驻内存；开场音频生成失败时从空音频开始
+            progressive_spool = PcmSpool(os.path.join(spool_dir, "progressive.pcm"))
+            progressive_spool.append(results["intro"]["intro_audio"] or AudioSegment.empty())
+            update_counter = 0  # 累积计数器（用于判断是否需要发送更新）
+            try:
+                while True:
+                    item = tts_audio_queue.get()
+                    if item[0] == "complete":
+                        break
+                    if item[0] == "gap":
+                        progressive_spool.append(AudioSegment.silent(duration=item[1]))
+                        dialogue_audio_files.append(item[1])
+                        continue
+
+                    _, (tts_sentence_count, speaker, full_line), (sentence_audio_chunks, tts_events) = item
+                    all_script_lines.append(full_line)
+                    script_records.append([speaker, full_line[len(speaker) + 2:]])
+                    # 句子音频写入缓冲目录，不在内存中保留整期的十六进制数据
+                    sentence_file = None
                     if sentence_audio_chunks:
-                        try:
-                            from pydub import AudioSegment
-                            from pydub.effects import normalize
-                            from audio_utils import hex_to_audio_segment
-
-                            # 转换句子音频
-                            sentence_audio = AudioSegment.empty()
-                            for chunk_hex in sentence_audio_chunks:
-                                chunk = hex_to_audio_segment(chunk_hex)
-                                if chunk is not None:
-                                    sentence_audio += chunk
-
-                            # 对单句进行 normalize，然后调整到目标音量
-                            if len(sentence_audio) > 0:
-                                sentence_audio = normalize(sentence_audio)
-                                logger.info(f"句子 {tts_sentence_count} 音频已标准化，音量: {sentence_audio.dBFS:.2f} dBFS")
-
-                                # 将单句调整到目标音量 -18 dB
-                                target_dBFS = -18.0
-                                change_in_dBFS = target_dBFS - sentence_audio.dBFS
-                                sentence_audio = sentence_audio.apply_gain(change_in_dBFS)
-                                logger.info(f"句子 {tts_sentence_count} 音量已调整到 -18 dB，实际: {sentence_audio.dBFS:.2f} dBFS")
-
-                            # 在内存中追加（避免多次 MP3 编码/解码）
-                            progressive_audio_in_memory = progressive_audio_in_memory + sentence_audio
-                            logger.info(f"句子 {tts_sentence_count} 已追加到内存，当前总时长: {len(progressive_audio_in_memory)}ms，音量: {progressive_audio_in_memory.dBFS:.2f} dBFS")
-
-                            # 渐进式累积策略：控制何时发送 progressive_audio 事件
-                            update_counter += 1
-                            should_send_update = False
-
-                            if tts_sentence_count == 1:
-                                # 第一句：立即发送（用户需要尽快听到内容）
-                                should_send_update = True
-                                logger.info(f"[后端渐进式] 第 {tts_sentence_count} 句，立即发送更新")
-                            elif tts_sentence_count <= 3:
-                                # 第 2-3 句：每 2 句发送一次
-                                if update_counter >= 2:
-                                    should_send_update = True
-                                    update_counter = 0
-                                    logger.info(f"[后端渐进式] 第 {tts_sentence_count} 句，累积 2 句，发送更新")
-                                else:
-                                    logger.info(f"[后端渐进式] 第 {tts_sentence_count} 句，累积 {update_counter} 句，暂不发送")
-                            elif tts_sentence_count <= 8:
-                                # 第 4-8 句：每 3 句发送一次
-                                if update_counter >= 3:
-                                    should_send_update = True
-                                    update_counter = 0
-                                    logger.info(f"[后端渐进式] 第 {tts_sentence_count} 句，累积 3 句，发送更新")
-                                else:
-                                    logger.info(f"[后端渐进式] 第 {tts_sentence_count} 句，累积 {update_counter} 句，暂不发送")
-                            else:
-                                # 第 9 句之后：每 4 句发送一次
-                                if update_counter >= 4:
-                                    should_send_update = True
-                                    update_counter = 0
-                                    logger.info(f"[后端渐进式] 第 {tts_sentence_count} 句，累积 4 句，发送更新")
-                                else:
-                                    logger.info(f"[后端渐进式] 第 {tts_sentence_count} 句，累积 {update_counter} 句，暂不发送")
-
-                            # 只有在需要发送时才导出到文件并发送事件
-                            if should_send_update:
-                                # 导出当前内存中的音频到文件
-                                progressive_audio_in_memory.export(progressive_path, format="mp3")
-                                logger.info(f"第 {tts_sentence_count} 句：导出到渐进式文件，时长: {len(progressive_audio_in_memory)}ms")
-
-                                yield {
-                                    "type": "progressive_audio",
-                                    "audio_url": f"/download/audio/{progressive_filename}?t={int(time.time())}",
-                                    "duration_ms": len(progressive_audio_in_memory),
-                                    "sentence_number": tts_sentence_count,
-                                    "message": f"第 {tts_sentence_count} 句已添加到播客，播客时长: {math.ceil(len(progressive_audio_in_memory) / 1000)}秒"
-                                }
-                        except Exception as e:
-                            logger.error(f"追加句子 {tts_sentence_count} 到渐进式音频失败: {str(e)}")
-
-                elif tts_event["type"] == "error":
-                    # TTS 错误，也记录 Trace ID
-                    if tts_event.get("trace_id"):
-                        trace_ids[f"tts_sentence_{tts_sentence_count}_error"] = tts_event.get("trace_id")
-                        yield {
-                            "type": "trace_id",
-                            "api": f"{speaker} 第 {tts_sentence_count} 句合成（失败）",
-                            "trace_id": tts_event.get("trace_id")
-                        }
-                    # 转发错误事件
-                    yield tts_event
-
-        # 等待脚本生成线程完成
-        logger.info("📝 [主线程] 等待脚本生成线程完成...")
-        script_thread.join()
-        logger.info("📝 [主线程] 脚本生成线程已完成")
+                        sentence_file = os.path.join(spool_dir, f"{len(sentence_segments):04d}.mp3")
+                        with open(sentence_file, 'wb') as f:
+                            f.write(bytes.fromhex(''.join(sentence_audio_chunks)))
+                        dialogue_audio_files.append(sentence_file)
+                    sentence_segments.append({"audio_file": sentence_file, "duration_ms": 0})
+
+                    for tts_event in tts_events:
+                        if tts_event["type"] == "tts_complete":
+                            trace_id = tts_event.get("trace_id")
+                            trace_ids[f"tts_sentence_{tts_sentence_count}"] = trace_id
+                            emit({
+                                "type": "trace_id",
+                                "api": f"{speaker} 第 {tts_sentence_count} 句合成",
+                                "trace_id": trace_id
+                            })
+
+                            # 立即追加到渐进式音频
+                            if sentence_audio_chunks:
+                                try:
+                                    # 转换句子音频，单句 normalize 后调整到目标音量 -18 dB（在音频进程池中执行）
+                                    sentence_audio = submit_decode_normalized(sentence_audio_chunks, -18.0).result()
+                                    sentence_segments[-1]["duration_ms"] = len(sentence_audio)
+                                    logger.info(f"句子 {tts_sentence_count} 音量已调整到 -18 dB，时长: {len(sentence_audio)}ms")
+
+                                    # 追加到磁盘缓冲（避免多次 MP3 编码/解码）
+                                    progressive_spool.append(sentence_audio)
+                                    logger.info(f"句子 {tts_sentence_count} 已追加到缓冲，当前总时长: {progressive_spool.duration_ms}ms")
+
+                                    # 渐进式累积策略：控制何时发送 progressive_audio 事件
+                                    update_counter += 1
+                                    should_send_update = False
+
+                                    if tts_sentence_count == 1:
+                                        # 第一句：立即发送（用户需要尽快听到内容）
+                                        should_send_update = True
+                                        logger.info(f"[后端渐进式] 第 {tts_sentence_count} 句，立即发送更新")
+                                    elif tts_sentence_count <= 3:
+                                        # 第 2-3 句：每 2 句发送一次
+                                        if update_counter >= 2:
+                                            should_send_update = True
+                                            update_counter = 0
+                                            logger.info(f"[后端渐进式] 第 {tts_sentence_count} 句，累积 2 句，发送更新")
+                                        else:
+                                            logger.info(f"[后端渐进式] 第 {tts_sentence_count} 句，累积 {update_counter} 句，暂不发送")
+                                    elif tts_sentence_count <= 8:
+                                        # 第 4-8 句：每 3 句发送一次
+                                        if update_counter >= 3:
+                                            should_send_update = True
+                                            update_counter = 0
+                                            logger.info(f"[后端渐进式] 第 {tts_sentence_count} 句，累积 3 句，发送更新")
+                                        else:
+                                            logger.info(f"[后端渐进式] 第 {tts_sentence_count} 句，累积 {update_counter} 句，暂不发送")
+                                    else:
+                                        # 第 9 句之后：每 4 句发送一次
+                                        if update_counter >= 4:
+                                            should_send_update = True
+                                            update_counter = 0
+                                            logger.info(f"[后端渐进式] 第 {tts_sentence_count} 句，累积 4 句，发送更新")
+                                        else:
+                                            logger.info(f"[后端渐进式] 第 {tts_sentence_count} 句，累积 {update_counter} 句，暂不发送")
+
+                                    # 只有在需要发送时才交给编码阶段导出（快照只记录已写入的字节数，缓冲文件只追加）
+                                    if should_send_update:
+                                        encode_queue.put(("snapshot", tts_sentence_count, progressive_spool.snapshot()))
+                                except StageQueueClosed:
+                                    raise
+                                except Exception as e:
+                                    logger.error(f"追加句子 {tts_sentence_count} 到渐进式音频失败: {str(e)}")
+
+                        elif tts_event["type"] == "error":
+                            script_status["tts_failed"] = True
+                            # TTS 错误，也记录 Trace ID
+                            if tts_event.get("trace_id"):
+                                trace_ids[f"tts_sentence_{tts_sentence_count}_error"] = tts_event.get("trace_id")
+                                emit({
+                                    "type": "trace_id",
+                                    "api": f"{speaker} 第 {tts_sentence_count} 句合成（失败）",
+                                    "trace_id": tts_event.get("trace_id")
+                                })
+                            # 转发错误事件
+                            emit(tts_event)
+            except StageQueueClosed:
+                logger.info("🎚️ [混音阶段] 队列已关闭，停止混音")
+            except Exception as e:
+                logger.error(f"混音阶段异常: {str(e)}")
+                logger.exception("详细错误:")
+            finally:
+                put_complete(encode_queue)
+            return progressive_spool
+
+        # 编码阶段：将渐进式音频快照导出为 MP3 并通知前端
+        def encode_stage(emit, results):
+            try:
+                while True:
+                    item = encode_queue.get()
+                    if item[0] == "complete":
+                        break
+
+                    _, sentence_number, snapshot = item
+                    try:
+                        submit_export_pcm_snapshot(snapshot, progressive_path, "mp3").result()
+                        logger.info(f"第 {sentence_number} 句：导出到渐进式文件，时长: {snapshot['duration_ms']}ms")
+                        tts_scheduler.update_buffered_audio(session_id, snapshot["duration_ms"])
+                        tts_scheduler.mark_playback_started(session_id)
+
+                        emit({
+                            "type": "progressive_audio",
+                            "audio_url": f"/download/audio/{progressive_filename}?t={int(time.time())}",
+                            "duration_ms": snapshot["duration_ms"],
+                            "sentence_number": sentence_number,
+                            "message": f"第 {sentence_number} 句已添加到播客，播客时长: {math.ceil(snapshot['duration_ms'] / 1000)}秒"
+                        })
+                    except Exception as e:
+                        logger.error(f"导出第 {sentence_number} 句渐进式音频失败: {str(e)}")
+            except StageQueueClosed:
+                logger.info("💾 [编码阶段] 队列已关闭，停止导出")
+
+        graph.add_stage("intro", intro_stage, critical=False)
+        graph.add_stage("memo", memo_stage, deps=["content"])
+        graph.add_stage("episode", episode_stage, deps=["memo", lookup_voices])
+        graph.add_stage("digest", digest_stage, deps=["content", "memo"])
+        graph.add_stage("reduce", reduce_stage, deps=["digest"])
+        graph.add_stage("cover", cover_stage, deps=["reduce", "memo"], critical=False)
+        if script_input:
+            graph.add_stage("lines", lines_stage, deps=["content"])
+            graph.add_stage("tts", parallel_tts_stage, deps=["lines", "voices", "episode"])
+            script_stages = ["lines", "tts"]
+        elif long_form_minutes:
+            graph.add_stage("outline", outline_stage, deps=["reduce", "memo"])
+            graph.add_stage("sections", sections_stage, deps=["outline"])
+            script_stages = ["sections"]
+        else:
+            graph.add_stage("script", script_stage, deps=["reduce", "memo"], critical=False)
+            graph.add_stage("tts", tts_stage, deps=["voices", "episode"])
+            script_stages = ["script", "tts"]
+        graph.add_stage("mix", mix_stage, deps=["intro"])
+        graph.add_stage("encode", encode_stage)
+
+        logger.info("🚀 启动阶段图：开场音频 + 脚本生成 + 封面生成 + TTS/混音/编码流水线")
+        graph.start()
+
+        # 主线程：转发各阶段产生的事件，直到编码阶段结束
+        pipeline_finished = False
+        try:
+            yield from graph.stream_events(until=["encode"])
+            pipeline_finished = True
+        finally:
+            if not pipeline_finished:
+                # 客户端断开：取消流程，关闭队列让各阶段尽快退出
+                graph.cancel()
+            close_stage_queues()
+
+        # 前置阶段（解析、音色准备）失败时已发送 error 事件
+        if graph.failed:
+            return
+
+        episode = graph.result("episode") or {}
+        if episode.get("record"):
+            yield from self._replay_episode(episode["record"], graph.timings())
+            return
+
+        progressive_spool = graph.result("mix")
+
+        # 阶段延迟统计
+        pipeline_stats = [stage_queue.stats() for stage_queue in stage_queues]
+        for stats in pipeline_stats:
+            logger.info(f"📊 [流水线] {stats['stage']}: 最大深度 {stats['max_depth']}/{stats['maxsize']}，"
+                        f"平均排队 {stats['avg_lag_ms']}ms，最大排队 {stats['max_lag_ms']}ms，"
+                        f"生产者阻塞 {stats['producer_blocked_ms']}ms")
+        yield {
+            "type": "pipeline_stats",
+            "stages": pipeline_stats
+        }
+
+        # 等待脚本生成阶段完成
+        logger.info("📝 [主线程] 等待脚本生成阶段完成...")
+        for stage_name in script_stages:
+            graph.result(stage_name)
+        logger.info("📝 [主线程] 脚本生成阶段已完成")
 
         yield {
             "type": "progress",
@@ -447,13 +1115,36 @@ class PodcastGenerator:
             "message": "脚本生成完成"
         }
 
-        yield {
-            "type": "trace_id",
-            "api": "脚本生成",
-            "trace_id": trace_ids.get("script_generation")
-        }
+        if long_form_minutes:
+            for index in range(1, len(graph.result("outline") or []) + 1):
+                yield {
+                    "type": "trace_id",
+                    "api": f"第 {index} 段脚本生成",
+                    "trace_id": trace_ids.get(f"section_{index}_script")
+                }
+        elif not script_input:
+            yield {
+                "type": "trace_id",
+                "api": "脚本生成",
+                "trace_id": trace_ids.get("script_generation")
+            }
 
-        # Step 3: 立即添加结尾 BGM 到渐进式音频（所有对话合成完毕后）
+        # Step 3: 立即在音频进程池中合并完整播客音频，与结尾 BGM 导出、封面等待并行
+        output_filename = f"podcast_{session_id}_{int(time.time())}.mp3"
+        output_path = os.path.join(OUTPUT_DIR, output_filename)
+        script_filename = f"script_{session_id}_{int(time.time())}.txt"
+        script_path = os.path.join(OUTPUT_DIR, script_filename)
+        intro_result = graph.result("intro") or {}
+        welcome_audio_hex = ''.join(intro_result.get("welcome_audio_chunks", []))
+        final_audio_future = submit_create_podcast_with_bgm(
+            bgm01_path=self.bgm01_path,
+            bgm02_path=self.bgm02_path,
+            welcome_audio_hex=welcome_audio_hex,
+            dialogue_audio_files=dialogue_audio_files,
+            output_path=output_path
+        )
+
+        # Step 4: 添加结尾 BGM 到渐进式音频（所有对话合成完毕后）
         logger.info("🎵 [主线程] 开始添加结尾 BGM（立即执行，不等封面）")
         yield {
             "type": "progress",
@@ -462,52 +1153,108 @@ class PodcastGenerator:
         }
 
         try:
-            from pydub import AudioSegment
-
             # 加载 BGM 并调整到 -18 dB
-            bgm01 = AudioSegment.from_file(self.bgm01_path)
-            bgm02 = AudioSegment.from_file(self.bgm02_path).fade_out(1000)
+            bgm01 = load_bgm(self.bgm01_path)
+            bgm02 = load_bgm(self.bgm02_path).fade_out(1000)
 
             bgm01_adjusted = bgm01.apply_gain(-18.0 - bgm01.dBFS)
             bgm02_adjusted = bgm02.apply_gain(-18.0 - bgm02.dBFS)
             logger.info(f"🎵 BGM1 音量: {bgm01_adjusted.dBFS:.2f} dBFS, BGM2 音量: {bgm02_adjusted.dBFS:.2f} dBFS")
 
-            # 在内存中追加结尾 BGM
-            progressive_audio_in_memory = progressive_audio_in_memory + bgm01_adjusted + bgm02_adjusted
-            logger.info(f"🎵 [主线程] 结尾 BGM 已追加到内存，最终播客时长: {len(progressive_audio_in_memory)}ms，音量: {progressive_audio_in_memory.dBFS:.2f} dBFS")
+            # 追加结尾 BGM 到缓冲
+            progressive_spool.append(bgm01_adjusted)
+            progressive_spool.append(bgm02_adjusted)
+            progressive_spool.close()
+            logger.info(f"🎵 [主线程] 结尾 BGM 已追加到缓冲，最终播客时长: {progressive_spool.duration_ms}ms")
 
             # 导出最终版本到文件
-            progressive_audio_in_memory.export(progressive_path, format="mp3")
+            submit_export_pcm_snapshot(progressive_spool.snapshot(), progressive_path, "mp3").result()
             logger.info(f"🎵 最终播客已导出到文件: {progressive_path}")
 
             # 发送最终音频更新
             yield {
                 "type": "progressive_audio",
                 "audio_url": f"/download/audio/{progressive_filename}?t={int(time.time())}",
-                "duration_ms": len(progressive_audio_in_memory),
+                "duration_ms": progressive_spool.duration_ms,
                 "message": "结尾音乐已添加"
             }
         except Exception as e:
             logger.error(f"🎵 [主线程] 添加结尾 BGM 失败: {str(e)}")
 
-        # Step 4: 等待封面生成完成（封面在后台并发生成）
-        # 检查封面线程是否还在运行
-        logger.info("🎨 [主线程] 检查封面线程状态...")
-        if cover_thread.is_alive():
+        # Step 5: 等待完整音频合并完成后立即发送完成事件，不等待封面
+        yield {
+            "type": "progress",
+            "step": "audio_merging",
+            "message": "正在合并完整播客音频..."
+        }
+
+        try:
+            with open(script_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(all_script_lines))
+
+            final_audio_future.result()
+        except Exception as e:
+            logger.error(f"音频合并失败: {str(e)}")
             yield {
-                "type": "progress",
-                "step": "waiting_cover",
-                "message": "正在等待封面生成完成..."
+                "type": "error",
+                "message": f"音频合并失败: {str(e)}"
             }
-            logger.info("🎨 [主线程] 封面线程仍在运行，等待完成...")
-        else:
-            logger.info("🎨 [主线程] 封面线程已完成")
+            return
 
-        # 等待封面生成线程完成
-        cover_thread.join()
-        logger.info("🎨 [主线程] 封面线程已 join 完成")
+        # 句子片段在后台保存（片段文件从缓冲目录移走，须在完整音频合并之后），之后可只重新合成个别句子
+        manifest_future = self._save_segments(graph, session_id, output_filename, script_filename,
+                                              script_records, sentence_segments, welcome_audio_hex)
+        episode_id = session_id if segment_store.enabled else ""
 
-        # 发送封面相关的 Trace ID
+        # 封面已生成时随完成事件一起发送，否则在完成事件之后补发
+        cover_result = (graph.result("cover") if graph.is_finished("cover") else None) or {"success": False}
+        cover_sent = graph.is_finished("cover")
+        if cover_sent:
+            yield from self._cover_events(cover_result)
+
+        yield {
+            "type": "complete",
+            "audio_path": output_path,
+            "audio_url": f"/download/audio/{output_filename}",
+            "script_path": script_path,
+            "script_url": f"/download/script/{script_filename}",
+            "cover_url": cover_result.get("image_url", ""),
+            "cover_local_url": cover_result.get("local_url", ""),
+            "episode_id": episode_id,
+            "trace_ids": trace_ids,
+            "stage_timings": graph.timings(),
+            "message": "播客生成完成！"
+        }
+
+        # Step 6: 封面仍在生成时最多再等 cover_after_complete 秒（客户端断开时也保存缓存）
+        try:
+            if not cover_sent:
+                logger.info("🎨 [主线程] 完成事件已发送，封面阶段仍在运行，继续等待...")
+                yield {
+                    "type": "progress",
+                    "step": "waiting_cover",
+                    "message": "播客已完成，封面仍在生成..."
+                }
+                cover_result = graph.result("cover", timeout=TIMEOUTS["cover_after_complete"]) or {"success": False}
+                if graph.is_finished("cover"):
+                    yield from self._cover_events(cover_result)
+                else:
+                    logger.info("🎨 [主线程] 封面超过等待时间，不再发送")
+                    yield {
+                        "type": "progress",
+                        "step": "cover_timeout",
+                        "message": "封面生成超时，已跳过"
+                    }
+        finally:
+            # 缓冲目录在生成器结束时删除，先等片段保存完成
+            if not manifest_future.result():
+                episode_id = ""
+            self._store_episode(graph, script_status, script_records, section_records, cover_result,
+                                output_filename, script_filename, progressive_spool.duration_ms if progressive_spool else 0,
+                                episode_id)
+
+    def _cover_events(self, cover_result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """封面相关的 Trace ID 和结果事件"""
         if cover_result.get("text_trace_id"):
             yield {
                 "type": "trace_id",
@@ -522,11 +1269,12 @@ class PodcastGenerator:
                 "trace_id": cover_result.get("image_trace_id")
             }
 
-        # 发送封面生成结果
         if cover_result.get("success"):
             yield {
                 "type": "cover_image",
                 "image_url": cover_result["image_url"],
+                "local_url": cover_result.get("local_url", ""),
+                "variants": cover_result.get("variants", {}),
                 "prompt": cover_result.get("prompt", "")
             }
             yield {
@@ -542,51 +1290,97 @@ class PodcastGenerator:
                 "message": f"封面生成失败: {cover_result.get('message', '未知错误')}"
             }
 
-        # Step 5: 合并完整播客音频
+    def _save_segments(self, graph, session_id, audio_filename, script_filename,
+                       script_records, sentence_segments, welcome_audio_hex):
+        """在后台保存各句片段和清单（说话人、文本、音色、片段文件、时间轴偏移），返回 Future"""
+        voices = graph.result("voices") or {}
+        voice_mapping = {"Speaker1": voices.get("speaker1"), "Speaker2": voices.get("speaker2")}
+        sentences = [
+            {
+                "speaker": speaker,
+                "text": text,
+                "voice_id": voice_mapping.get(speaker) or voices.get("speaker1"),
+                "audio_file": segment["audio_file"],
+                "duration_ms": segment["duration_ms"]
+            }
+            for (speaker, text), segment in zip(script_records, sentence_segments)
+        ]
+        return segment_store.submit_save_episode(session_id, audio_filename, script_filename,
+                                                 [welcome_audio_hex] if welcome_audio_hex else [], sentences)
+
+    def _store_episode(self, graph, script_status, script_records, section_records, cover_result,
+                       audio_filename, script_filename, duration_ms, episode_id):
+        """脚本完整生成时写入脚本缓存，每句都合成成功时再写入节目缓存"""
+        memo = graph.result("memo")
+        voices = graph.result("voices")
+        if not memo or not voices or not script_status["complete"]:
+            return
+
+        cover = None
+        if cover_result.get("success"):
+            cover = {
+                "image_url": cover_result["image_url"],
+                "prompt": cover_result.get("prompt", ""),
+                "filename": cover_result.get("filename", ""),
+                "local_url": cover_result.get("local_url", ""),
+                "variants": cover_result.get("variants", {}),
+                "created_at": cover_result.get("created_at", time.time())
+            }
+        if not memo["script"] or (cover and not memo["script"]["cover"]):
+            episode_cache.put_script(memo["script_key"], script_records, section_records or None, cover)
+        if not script_status["tts_failed"]:
+            # 按实际使用的音色登记（克隆得到的新 Voice ID 下次可由 voice_ids 阶段直接查到）
+            episode_key = episode_cache.episode_key(memo["script_key"], voices["speaker1"], voices["speaker2"])
+            episode_cache.put_episode(episode_key, script_records, audio_filename, script_filename,
+                                      duration_ms, cover, episode_id)
+
+    def _replay_episode(self, record: Dict[str, Any], stage_timings: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """回放缓存的节目：依次发送脚本、完整音频、封面和完成事件"""
         yield {
-            "type": "progress",
-            "step": "audio_merging",
-            "message": "正在合并完整播客音频..."
+            "type": "log",
+            "message": "命中节目缓存：内容、音色和音频设置均未变化，直接返回已生成的节目"
         }
-
-        output_filename = f"podcast_{session_id}_{int(time.time())}.mp3"
-        output_path = os.path.join(OUTPUT_DIR, output_filename)
-
-        try:
-            # 合并音频（BGM + 欢迎语 + 对话内容 + BGM）
-            welcome_audio_hex = ''.join(welcome_audio_chunks)
-            create_podcast_with_bgm(
-                bgm01_path=self.bgm01_path,
-                bgm02_path=self.bgm02_path,
-                welcome_audio_hex=welcome_audio_hex,
-                dialogue_audio_chunks=all_audio_chunks,
-                output_path=output_path
-            )
-
-            # 保存脚本
-            script_filename = f"script_{session_id}_{int(time.time())}.txt"
-            script_path = os.path.join(OUTPUT_DIR, script_filename)
-            with open(script_path, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(all_script_lines))
-
+        for speaker, text in record["lines"]:
             yield {
-                "type": "complete",
-                "audio_path": output_path,
-                "audio_url": f"/download/audio/{output_filename}",
-                "script_path": script_path,
-                "script_url": f"/download/script/{script_filename}",
-                "cover_url": cover_result.get("image_url", ""),
-                "trace_ids": trace_ids,
-                "message": "播客生成完成！"
+                "type": "script_chunk",
+                "speaker": speaker,
+                "text": text,
+                "full_line": f"{speaker}: {text}"
             }
 
-        except Exception as e:
-            logger.error(f"音频合并失败: {str(e)}")
+        audio_url = f"/download/audio/{record['audio_filename']}"
+        yield {
+            "type": "progressive_audio",
+            "audio_url": audio_url,
+            "duration_ms": record.get("duration_ms", 0),
+            "message": "已加载缓存的播客音频"
+        }
+
+        cover = record.get("cover")
+        if cover:
             yield {
-                "type": "error",
-                "message": f"音频合并失败: {str(e)}"
+                "type": "cover_image",
+                "image_url": cover["image_url"],
+                "local_url": cover.get("local_url", ""),
+                "variants": cover.get("variants", {}),
+                "prompt": cover.get("prompt", "")
             }
 
+        yield {
+            "type": "complete",
+            "audio_path": os.path.join(OUTPUT_DIR, record["audio_filename"]),
+            "audio_url": audio_url,
+            "script_path": os.path.join(OUTPUT_DIR, record["script_filename"]),
+            "script_url": f"/download/script/{record['script_filename']}",
+            "cover_url": cover["image_url"] if cover else "",
+            "cover_local_url": cover.get("local_url", "") if cover else "",
+            "episode_id": record.get("episode_id", ""),
+            "trace_ids": {},
+            "stage_timings": stage_timings,
+            "cached": True,
+            "message": "播客生成完成！（复用已生成的节目）"
+        }
+
 
 # 单例实例
 podcast_generator = PodcastGenerator()
@@ -0,0 +1,193 @@
+"""
+脚本 Prompt 精简模块
+在解析内容送入脚本模型前压缩空白、去除样板文字和近似重复行，并按 token 预算截断，
+缩短模型首 token 延迟
+"""
+
+import re
+import logging
+from typing import Dict, Any, List
+from config import PROMPT_REDUCTION_CONFIG
+from content_parser import SOURCE_SEPARATOR, SCRAPED_SOURCE_LABELS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_CJK_RE = re.compile(r'[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]')
+_WHITESPACE_RE = re.compile(r'[ \t 　​]+')
+_FINGERPRINT_STRIP_RE = re.compile(r'[\W_]+', re.UNICODE)
+_DIGITS_RE = re.compile(r'\d+')
+
+# 整行都是导航、版权、分享、翻页等样板文字（只匹配完整的一行，不匹配正文中出现的同样词语）
+_BOILERPLATE_RE = re.compile(
+    r'^(?:'
+    r'(?:登录|注册|登录\s*/\s*注册|sign in|log in|sign up|subscribe|订阅|关注我们|扫码关注|分享到|share this|'
+    r'返回顶部|返回首页|back to top|read more|阅读原文|相关阅读|相关推荐|相关文章|猜你喜欢|'
+    r'点赞|收藏|转发|评论|隐私政策|privacy policy|免责声明|accept cookies|接受\s*cookie)\s*[:：]?\s*\d*'
+    r'|(?:上一篇|下一篇|责任编辑|来源|原标题|备案号)\s*[:：].*'
+    r'|(?:版权所有|copyright|©|all rights reserved).*'
+    r')$',
+    re.IGNORECASE
+)
+# 页码行（"第 3 页"、"Page 3 of 10"、"- 3 -"）或纯符号行；纯数字行是年份、数据等正文，不在此列
+_NOISE_LINE_RE = re.compile(r'^(第\s*\d+\s*页(\s*/?\s*共\s*\d+\s*页)?|page\s*\d+(\s*of\s*\d+)?|[-–—]\s*\d+\s*[-–—]|[\W_]+)$', re.IGNORECASE)
+# 来源标题，如【网页内容 1】，不参与去重和样板过滤
+_SECTION_TITLE_RE = re.compile(r'^【[^】]+】$')
+# 网页 / PDF 抓取的来源，只有这些来源的正文做样板过滤和去重
+_SCRAPED_TITLE_RE = re.compile(r'^【(?:%s)(?: \d+)?】$' % '|'.join(map(re.escape, SCRAPED_SOURCE_LABELS)))
+
+_TRUNCATION_MARK = "...(内容过长，已截断)"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    快速估算 token 数（不调用分词器）：中日韩字符按系数计，其余非空白字符按平均字符数折算
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    other = len(text) - cjk - text.count(" ") - text.count("\n")
+    return int(cjk * PROMPT_REDUCTION_CONFIG["cjk_tokens_per_char"] +
+               max(other, 0) / PROMPT_REDUCTION_CONFIG["chars_per_token"]) + 1
+
+
+def _fingerprint(line: str) -> str:
+    """近似重复判定键：忽略大小写、标点和空白"""
+    return _FINGERPRINT_STRIP_RE.sub("", line.lower())
+
+
+def _number_pattern(fingerprint: str) -> str:
+    """把数字统一后的判定键（页眉页脚只有页码不同）"""
+    return _DIGITS_RE.sub("0", fingerprint)
+
+
+def _is_boilerplate(line: str) -> bool:
+    if _NOISE_LINE_RE.match(line):
+        return True
+    return len(line) <= PROMPT_REDUCTION_CONFIG["boilerplate_max_chars"] and bool(_BOILERPLATE_RE.search(line))
+
+
+def _truncate_section(lines: List[str], budget: int) -> List[str]:
+    """按行截断到 token 预算，最后一行按字符比例截断"""
+    kept = []
+    used = 0
+    for line in lines:
+        tokens = estimate_tokens(line)
+        if used + tokens <= budget:
+            kept.append(line)
+            used += tokens
+            continue
+        remaining = budget - used
+        if remaining > 10:
+            kept.append(line[:max(1, int(len(line) * remaining / tokens))])
+        kept.append(_TRUNCATION_MARK)
+        break
+    return kept
+
+
+def _allocate_budget(section_tokens: List[int], budget: int) -> List[int]:
+    """
+    在各来源之间分配 token 预算：小于平均份额的来源完整保留，剩余预算由较长来源平分，
+    避免排在后面的来源被整体截掉
+    """
+    allocation = [0] * len(section_tokens)
+    pending = sorted(range(len(section_tokens)), key=lambda i: section_tokens[i])
+    remaining = budget
+    while pending:
+        share = remaining // len(pending)
+        index = pending.pop(0)
+        allocation[index] = min(section_tokens[index], share)
+        remaining -= allocation[index]
+    return allocation
+
+
+def reduce_content(content: str, token_budget: int = None) -> Dict[str, Any]:
+    """
+    精简解析内容
+
+    用户输入（及没有来源标题的内容）只压缩空白，不去重、不过滤；
+    网页 / PDF 抓取的正文才去除整行样板文字和近似重复行。所有来源仍按 token 预算截断
+
+    Args:
+        content: merge_contents 合并后的内容
+        token_budget: token 上限（默认使用配置）
+
+    Returns:
+        {
+            "content": 精简后的内容,
+            "tokens_before" / "tokens_after": 估算 token 数,
+            "chars_before" / "chars_after": 字符数,
+            "duplicates_removed": 去除的重复行数,
+            "boilerplate_removed": 去除的样板行数,
+            "truncated": 是否按预算截断
+        }
+    """
+    token_budget = token_budget or PROMPT_REDUCTION_CONFIG["token_budget"]
+    tokens_before = estimate_tokens(content)
+
+    # 只有数字不同的行出现 3 次以上才视为重复（如带页码的页眉页脚），避免误删只是数据不同的正文
+    raw_sections = [
+        [_WHITESPACE_RE.sub(" ", raw_line).strip() for raw_line in section.split("\n")]
+        for section in content.split(SOURCE_SEPARATOR)
+    ]
+    pattern_counts = {}
+    for section_lines in raw_sections:
+        for line in section_lines:
+            pattern = _number_pattern(_fingerprint(line))
+            pattern_counts[pattern] = pattern_counts.get(pattern, 0) + 1
+
+    seen = set()
+    duplicates_removed = 0
+    boilerplate_removed = 0
+    sections = []
+    for section_lines in raw_sections:
+        lines = []
+        title = next((line for line in section_lines if line), "")
+        scraped = bool(_SCRAPED_TITLE_RE.match(title))
+        for line in section_lines:
+            if not line:
+                continue
+            if _SECTION_TITLE_RE.match(line) or not scraped:
+                lines.append(line)
+                continue
+            if _is_boilerplate(line):
+                boilerplate_removed += 1
+                continue
+            key = _fingerprint(line)
+            pattern = _number_pattern(key)
+            # 纯数字行（年份、数据）各不相同，只对带文字的行按数字统一判重
+            if key != pattern and pattern_counts[pattern] >= 3 and _DIGITS_RE.sub("", key):
+                key = pattern
+            if key in seen:
+                duplicates_removed += 1
+                continue
+            seen.add(key)
+            lines.append(line)
+        if lines:
+            sections.append(lines)
+
+    # 按 token 预算截断（各来源公平分配）
+    section_tokens = [sum(estimate_tokens(line) for line in lines) for lines in sections]
+    truncated = sum(section_tokens) > token_budget
+    if truncated:
+        allocation = _allocate_budget(section_tokens, token_budget)
+        sections = [
+            lines if tokens <= budget else _truncate_section(lines, budget)
+            for lines, tokens, budget in zip(sections, section_tokens, allocation)
+        ]
+
+    reduced = SOURCE_SEPARATOR.join("\n".join(lines) for lines in sections)
+    tokens_after = estimate_tokens(reduced)
+    logger.info(f"Prompt 精简: {tokens_before} → {tokens_after} tokens（去重 {duplicates_removed} 行，"
+                f"样板 {boilerplate_removed} 行，截断={truncated}）")
+
+    return {
+        "content": reduced,
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "chars_before": len(content),
+        "chars_after": len(reduced),
+        "duplicates_removed": duplicates_removed,
+        "boilerplate_removed": boilerplate_removed,
+        "truncated": truncated
+    }
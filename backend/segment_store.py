@@ -0,0 +1,323 @@
+"""
+句子片段存储模块
+每期节目完成后保存各句的原始 TTS 音频和清单（说话人、文本、音色、片段文件、时间轴偏移），
+之后可只重新合成指定句子（或修改后的文本），并从已保存的片段重新拼装整期节目，
+不调用文本模型，未修改的句子也不重新合成
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, List, Optional
+from config import SEGMENT_STORE_CONFIG, BGM_FILES, OUTPUT_DIR
+from minimax_client import minimax_client
+from tts_scheduler import tts_scheduler
+from audio_utils import load_bgm, submit_decode_normalized, submit_create_podcast_with_bgm
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_EPISODE_ID_RE = re.compile(r'^[\w\-]+$')
+_MANIFEST_NAME = "manifest.json"
+_WELCOME_FILE = "welcome.mp3"
+
+
+class SegmentStore:
+    """按节目保存句子片段和清单"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.enabled = config["enabled"]
+        self.directory = config["dir"]
+        self.max_episodes = config["max_episodes"]
+        self.max_parallel_tts = config["max_parallel_tts"]
+        self.max_lines_per_request = config["max_lines_per_request"]
+        self._lock = threading.Lock()
+        self._episode_locks = {}
+        # 片段在完成事件之后于后台保存，不占用生成的关键路径
+        self._save_executor = ThreadPoolExecutor(max_workers=config["save_workers"], thread_name_prefix="segment-save")
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def save_episode(self,
+                     episode_id: str,
+                     audio_filename: str,
+                     script_filename: str,
+                     welcome_audio_chunks: List[str],
+                     sentences: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        保存一期节目的句子片段和清单
+
+        Args:
+            episode_id: 节目 ID（生成时的 session_id）
+            audio_filename / script_filename: 完整音频和脚本的文件名（位于 OUTPUT_DIR）
+            welcome_audio_chunks: 欢迎语音频 chunk（十六进制）
+            sentences: [{"speaker", "text", "voice_id", "audio_file", "duration_ms"}]，
+                       audio_file 为生成时暂存的句子音频（移动到节目目录），合成失败的句子为 None
+
+        Returns:
+            清单；未启用或保存失败时返回 None
+        """
+        if not self.enabled or not _EPISODE_ID_RE.match(episode_id):
+            return None
+
+        episode_dir = os.path.join(self.directory, episode_id)
+        try:
+            with self._episode_lock(episode_id):
+                os.makedirs(episode_dir, exist_ok=True)
+                self._write_bytes(episode_dir, _WELCOME_FILE, bytes.fromhex(''.join(welcome_audio_chunks)))
+
+                entries = []
+                for index, sentence in enumerate(sentences):
+                    filename = None
+                    if sentence["audio_file"]:
+                        filename = f"{index:04d}.mp3"
+                        # 缓冲目录与片段目录同在输出目录下，通常只是重命名
+                        shutil.move(sentence["audio_file"], os.path.join(episode_dir, filename))
+                    entries.append({
+                        "index": index,
+                        "speaker": sentence["speaker"],
+                        "text": sentence["text"],
+                        "voice_id": sentence["voice_id"],
+                        "file": filename,
+                        "duration_ms": sentence["duration_ms"] if filename else 0
+                    })
+
+                manifest = {
+                    "episode_id": episode_id,
+                    "revision": 0,
+                    "created_at": time.time(),
+                    "updated_at": time.time(),
+                    "audio_filename": audio_filename,
+                    "script_filename": script_filename,
+                    "welcome_file": _WELCOME_FILE,
+                    "sentences": entries
+                }
+                self._update_timeline(manifest, self._intro_duration(welcome_audio_chunks))
+                self._save_manifest(episode_id, manifest)
+        except Exception as e:
+            logger.error(f"保存句子片段失败: {str(e)}")
+            return None
+
+        logger.info(f"句子片段已保存: {episode_id}，{len(sentences)} 句")
+        self._prune()
+        return manifest
+
+    def submit_save_episode(self, *args) -> Future:
+        """在后台线程执行 save_episode（参数相同），返回 Future"""
+        return self._save_executor.submit(self.save_episode, *args)
+
+    def load_manifest(self, episode_id: str) -> Optional[Dict[str, Any]]:
+        """读取节目清单，不存在时返回 None"""
+        if not self.enabled or not _EPISODE_ID_RE.match(episode_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, episode_id, _MANIFEST_NAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def regenerate(self, episode_id: str, edits: List[Dict[str, Any]], api_key: str) -> Dict[str, Any]:
+        """
+        重新合成指定句子并重新拼装整期节目
+
+        Args:
+            episode_id: 节目 ID
+            edits: [{"index": 句子序号, "text": 修改后的文本（可选）, "voice_id": 音色（可选）}]
+            api_key: 用户提供的 MiniMax API Key
+
+        Returns:
+            {"success", "audio_url", "script_url", "regenerated": 序号列表, "trace_ids", "manifest", "error"}
+        """
+        # 先校验节目 ID，非法 ID 不会在锁表中留下条目
+        if not self.enabled or not _EPISODE_ID_RE.match(episode_id):
+            return {"success": False, "error": "节目不存在或片段已被清理"}
+        if not edits:
+            return {"success": False, "error": "未指定需要重新合成的句子"}
+        if len(edits) > self.max_lines_per_request:
+            return {"success": False, "error": f"一次最多重新合成 {self.max_lines_per_request} 句"}
+
+        with self._episode_lock(episode_id):
+            manifest = self.load_manifest(episode_id)
+            if manifest is None:
+                return {"success": False, "error": "节目不存在或片段已被清理"}
+
+            sentences = manifest["sentences"]
+            jobs = {}
+            for edit in edits:
+                index = edit.get("index")
+                if not isinstance(index, int) or not 0 <= index < len(sentences):
+                    return {"success": False, "error": f"句子序号无效: {index}"}
+                text = (edit.get("text") or sentences[index]["text"]).strip()
+                if not text:
+                    return {"success": False, "error": f"第 {index + 1} 句文本为空"}
+                jobs[index] = (text, edit.get("voice_id") or sentences[index]["voice_id"])
+
+            start = time.time()
+            results = self._synthesize_all(episode_id, jobs, api_key)
+            failed = [index for index, result in results.items() if not result["audio_chunks"]]
+            if failed:
+                # 任一句失败时不修改节目，保留原有片段
+                return {
+                    "success": False,
+                    "error": f"第 {', '.join(str(index + 1) for index in sorted(failed))} 句重新合成失败: "
+                             f"{results[failed[0]]['error']}",
+                    "trace_ids": {index: result["trace_id"] for index, result in results.items()}
+                }
+
+            episode_dir = os.path.join(self.directory, episode_id)
+            revision = manifest["revision"] + 1
+            replaced_files = []
+            for index, result in results.items():
+                text, voice_id = jobs[index]
+                filename = f"{index:04d}_r{revision}.mp3"
+                self._write_bytes(episode_dir, filename, bytes.fromhex(''.join(result["audio_chunks"])))
+                if sentences[index]["file"]:
+                    replaced_files.append(sentences[index]["file"])
+                sentences[index].update({
+                    "text": text,
+                    "voice_id": voice_id,
+                    "file": filename,
+                    "duration_ms": len(submit_decode_normalized(result["audio_chunks"], -18.0).result())
+                })
+
+            # 从已保存的片段重新拼装（与生成时相同的合并流程）
+            timestamp = int(time.time())
+            audio_filename = f"podcast_{episode_id}_r{revision}_{timestamp}.mp3"
+            script_filename = f"script_{episode_id}_r{revision}_{timestamp}.txt"
+            welcome_audio_hex = self._read_hex(episode_dir, manifest["welcome_file"])
+            dialogue_audio_chunks = [self._read_hex(episode_dir, sentence["file"])
+                                     for sentence in sentences if sentence["file"]]
+            try:
+                submit_create_podcast_with_bgm(
+                    bgm01_path=BGM_FILES["bgm01"],
+                    bgm02_path=BGM_FILES["bgm02"],
+                    welcome_audio_hex=welcome_audio_hex,
+                    dialogue_audio_chunks=dialogue_audio_chunks,
+                    output_path=os.path.join(OUTPUT_DIR, audio_filename)
+                ).result()
+            except Exception as e:
+                logger.error(f"重新拼装节目失败: {str(e)}")
+                return {"success": False, "error": f"重新拼装节目失败: {str(e)}"}
+
+            with open(os.path.join(OUTPUT_DIR, script_filename), "w", encoding="utf-8") as f:
+                f.write("\n".join(f"{sentence['speaker']}: {sentence['text']}" for sentence in sentences))
+
+            manifest.update({
+                "revision": revision,
+                "updated_at": time.time(),
+                "audio_filename": audio_filename,
+                "script_filename": script_filename
+            })
+            self._update_timeline(manifest, self._intro_duration([welcome_audio_hex] if welcome_audio_hex else []))
+            self._save_manifest(episode_id, manifest)
+            for filename in replaced_files:
+                path = os.path.join(episode_dir, filename)
+                if os.path.exists(path):
+                    os.remove(path)
+
+        elapsed_ms = int((time.time() - start) * 1000)
+        logger.info(f"节目 {episode_id} 已重新合成 {len(results)} 句并重新拼装（第 {revision} 版），耗时 {elapsed_ms}ms")
+        return {
+            "success": True,
+            "audio_url": f"/download/audio/{audio_filename}",
+            "script_url": f"/download/script/{script_filename}",
+            "regenerated": sorted(results),
+            "trace_ids": {index: result["trace_id"] for index, result in results.items()},
+            "elapsed_ms": elapsed_ms,
+            "manifest": manifest
+        }
+
+    def _synthesize_all(self, episode_id: str, jobs: Dict[int, tuple], api_key: str) -> Dict[int, Dict[str, Any]]:
+        """并行重新合成，返回 {序号: {"audio_chunks", "trace_id", "error"}}"""
+        # 每次重新合成使用独立的调度会话（注销后的会话 ID 不能再申请额度）
+        scheduler_session = f"regenerate_{episode_id}_{uuid.uuid4().hex[:8]}"
+
+        def synthesize(text, voice_id):
+            audio_chunks = []
+            trace_id = None
+            error = None
+            try:
+                with tts_scheduler.slot(scheduler_session):
+                    for tts_event in minimax_client.synthesize_speech_stream(text, voice_id, api_key=api_key):
+                        if tts_event["type"] == "audio_chunk":
+                            audio_chunks.append(tts_event["audio"])
+                        elif tts_event["type"] == "tts_complete":
+                            trace_id = tts_event.get("trace_id")
+                        elif tts_event["type"] == "error":
+                            trace_id = tts_event.get("trace_id")
+                            error = tts_event.get("message")
+            except Exception as e:
+                error = str(e)
+            return {"audio_chunks": audio_chunks if not error else [], "trace_id": trace_id, "error": error}
+
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.max_parallel_tts, len(jobs)),
+                                    thread_name_prefix="segment-tts") as pool:
+                futures = {index: pool.submit(synthesize, text, voice_id) for index, (text, voice_id) in jobs.items()}
+                return {index: future.result() for index, future in futures.items()}
+        finally:
+            tts_scheduler.unregister_session(scheduler_session)
+
+    def _intro_duration(self, welcome_audio_chunks: List[str]) -> int:
+        """片头时长：BGM01 + 欢迎语 + BGM02（与完整音频的拼接方式一致）"""
+        welcome_ms = len(submit_decode_normalized(welcome_audio_chunks).result()) if welcome_audio_chunks else 0
+        return len(load_bgm(BGM_FILES["bgm01"])) + welcome_ms + len(load_bgm(BGM_FILES["bgm02"]))
+
+    def _update_timeline(self, manifest: Dict[str, Any], intro_ms: int) -> None:
+        """按句子顺序计算各句在完整音频中的起始位置"""
+        offset = intro_ms
+        for sentence in manifest["sentences"]:
+            sentence["offset_ms"] = offset
+            offset += sentence["duration_ms"]
+        manifest["intro_ms"] = intro_ms
+        manifest["dialogue_end_ms"] = offset
+
+    def _episode_lock(self, episode_id: str) -> threading.Lock:
+        with self._lock:
+            return self._episode_locks.setdefault(episode_id, threading.Lock())
+
+    def _save_manifest(self, episode_id: str, manifest: Dict[str, Any]) -> None:
+        self._write_bytes(os.path.join(self.directory, episode_id), _MANIFEST_NAME,
+                          json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    def _write_bytes(self, directory: str, filename: str, data: bytes) -> None:
+        """写入临时文件后原子替换"""
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".segment_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, os.path.join(directory, filename))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _read_hex(self, directory: str, filename: str) -> str:
+        with open(os.path.join(directory, filename), "rb") as f:
+            return f.read().hex()
+
+    def _prune(self) -> None:
+        """保留最近的 max_episodes 期节目片段"""
+        try:
+            episodes = [entry for entry in os.scandir(self.directory) if entry.is_dir()]
+        except FileNotFoundError:
+            return
+        if len(episodes) <= self.max_episodes:
+            return
+        episodes.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in episodes[:len(episodes) - self.max_episodes]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            with self._lock:
+                self._episode_locks.pop(entry.name, None)
+            logger.info(f"已清理节目片段: {entry.name}")
+
+
+# 单例实例
+segment_store = SegmentStore(SEGMENT_STORE_CONFIG)
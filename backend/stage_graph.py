@@ -0,0 +1,233 @@
+"""
+阶段依赖图调度
+把一次播客生成拆成若干阶段，每个阶段在依赖就绪后立即在独立线程中运行，
+并记录每个阶段的开始/结束时间
+"""
+
+import time
+import logging
+import threading
+from queue import Queue, Empty
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_STAGE_FINISHED = object()  # 内部标记：某个阶段结束，唤醒事件消费方
+
+
+class StageError(Exception):
+    """阶段失败，message 会作为 error 事件发送给前端"""
+
+
+class _Stage:
+    def __init__(self, name: str, func: Callable, deps: Iterable[str], critical: bool):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.critical = critical
+        self.status = "pending"  # pending | running | done | failed | skipped
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.ended_at = None
+        self.finished = threading.Event()
+
+
+class StageGraph:
+    """
+    阶段依赖图
+
+    用法:
+        graph = StageGraph(session_id)
+        graph.add_stage("content", parse_content)
+        graph.add_stage("script", generate_script, deps=["content"])
+        graph.start()
+        for event in graph.stream_events(until=["script"]):
+            ...
+
+    阶段函数签名为 func(emit, results)：
+        emit(event) 向前端发送事件；results 为依赖阶段的返回值字典
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._stages: Dict[str, _Stage] = {}
+        self._events = Queue()
+        self._lock = threading.Lock()
+        self._cancel_callbacks: List[Callable] = []
+        self._cancelled = threading.Event()
+        self._failed = threading.Event()
+        self._started_at = None
+
+    def add_stage(self, name: str, func: Callable, deps: Iterable[str] = (), critical: bool = True) -> None:
+        """
+        添加阶段
+
+        Args:
+            name: 阶段名称
+            func: 阶段函数 func(emit, results)
+            deps: 依赖的阶段名称
+            critical: 失败时是否终止整个生成流程
+        """
+        if self._started_at is not None:
+            raise RuntimeError("阶段图已启动，不能再添加阶段")
+        self._stages[name] = _Stage(name, func, deps, critical)
+
+    def has_stage(self, name: str) -> bool:
+        return name in self._stages
+
+    def on_cancel(self, callback: Callable) -> None:
+        """注册取消回调（失败或客户端断开时调用，用于关闭队列等）"""
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        """发送事件到前端"""
+        self._events.put(event)
+
+    def start(self) -> None:
+        """启动所有阶段"""
+        for stage in self._stages.values():
+            for dep in stage.deps:
+                if dep not in self._stages:
+                    raise ValueError(f"阶段 {stage.name} 依赖未知阶段 {dep}")
+
+        self._started_at = time.time()
+        for stage in self._stages.values():
+            threading.Thread(target=self._run_stage, args=(stage,), name=f"stage-{stage.name}", daemon=True).start()
+
+    def stream_events(self, until: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """
+        转发阶段事件，直到指定阶段全部结束或流程失败
+        """
+        until = list(until)
+        while True:
+            event = self._events.get()
+            if event is _STAGE_FINISHED:
+                if self._failed.is_set() or all(self._stages[name].finished.is_set() for name in until):
+                    break
+                continue
+            yield event
+
+        # 发送已排队的剩余事件
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except Empty:
+                break
+            if event is not _STAGE_FINISHED:
+                yield event
+
+    def result(self, name: str, timeout: Optional[float] = None) -> Any:
+        """
+        等待阶段结束并返回结果
+
+        Returns:
+            阶段返回值；阶段失败、被跳过或超时时返回 None
+        """
+        stage = self._stages[name]
+        if not stage.finished.wait(timeout):
+            return None
+        return stage.result if stage.status == "done" else None
+
+    def status(self, name: str) -> str:
+        return self._stages[name].status
+
+    def is_finished(self, name: str) -> bool:
+        return self._stages[name].finished.is_set()
+
+    @property
+    def failed(self) -> bool:
+        return self._failed.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """取消流程：调用所有取消回调，等待依赖的阶段直接跳过"""
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self._cancelled.set()
+            callbacks = list(self._cancel_callbacks)
+            self._cancel_callbacks.clear()
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"[阶段图] 取消回调执行失败: {str(e)}")
+
+    def timings(self) -> List[Dict[str, Any]]:
+        """各阶段相对流程开始的起止时间（毫秒）"""
+        timings = []
+        for stage in self._stages.values():
+            timings.append({
+                "stage": stage.name,
+                "status": stage.status,
+                "start_ms": self._offset_ms(stage.started_at),
+                "end_ms": self._offset_ms(stage.ended_at),
+                "duration_ms": int((stage.ended_at - stage.started_at) * 1000) if stage.started_at and stage.ended_at else None
+            })
+        return timings
+
+    def _offset_ms(self, timestamp: Optional[float]) -> Optional[int]:
+        if timestamp is None or self._started_at is None:
+            return None
+        return int((timestamp - self._started_at) * 1000)
+
+    def _emit_timing(self, stage: _Stage) -> None:
+        self.emit({
+            "type": "stage_timing",
+            "stage": stage.name,
+            "status": stage.status,
+            "start_ms": self._offset_ms(stage.started_at),
+            "end_ms": self._offset_ms(stage.ended_at),
+            "duration_ms": int((stage.ended_at - stage.started_at) * 1000) if stage.started_at and stage.ended_at else None
+        })
+
+    def _run_stage(self, stage: _Stage) -> None:
+        try:
+            # 等待依赖阶段
+            for dep in stage.deps:
+                dep_stage = self._stages[dep]
+                while not dep_stage.finished.wait(timeout=0.5):
+                    if self._cancelled.is_set():
+                        break
+                if self._cancelled.is_set() or dep_stage.status != "done":
+                    stage.status = "skipped"
+                    logger.info(f"[阶段图] {stage.name} 已跳过（依赖 {dep} 状态: {dep_stage.status}）")
+                    return
+
+            stage.status = "running"
+            stage.started_at = time.time()
+            self._emit_timing(stage)
+            logger.info(f"[阶段图] {stage.name} 开始（+{self._offset_ms(stage.started_at)}ms）")
+
+            try:
+                stage.result = stage.func(self.emit, {dep: self._stages[dep].result for dep in stage.deps})
+                stage.status = "done"
+            except StageError as e:
+                stage.status = "failed"
+                stage.error = str(e)
+            except Exception as e:
+                logger.exception(f"[阶段图] {stage.name} 异常:")
+                stage.status = "failed"
+                stage.error = f"{stage.name} 阶段失败: {str(e)}"
+
+            stage.ended_at = time.time()
+            self._emit_timing(stage)
+            logger.info(f"[阶段图] {stage.name} 结束，状态: {stage.status}，耗时 {int((stage.ended_at - stage.started_at) * 1000)}ms")
+
+            if stage.status == "failed" and stage.critical and not self._cancelled.is_set():
+                self._failed.set()
+                self.emit({"type": "error", "message": stage.error})
+                self.cancel()
+        finally:
+            stage.finished.set()
+            self._events.put(_STAGE_FINISHED)
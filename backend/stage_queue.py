@@ -0,0 +1,173 @@
+"""
+流水线阶段队列
+为 脚本 → TTS → 混音 → 编码 各阶段之间提供有界队列、高/低水位背压和阶段延迟统计
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class StageQueueClosed(Exception):
+    """队列已关闭（下游已退出或会话已取消）"""
+
+
+class StageQueue:
+    """
+    带背压的有界阶段队列
+
+    - 队列深度达到 high_water 时，生产者阻塞
+    - 阻塞后直到深度回落到 low_water 才放行（滞回，避免频繁抖动）
+    - 记录每个元素的排队时间（阶段延迟）与生产者阻塞时间
+    """
+
+    def __init__(self, name: str, maxsize: int = 16, high_water: Optional[int] = None, low_water: Optional[int] = None):
+        """
+        Args:
+            name: 阶段名称（用于日志和统计）
+            maxsize: 队列最大深度
+            high_water: 高水位，默认等于 maxsize
+            low_water: 低水位，默认为 high_water 的一半
+        """
+        self.name = name
+        self.maxsize = max(1, int(maxsize))
+        self.high_water = min(self.maxsize, int(high_water)) if high_water else self.maxsize
+        self.low_water = min(self.high_water - 1, int(low_water)) if low_water is not None else self.high_water // 2
+        self.low_water = max(0, self.low_water)
+
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._throttled = False
+        self._closed = False
+
+        # 统计信息
+        self._put_count = 0
+        self._get_count = 0
+        self._max_depth = 0
+        self._throttle_count = 0
+        self._blocked_seconds = 0.0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+        self._last_lag = 0.0
+
+    def put(self, item: Any, timeout: Optional[float] = None) -> None:
+        """
+        放入元素，超过高水位时阻塞
+
+        Raises:
+            StageQueueClosed: 队列已关闭
+            TimeoutError: 等待超时
+        """
+        with self._cond:
+            if self._closed:
+                raise StageQueueClosed(self.name)
+
+            depth = len(self._items)
+            if not self._throttled and depth >= self.high_water:
+                self._throttled = True
+                self._throttle_count += 1
+                logger.info(f"[{self.name}] 队列达到高水位 {self.high_water}，生产者开始等待")
+
+            if self._throttled:
+                wait_start = time.time()
+                deadline = None if timeout is None else wait_start + timeout
+                while self._throttled and not self._closed:
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        self._blocked_seconds += time.time() - wait_start
+                        raise TimeoutError(f"{self.name} 队列写入超时")
+                    self._cond.wait(remaining)
+                self._blocked_seconds += time.time() - wait_start
+                if self._closed:
+                    raise StageQueueClosed(self.name)
+
+            self._items.append((time.time(), item))
+            self._put_count += 1
+            self._max_depth = max(self._max_depth, len(self._items))
+            self._cond.notify_all()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        取出元素，队列为空时阻塞
+
+        Raises:
+            StageQueueClosed: 队列已关闭且没有剩余元素
+            TimeoutError: 等待超时
+        """
+        with self._cond:
+            deadline = None if timeout is None else time.time() + timeout
+            while not self._items:
+                if self._closed:
+                    raise StageQueueClosed(self.name)
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"{self.name} 队列读取超时")
+                self._cond.wait(remaining)
+
+            enqueued_at, item = self._items.popleft()
+            lag = time.time() - enqueued_at
+            self._get_count += 1
+            self._last_lag = lag
+            self._lag_total += lag
+            self._lag_max = max(self._lag_max, lag)
+
+            if self._throttled and len(self._items) <= self.low_water:
+                self._throttled = False
+                logger.info(f"[{self.name}] 队列回落到低水位 {self.low_water}，生产者恢复")
+            self._cond.notify_all()
+            return item
+
+    def close(self) -> None:
+        """关闭队列，唤醒所有等待中的生产者和消费者"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取阶段统计
+
+        Returns:
+            包含深度、阻塞时间、排队延迟的字典
+        """
+        with self._cond:
+            return {
+                "stage": self.name,
+                "depth": len(self._items),
+                "max_depth": self._max_depth,
+                "maxsize": self.maxsize,
+                "high_water": self.high_water,
+                "low_water": self.low_water,
+                "put_count": self._put_count,
+                "get_count": self._get_count,
+                "throttle_count": self._throttle_count,
+                "producer_blocked_ms": int(self._blocked_seconds * 1000),
+                "avg_lag_ms": int(self._lag_total / self._get_count * 1000) if self._get_count else 0,
+                "max_lag_ms": int(self._lag_max * 1000),
+                "last_lag_ms": int(self._last_lag * 1000)
+            }
+
+
+def create_stage_queue(name: str, config: Dict[str, Any]) -> StageQueue:
+    """
+    根据配置创建阶段队列
+
+    Args:
+        name: 阶段名称
+        config: {"maxsize": int, "high_water": int, "low_water": int}
+    """
+    return StageQueue(
+        name,
+        maxsize=config.get("maxsize", 16),
+        high_water=config.get("high_water"),
+        low_water=config.get("low_water")
+    )
@@ -0,0 +1,207 @@
+"""
+跨会话 TTS 调度模块
+所有会话共享上游 TTS 并发额度，按"领先听众播放位置多少"排序：
+新会话和缓冲即将耗尽的会话优先，远远领先播放进度的会话让出额度
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any
+from config import TTS_SCHEDULER_CONFIG
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class TTSSessionClosed(Exception):
+    """会话已结束，不再需要合成"""
+
+
+class _SessionState:
+    """单个会话的播放与缓冲状态"""
+
+    def __init__(self):
+        self.buffered_ms = 0  # 已交付给听众的音频总时长
+        self.playback_started_at = None  # 听众开始播放的时间
+        self.in_flight = 0  # 正在进行的 TTS 请求数
+        self.closed = False
+        self.last_activity = time.time()
+
+    def buffer_ahead_ms(self, now: float) -> int:
+        """已交付音频领先当前播放位置的时长"""
+        if self.playback_started_at is None:
+            return self.buffered_ms
+        position_ms = (now - self.playback_started_at) * 1000
+        return int(max(0.0, self.buffered_ms - position_ms))
+
+
+class TTSScheduler:
+    """全局 TTS 调度器"""
+
+    def __init__(self, max_concurrent: int, yield_ahead_ms: int, reserved_urgent_slots: int,
+                 inflight_estimate_ms: int, session_ttl_seconds: int):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.yield_ahead_ms = yield_ahead_ms
+        self.reserved_urgent_slots = min(max(0, int(reserved_urgent_slots)), self.max_concurrent - 1)
+        self.inflight_estimate_ms = inflight_estimate_ms
+        self.session_ttl_seconds = session_ttl_seconds
+
+        self._cond = threading.Condition()
+        self._sessions = {}  # session_id -> _SessionState
+        self._closed = {}  # 已注销的 session_id -> 注销时间，在 session_ttl_seconds 内拒绝新的合成请求
+        self._pending = []  # [(seq, session_id)]
+        self._active = 0
+        self._seq = 0
+
+    def update_buffered_audio(self, session_id: str, total_ms: int) -> None:
+        """更新会话已交付给听众的音频总时长"""
+        with self._cond:
+            if session_id in self._closed:
+                return
+            session = self._get_session_locked(session_id)
+            session.buffered_ms = total_ms
+            session.last_activity = time.time()
+            self._cond.notify_all()
+
+    def mark_playback_started(self, session_id: str) -> None:
+        """记录听众开始播放（首个渐进式音频已发送）"""
+        with self._cond:
+            if session_id in self._closed:
+                return
+            session = self._get_session_locked(session_id)
+            if session.playback_started_at is None:
+                session.playback_started_at = time.time()
+            self._cond.notify_all()
+
+    def unregister_session(self, session_id: str) -> None:
+        """会话结束，唤醒该会话所有等待中的请求；之后该会话再申请额度也直接拒绝（不会重新登记）"""
+        with self._cond:
+            session = self._sessions.pop(session_id, None)
+            if session:
+                session.closed = True
+            self._prune_stale_locked()
+            self._closed[session_id] = time.time()
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, session_id: str):
+        """
+        占用一个 TTS 并发额度
+
+        用法:
+            with tts_scheduler.slot(session_id):
+                for event in minimax_client.synthesize_speech_stream(...):
+                    ...
+
+        Raises:
+            TTSSessionClosed: 会话已结束（等待期间或申请之前）
+        """
+        self._acquire(session_id)
+        try:
+            yield
+        finally:
+            self._release(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取调度状态"""
+        with self._cond:
+            now = time.time()
+            return {
+                "active": self._active,
+                "pending": len(self._pending),
+                "closed_sessions": len(self._closed),
+                "max_concurrent": self.max_concurrent,
+                "sessions": {
+                    session_id: session.buffer_ahead_ms(now)
+                    for session_id, session in self._sessions.items()
+                }
+            }
+
+    def _acquire(self, session_id: str) -> None:
+        wait_start = time.time()
+        with self._cond:
+            if session_id in self._closed:
+                raise TTSSessionClosed(session_id)
+            session = self._get_session_locked(session_id)
+            self._seq += 1
+            request = (self._seq, session_id)
+            self._pending.append(request)
+            try:
+                while True:
+                    if session.closed:
+                        raise TTSSessionClosed(session_id)
+                    if self._can_run_locked(request):
+                        break
+                    # 播放位置随时间推进，定期重新排序
+                    self._cond.wait(timeout=1.0)
+            finally:
+                self._pending.remove(request)
+                self._cond.notify_all()
+
+            self._active += 1
+            session.in_flight += 1
+            session.last_activity = time.time()
+
+        waited = time.time() - wait_start
+        if waited > 0.1:
+            logger.info(f"[TTS调度] 会话 {session_id[:8]} 等待 {waited:.2f} 秒后获得合成额度")
+
+    def _release(self, session_id: str) -> None:
+        with self._cond:
+            self._active -= 1
+            session = self._sessions.get(session_id)
+            if session:
+                session.in_flight -= 1
+                session.last_activity = time.time()
+            self._cond.notify_all()
+
+    def _rank_locked(self, request, now: float) -> tuple:
+        seq, session_id = request
+        session = self._sessions.get(session_id)
+        if session is None:
+            return (0, seq)
+        # 正在合成的句子很快会进入缓冲，按估算时长计入
+        return (session.buffer_ahead_ms(now) + session.in_flight * self.inflight_estimate_ms, seq)
+
+    def _can_run_locked(self, request) -> bool:
+        if self._active >= self.max_concurrent:
+            return False
+
+        now = time.time()
+        best = min(self._pending, key=lambda r: self._rank_locked(r, now))
+        if best is not request:
+            return False
+
+        # 远远领先播放进度的会话不能占用为紧急会话保留的额度
+        ahead_ms = self._rank_locked(request, now)[0]
+        if ahead_ms > self.yield_ahead_ms and self._active >= self.max_concurrent - self.reserved_urgent_slots:
+            return False
+        return True
+
+    def _get_session_locked(self, session_id: str) -> _SessionState:
+        session = self._sessions.get(session_id)
+        if session is None:
+            self._prune_stale_locked()
+            session = _SessionState()
+            self._sessions[session_id] = session
+        return session
+
+    def _prune_stale_locked(self) -> None:
+        """清理异常退出后未注销的会话和过期的注销记录"""
+        deadline = time.time() - self.session_ttl_seconds
+        for session_id in [sid for sid, s in self._sessions.items() if s.in_flight == 0 and s.last_activity < deadline]:
+            del self._sessions[session_id]
+        for session_id in [sid for sid, closed_at in self._closed.items() if closed_at < deadline]:
+            del self._closed[session_id]
+
+
+# 单例实例
+tts_scheduler = TTSScheduler(
+    max_concurrent=TTS_SCHEDULER_CONFIG["max_concurrent_requests"],
+    yield_ahead_ms=TTS_SCHEDULER_CONFIG["yield_ahead_ms"],
+    reserved_urgent_slots=TTS_SCHEDULER_CONFIG["reserved_urgent_slots"],
+    inflight_estimate_ms=TTS_SCHEDULER_CONFIG["inflight_estimate_ms"],
+    session_ttl_seconds=TTS_SCHEDULER_CONFIG["session_ttl_seconds"]
+)
@@ -0,0 +1,127 @@
+"""
+上传文件接收模块
+multipart 解析时直接把文件分块写入上传目录，边写边计算 sha256 并检查大小上限，
+保存时只需重命名，不再整体复制或重新读取
+"""
+
+import os
+import hashlib
+import logging
+import tempfile
+from typing import Dict, Any
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+from config import UPLOAD_DIR, UPLOAD_LIMITS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PDF_EXTENSIONS = {'pdf'}
+AUDIO_EXTENSIONS = {'wav', 'mp3', 'flac', 'm4a', 'ogg', 'webm'}
+
+
+def _max_bytes_for(filename: str, content_type: str = None) -> int:
+    """按扩展名（或 MIME 类型）确定单个文件的大小上限"""
+    extension = filename.rsplit('.', 1)[1].lower() if filename and '.' in filename else ''
+    if extension in PDF_EXTENSIONS or content_type == "application/pdf":
+        return UPLOAD_LIMITS["pdf_max_bytes"]
+    if extension in AUDIO_EXTENSIONS or (content_type or "").startswith("audio/"):
+        return UPLOAD_LIMITS["audio_max_bytes"]
+    return UPLOAD_LIMITS["other_max_bytes"]
+
+
+class HashingUploadFile:
+    """写入上传目录临时文件的同时计算 sha256，超过上限立即中止解析"""
+
+    def __init__(self, filename: str, max_bytes: int):
+        fd, self.temp_path = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=".ingest_", suffix=".part")
+        self._file = os.fdopen(fd, "w+b")
+        self._sha256 = hashlib.sha256()
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.finalized = False
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.close()
+            raise RequestEntityTooLarge(
+                f"文件 {self.filename} 超过大小上限 {self.max_bytes // (1024 * 1024)}MB"
+            )
+        self._sha256.update(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    def finalize(self, dest_path: str) -> None:
+        """关闭临时文件并原子移动到目标路径"""
+        self._file.close()
+        os.replace(self.temp_path, dest_path)
+        self.finalized = True
+
+    def close(self) -> None:
+        """未被保存的临时文件随请求结束删除"""
+        if not self._file.closed:
+            self._file.close()
+        if not self.finalized and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def __getattr__(self, name):
+        # read / readline / seek / tell 等直接交给底层文件
+        return getattr(self._file, name)
+
+
+class IngestRequest(Request):
+    """上传文件直接流式写入上传目录的请求类"""
+
+    max_content_length = UPLOAD_LIMITS["max_request_bytes"]
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingUploadFile(filename or "", _max_bytes_for(filename, content_type))
+
+
+def save_upload(file_storage, dest_path: str) -> Dict[str, Any]:
+    """
+    保存上传文件
+
+    Args:
+        file_storage: werkzeug FileStorage
+        dest_path: 目标路径
+
+    Returns:
+        {"path": 路径, "size": 字节数, "sha256": 十六进制哈希}
+    """
+    stream = file_storage.stream
+    if isinstance(stream, HashingUploadFile):
+        stream.finalize(dest_path)
+        logger.info(f"上传文件已保存: {dest_path}（{stream.size} 字节）")
+        return {"path": dest_path, "size": stream.size, "sha256": stream.sha256}
+
+    # 其他来源的文件流：分块复制并计算哈希
+    sha256 = hashlib.sha256()
+    size = 0
+    max_bytes = _max_bytes_for(file_storage.filename, file_storage.mimetype)
+    chunk_size = UPLOAD_LIMITS["chunk_size"]
+    try:
+        with open(dest_path, "wb") as f:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise RequestEntityTooLarge(
+                        f"文件 {file_storage.filename} 超过大小上限 {max_bytes // (1024 * 1024)}MB"
+                    )
+                sha256.update(chunk)
+                f.write(chunk)
+    except Exception:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+
+    logger.info(f"上传文件已保存: {dest_path}（{size} 字节）")
+    return {"path": dest_path, "size": size, "sha256": sha256.hexdigest()}
@@ -0,0 +1,202 @@
+"""
+克隆音色缓存模块
+按"参考音频指纹 + API Key"持久化已克隆的 Voice ID，重复提交同一段录音时跳过上传和克隆
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, Optional
+from config import VOICE_CLONE_CACHE_CONFIG
+
+try:
+    import fcntl  # 跨进程文件锁（仅 POSIX）
+except ImportError:
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def audio_fingerprint(audio) -> str:
+    """
+    计算解码后音频的指纹（与文件容器格式、元数据无关）
+
+    Args:
+        audio: pydub AudioSegment
+
+    Returns:
+        十六进制 sha256
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{audio.frame_rate}:{audio.channels}:{audio.sample_width}:".encode())
+    digest.update(audio.raw_data)
+    return digest.hexdigest()
+
+
+class VoiceCloneCache:
+    """持久化的克隆音色登记表（线程安全、多进程安全）"""
+
+    def __init__(self, path: str, ttl_seconds: int, enabled: bool = True):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._key_locks = {}  # cache_key -> [threading.Lock, 引用数]，避免同一指纹在本进程内重复克隆
+
+    def cache_key(self, fingerprint: str, api_key: Optional[str]) -> str:
+        """缓存键：音频指纹 + API Key 的哈希（不落盘保存 API Key 明文）"""
+        return hashlib.sha256(f"{fingerprint}:{api_key or ''}".encode()).hexdigest()
+
+    @contextmanager
+    def key_lock(self, cache_key: str):
+        """
+        同一缓存键的查找与克隆串行执行
+
+        用法:
+            with voice_clone_cache.key_lock(key):
+                voice_id = voice_clone_cache.get(key)
+                if voice_id is None:
+                    ...克隆...
+                    voice_clone_cache.put(key, voice_id)
+        """
+        with self._lock:
+            entry = self._key_locks.setdefault(cache_key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            # 没有其他线程在等待时移除，锁表不随缓存键数量增长
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[cache_key]
+
+    def get(self, cache_key: str) -> Optional[str]:
+        """
+        查找未过期的 Voice ID，命中时刷新有效期（音色被使用后服务端也会续期）
+
+        Returns:
+            Voice ID；未命中返回 None
+        """
+        if not self.enabled:
+            return None
+
+        with self._locked():
+            entries = self._load()
+            entry = entries.get(cache_key)
+            now = time.time()
+            if not entry or entry.get("expires_at", 0) <= now:
+                return None
+
+            entry["expires_at"] = now + self.ttl_seconds
+            entry["last_used_at"] = now
+            self._save(entries)
+            return entry["voice_id"]
+
+    def put(self, cache_key: str, voice_id: str, aliases: Iterable[str] = ()) -> None:
+        """
+        登记新克隆的 Voice ID
+
+        Args:
+            cache_key: 音频指纹缓存键
+            voice_id: 克隆得到的 Voice ID
+            aliases: 其他指向同一音色的缓存键（如上传文件哈希），命中时无需解码音频
+        """
+        if not self.enabled:
+            return
+
+        with self._locked():
+            entries = self._load()
+            now = time.time()
+            for key in (cache_key, *aliases):
+                entries[key] = {
+                    "voice_id": voice_id,
+                    "created_at": now,
+                    "last_used_at": now,
+                    "expires_at": now + self.ttl_seconds
+                }
+            self._save(entries)
+        logger.info(f"克隆音色已登记到缓存: {voice_id}")
+
+    def invalidate(self, cache_key: str) -> None:
+        """移除缓存项及指向同一音色的其他缓存键（例如服务端已删除该音色）"""
+        if not self.enabled:
+            return
+
+        with self._locked():
+            entries = self._load()
+            entry = entries.pop(cache_key, None)
+            if entry is None:
+                return
+            for key in [key for key, other in entries.items() if other.get("voice_id") == entry["voice_id"]]:
+                del entries[key]
+            self._save(entries)
+        logger.info(f"克隆音色已从缓存移除: {entry['voice_id']}")
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._locked():
+            entries = self._load()
+        now = time.time()
+        return {
+            "enabled": self.enabled,
+            "entries": len(entries),
+            "valid_entries": sum(1 for entry in entries.values() if entry.get("expires_at", 0) > now)
+        }
+
+    @contextmanager
+    def _locked(self):
+        """进程内线程锁 + 跨进程文件锁"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self) -> Dict[str, Any]:
+        """读取登记表并丢弃过期项（调用方需持有锁）"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"克隆音色缓存文件损坏，已忽略: {str(e)}")
+            return {}
+
+        now = time.time()
+        return {key: entry for key, entry in entries.items() if entry.get("expires_at", 0) > now}
+
+    def _save(self, entries: Dict[str, Any]) -> None:
+        """写入临时文件后原子替换，读者不会看到写了一半的文件（调用方需持有锁）"""
+        directory = os.path.dirname(self.path)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".voice_clone_cache_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+# 单例实例
+voice_clone_cache = VoiceCloneCache(
+    path=VOICE_CLONE_CACHE_CONFIG["path"],
+    ttl_seconds=VOICE_CLONE_CACHE_CONFIG["ttl_seconds"],
+    enabled=VOICE_CLONE_CACHE_CONFIG["enabled"]
+)
@@ -3,13 +3,19 @@
 负责 Voice ID 生成、校验和音色克隆管理
 """
 
+import os
 import random
 import string
 import logging
-from typing import Dict, Any
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
 from pydub import AudioSegment
-from config import VOICE_ID_CONFIG, DEFAULT_VOICES
+from config import VOICE_ID_CONFIG, DEFAULT_VOICES, VOICE_CLONE_UPLOAD_CONFIG, VOICE_CLONE_CACHE_CONFIG
 from minimax_client import minimax_client
+from voice_cache import voice_clone_cache, audio_fingerprint
+from audio_utils import get_codec_backend, probe_audio_duration, prepare_clone_upload
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,6 +27,9 @@ class VoiceManager:
     def __init__(self):
         self.default_voices = DEFAULT_VOICES
         self.config = VOICE_ID_CONFIG
+        # 最近克隆的 Voice ID -> {"audio_file", "audio_sha256", "cache_key", "replacement"}，音色失效时重新克隆
+        self._clone_sources = OrderedDict()
+        self._sources_lock = threading.Lock()
 
     def generate_voice_id(self, prefix: str = None) -> str:
         """
@@ -110,26 +119,47 @@ class VoiceManager:
                 "message": "Voice ID 校验通过"
             }
 
-    def clone_custom_voice(self, audio_file_path: str, voice_id: str = None, api_key: str = None) -> Dict[str, Any]:
+    def clone_custom_voice(self, audio_file_path: str, voice_id: str = None, api_key: str = None,
+                           audio_sha256: str = None) -> Dict[str, Any]:
         """
         克隆自定义音色
 
         Args:
             audio_file_path: 音频文件路径
             voice_id: 指定的 Voice ID，如果为 None 则自动生成
+            audio_sha256: 上传时计算的文件哈希（可选），相同文件无需解码即可命中缓存
 
         Returns:
             包含 voice_id 和 trace_id 的结果字典
         """
-        # 检查音频文件时长（必须 >= 10 秒）
+        # 相同文件再次上传：直接按文件哈希命中缓存
+        file_cache_key = None
+        if voice_id is None and audio_sha256:
+            file_cache_key = voice_clone_cache.cache_key(f"file:{audio_sha256}", api_key)
+            cached_voice_id = voice_clone_cache.get(file_cache_key)
+            if cached_voice_id:
+                logger.info(f"按文件哈希命中克隆音色缓存，Voice ID: {cached_voice_id}")
+                self._remember_source(cached_voice_id, audio_file_path, audio_sha256, file_cache_key)
+                return {
+                    "success": True,
+                    "voice_id": cached_voice_id,
+                    "cached": True,
+                    "message": "复用已克隆音色"
+                }
+
+        # 检查音频文件时长（必须 >= 10 秒）：优先只读取文件头，无法识别的格式再完整解码
+        min_seconds = VOICE_CLONE_UPLOAD_CONFIG["min_seconds"]
+        audio = None
         try:
-            audio = AudioSegment.from_file(audio_file_path)
-            duration_seconds = len(audio) / 1000.0
+            duration_seconds = probe_audio_duration(audio_file_path)
+            if duration_seconds is None:
+                audio = get_codec_backend().decode_file(audio_file_path)
+                duration_seconds = len(audio) / 1000.0
 
             logger.info(f"音频文件时长: {duration_seconds:.2f} 秒")
 
-            if duration_seconds < 10:
-                error_msg = f"音频时长不足 10 秒（当前 {duration_seconds:.2f} 秒），音色克隆需要至少 10 秒的音频"
+            if duration_seconds < min_seconds:
+                error_msg = f"音频时长不足 {min_seconds} 秒（当前 {duration_seconds:.2f} 秒），音色克隆需要至少 {min_seconds} 秒的音频"
                 logger.error(error_msg)
                 return {
                     "success": False,
@@ -138,6 +168,10 @@ class VoiceManager:
                     "duration": duration_seconds
                 }
 
+            # 时长合格后才解码（音频指纹和精简上传都需要 PCM）
+            if audio is None:
+                audio = get_codec_backend().decode_file(audio_file_path)
+
         except Exception as e:
             error_msg = f"无法读取音频文件: {str(e)}"
             logger.error(error_msg)
@@ -147,25 +181,110 @@ class VoiceManager:
                 "message": error_msg
             }
 
-        # 生成或校验 Voice ID
+        # 未指定 Voice ID 时，按音频指纹 + API Key 复用之前克隆的音色
         if voice_id is None:
-            voice_id = self.generate_voice_id()
-        else:
-            validation = self.validate_voice_id(voice_id)
-            if not validation["valid"]:
-                return {
-                    "success": False,
-                    "error": f"Voice ID 校验失败: {', '.join(validation['errors'])}"
-                }
+            cache_key = voice_clone_cache.cache_key(audio_fingerprint(audio), api_key)
+            with voice_clone_cache.key_lock(cache_key):
+                cached_voice_id = voice_clone_cache.get(cache_key)
+                if cached_voice_id:
+                    logger.info(f"命中克隆音色缓存，跳过上传和克隆，Voice ID: {cached_voice_id}")
+                    if file_cache_key:
+                        voice_clone_cache.put(cache_key, cached_voice_id, aliases=[file_cache_key])
+                    self._remember_source(cached_voice_id, audio_file_path, audio_sha256, cache_key)
+                    return {
+                        "success": True,
+                        "voice_id": cached_voice_id,
+                        "cached": True,
+                        "message": "复用已克隆音色"
+                    }
+
+                result = self._clone_voice(audio_file_path, self.generate_voice_id(), api_key, audio)
+                if result.get("success"):
+                    voice_clone_cache.put(cache_key, result["voice_id"], aliases=[file_cache_key] if file_cache_key else [])
+                    self._remember_source(result["voice_id"], audio_file_path, audio_sha256, cache_key)
+                return result
+
+        validation = self.validate_voice_id(voice_id)
+        if not validation["valid"]:
+            return {
+                "success": False,
+                "error": f"Voice ID 校验失败: {', '.join(validation['errors'])}"
+            }
+
+        return self._clone_voice(audio_file_path, voice_id, api_key, audio)
+
+    def recover_voice(self, voice_id: str, api_key: str = None) -> Optional[str]:
+        """
+        TTS 报告克隆音色不存在时调用：移除缓存登记，用原参考音频重新克隆
+
+        同一音色并发失败时只重新克隆一次，其余调用直接得到新的 Voice ID
+
+        Returns:
+            新的 Voice ID；不是本进程克隆的音色、参考音频已删除或重新克隆失败时返回 None
+        """
+        with voice_clone_cache.key_lock(f"recover:{voice_id}"):
+            with self._sources_lock:
+                source = self._clone_sources.get(voice_id)
+            if source is None:
+                return None
+            if source["replacement"]:
+                return source["replacement"]
+
+            voice_clone_cache.invalidate(source["cache_key"])
+            if not os.path.exists(source["audio_file"]):
+                logger.warning(f"音色 {voice_id} 已失效，参考音频已删除，无法重新克隆")
+                return None
+
+            logger.info(f"音色 {voice_id} 已失效，重新克隆")
+            result = self.clone_custom_voice(source["audio_file"], api_key=api_key, audio_sha256=source["audio_sha256"])
+            if not result["success"]:
+                logger.error(f"重新克隆音色失败: {result.get('error')}")
+                return None
+            source["replacement"] = result["voice_id"]
+            return result["voice_id"]
+
+    def _remember_source(self, voice_id: str, audio_file_path: str, audio_sha256: Optional[str], cache_key: str) -> None:
+        """记录克隆音色对应的参考音频（只保留最近 max_tracked_sources 个）"""
+        with self._sources_lock:
+            self._clone_sources[voice_id] = {
+                "audio_file": audio_file_path,
+                "audio_sha256": audio_sha256,
+                "cache_key": cache_key,
+                "replacement": None
+            }
+            self._clone_sources.move_to_end(voice_id)
+            while len(self._clone_sources) > VOICE_CLONE_CACHE_CONFIG["max_tracked_sources"]:
+                self._clone_sources.popitem(last=False)
+
+    def _clone_voice(self, audio_file_path: str, voice_id: str, api_key: str = None, audio: AudioSegment = None) -> Dict[str, Any]:
+        """调用 MiniMax API 进行音色克隆（可选先生成精简的上传音频）"""
+        upload_path = audio_file_path
+        if audio is not None and VOICE_CLONE_UPLOAD_CONFIG["compact"]:
+            try:
+                upload_path = prepare_clone_upload(
+                    audio,
+                    audio_file_path,
+                    os.path.splitext(audio_file_path)[0] + "_clone.mp3",
+                    min_seconds=VOICE_CLONE_UPLOAD_CONFIG["min_seconds"],
+                    max_seconds=VOICE_CLONE_UPLOAD_CONFIG["max_seconds"],
+                    sample_rate=VOICE_CLONE_UPLOAD_CONFIG["sample_rate"],
+                    bitrate_kbps=VOICE_CLONE_UPLOAD_CONFIG["bitrate_kbps"],
+                    silence_threshold_dbfs=VOICE_CLONE_UPLOAD_CONFIG["silence_threshold_dbfs"]
+                )
+            except Exception as e:
+                logger.warning(f"生成精简上传音频失败，上传原文件: {str(e)}")
 
         logger.info(f"开始克隆音色，Voice ID: {voice_id}")
 
-        # 调用 MiniMax API 进行音色克隆
-        result = minimax_client.clone_voice(
-            audio_file_path=audio_file_path,
-            voice_id=voice_id,
-            api_key=api_key
-        )
+        try:
+            result = minimax_client.clone_voice(
+                audio_file_path=upload_path,
+                voice_id=voice_id,
+                api_key=api_key
+            )
+        finally:
+            if upload_path != audio_file_path and os.path.exists(upload_path):
+                os.remove(upload_path)
 
         return result
 
@@ -191,108 +310,158 @@ class VoiceManager:
                 "error": f"未找到默认音色: {speaker_name}"
             }
 
-    def prepare_voices(self, speaker1_config: Dict[str, Any], speaker2_config: Dict[str, Any], api_key: str = None) -> Dict[str, Any]:
+    def _prepare_speaker(self, speaker: str, speaker_config: Dict[str, Any], default_voice_name: str,
+                         fallback_label: str, api_key: str = None) -> Dict[str, Any]:
         """
-        准备两个 Speaker 的音色
+        准备单个 Speaker 的音色
 
         Args:
-            speaker1_config: Speaker1 配置
-                {
-                    "type": "default" | "custom",
-                    "voice_name": "mini" | "max" (default 时使用),
-                    "audio_file": "path/to/audio.wav" (custom 时使用)
-                }
-            speaker2_config: Speaker2 配置（格式同上）
+            speaker: "Speaker1" 或 "Speaker2"
+            speaker_config: Speaker 配置（格式同 prepare_voices）
+            default_voice_name: 默认音色名称，也是克隆失败时的降级音色
+            fallback_label: 降级音色的描述，用于日志
 
         Returns:
-            包含两个 Speaker voice_id 的字典
+            {"success": bool, "voice_id": str, "logs": [...], "trace_ids": {...}, "error": str}
+            失败时 include_logs 表示错误结果是否需要附带日志（与原有返回格式保持一致）
         """
-        results = {
-            "speaker1": None,
-            "speaker2": None,
-            "logs": [],
-            "trace_ids": {}
-        }
+        key = speaker.lower()
+        result = {"success": True, "voice_id": None, "logs": [], "trace_ids": {}}
 
-        # 准备 Speaker1 音色
-        if speaker1_config["type"] == "default":
-            voice_name = speaker1_config.get("voice_name", "mini")
+        if speaker_config["type"] == "default":
+            voice_name = speaker_config.get("voice_name", default_voice_name)
             voice_info = self.get_default_voice(voice_name)
             if voice_info["success"]:
-                results["speaker1"] = voice_info["voice"]["voice_id"]
-                results["logs"].append(f"Speaker1 使用默认音色: {voice_info['voice']['name']}")
+                result["voice_id"] = voice_info["voice"]["voice_id"]
+                result["logs"].append(f"{speaker} 使用默认音色: {voice_info['voice']['name']}")
+            else:
+                result["logs"].append(f"错误: {voice_info['error']}")
+                result.update(success=False, error=voice_info['error'], include_logs=False)
+
+        elif speaker_config["type"] == "custom_id":
+            # 已克隆的音色：只校验格式，不调用接口
+            voice_id = speaker_config.get("voice_id") or ""
+            validation = self.validate_voice_id(voice_id) if voice_id else {"valid": False, "errors": ["为空"]}
+            if validation["valid"]:
+                result["voice_id"] = voice_id
+                result["logs"].append(f"{speaker} 使用已克隆音色: {voice_id}")
             else:
-                results["logs"].append(f"错误: {voice_info['error']}")
-                return {"success": False, "error": voice_info['error']}
+                result.update(success=False, error=f"{speaker} Voice ID 校验失败: {', '.join(validation['errors'])}",
+                              include_logs=False)
 
-        elif speaker1_config["type"] == "custom":
-            audio_file = speaker1_config.get("audio_file")
+        elif speaker_config["type"] == "custom":
+            audio_file = speaker_config.get("audio_file")
             if not audio_file:
-                return {"success": False, "error": "Speaker1 未提供音频文件", "logs": results["logs"]}
+                result.update(success=False, error=f"{speaker} 未提供音频文件", include_logs=True)
+                return result
 
-            clone_result = self.clone_custom_voice(audio_file, api_key=api_key)
+            clone_result = self.clone_custom_voice(audio_file, api_key=api_key,
+                                                   audio_sha256=speaker_config.get("audio_sha256"))
             if clone_result["success"]:
-                results["speaker1"] = clone_result["voice_id"]
-                results["trace_ids"]["speaker1_upload"] = clone_result.get("upload_trace_id")
-                results["trace_ids"]["speaker1_clone"] = clone_result.get("clone_trace_id")
-                results["logs"].append(f"✅ Speaker1 音色克隆成功: {clone_result['voice_id']}")
+                result["voice_id"] = clone_result["voice_id"]
+                result["trace_ids"][f"{key}_upload"] = clone_result.get("upload_trace_id")
+                result["trace_ids"][f"{key}_clone"] = clone_result.get("clone_trace_id")
+                if clone_result.get("cached"):
+                    result["logs"].append(f"✅ {speaker} 复用已克隆音色: {clone_result['voice_id']}")
+                else:
+                    result["logs"].append(f"✅ {speaker} 音色克隆成功: {clone_result['voice_id']}")
             else:
                 # 音色克隆失败，记录详细错误，并使用默认音色作为降级方案
                 error_detail = clone_result.get('error', '未知错误')
-                results["logs"].append(f"❌ Speaker1 音色克隆失败: {error_detail}")
+                result["logs"].append(f"❌ {speaker} 音色克隆失败: {error_detail}")
 
                 # 如果是时长不足的错误，提供更明确的提示
                 if 'duration' in clone_result:
-                    results["logs"].append(f"⚠️  音频时长仅 {clone_result['duration']:.2f} 秒，需要至少 10 秒")
+                    result["logs"].append(f"⚠️  音频时长仅 {clone_result['duration']:.2f} 秒，需要至少 10 秒")
 
-                results["logs"].append(f"⚠️  降级使用默认音色 Mini（女声）")
+                result["logs"].append(f"⚠️  降级使用默认音色 {fallback_label}")
 
                 # 降级到默认音色
-                voice_info = self.get_default_voice("mini")
+                voice_info = self.get_default_voice(default_voice_name)
                 if voice_info["success"]:
-                    results["speaker1"] = voice_info["voice"]["voice_id"]
+                    result["voice_id"] = voice_info["voice"]["voice_id"]
                 else:
-                    return {"success": False, "error": "无法使用默认音色作为降级方案", "logs": results["logs"]}
+                    result.update(success=False, error="无法使用默认音色作为降级方案", include_logs=True)
 
-        # 准备 Speaker2 音色
-        if speaker2_config["type"] == "default":
-            voice_name = speaker2_config.get("voice_name", "max")
-            voice_info = self.get_default_voice(voice_name)
-            if voice_info["success"]:
-                results["speaker2"] = voice_info["voice"]["voice_id"]
-                results["logs"].append(f"Speaker2 使用默认音色: {voice_info['voice']['name']}")
-            else:
-                results["logs"].append(f"错误: {voice_info['error']}")
-                return {"success": False, "error": voice_info['error']}
+        return result
 
-        elif speaker2_config["type"] == "custom":
-            audio_file = speaker2_config.get("audio_file")
-            if not audio_file:
-                return {"success": False, "error": "Speaker2 未提供音频文件", "logs": results["logs"]}
+    def resolve_voice_ids(self, speaker1_config: Dict[str, Any], speaker2_config: Dict[str, Any],
+                          api_key: str = None) -> Dict[str, Optional[str]]:
+        """
+        不调用接口、不解码音频即可确定的音色 ID（用于提前查找节目缓存）
 
-            clone_result = self.clone_custom_voice(audio_file, api_key=api_key)
-            if clone_result["success"]:
-                results["speaker2"] = clone_result["voice_id"]
-                results["trace_ids"]["speaker2_upload"] = clone_result.get("upload_trace_id")
-                results["trace_ids"]["speaker2_clone"] = clone_result.get("clone_trace_id")
-                results["logs"].append(f"✅ Speaker2 音色克隆成功: {clone_result['voice_id']}")
-            else:
-                # 音色克隆失败，记录详细错误，并使用默认音色作为降级方案
-                error_detail = clone_result.get('error', '未知错误')
-                results["logs"].append(f"❌ Speaker2 音色克隆失败: {error_detail}")
+        默认音色直接返回其 ID；自定义音色按上传文件哈希查找已克隆的音色，未克隆过时为 None
 
-                # 如果是时长不足的错误，提供更明确的提示
-                if 'duration' in clone_result:
-                    results["logs"].append(f"⚠️  音频时长仅 {clone_result['duration']:.2f} 秒，需要至少 10 秒")
+        Args:
+            speaker1_config / speaker2_config: 格式同 prepare_voices
+
+        Returns:
+            {"speaker1": 音色 ID 或 None, "speaker2": 音色 ID 或 None}
+        """
+        voice_ids = {}
+        for key, speaker_config, default_voice_name in (("speaker1", speaker1_config, "mini"),
+                                                        ("speaker2", speaker2_config, "max")):
+            voice_id = None
+            if speaker_config["type"] == "default":
+                voice = self.default_voices.get(speaker_config.get("voice_name", default_voice_name).lower())
+                voice_id = voice["voice_id"] if voice else None
+            elif speaker_config["type"] == "custom_id":
+                voice_id = speaker_config.get("voice_id") or None
+            elif speaker_config["type"] == "custom" and speaker_config.get("audio_sha256"):
+                voice_id = voice_clone_cache.get(
+                    voice_clone_cache.cache_key(f"file:{speaker_config['audio_sha256']}", api_key))
+            voice_ids[key] = voice_id
+        return voice_ids
+
+    def prepare_voices(self, speaker1_config: Dict[str, Any], speaker2_config: Dict[str, Any], api_key: str = None) -> Dict[str, Any]:
+        """
+        准备两个 Speaker 的音色
 
-                results["logs"].append(f"⚠️  降级使用默认音色 Max（男声）")
+        两个 Speaker 都需要克隆时并发执行（时长检查、上传、克隆），
+        结果与日志仍按 Speaker1、Speaker2 的顺序合并
 
-                # 降级到默认音色
-                voice_info = self.get_default_voice("max")
-                if voice_info["success"]:
-                    results["speaker2"] = voice_info["voice"]["voice_id"]
-                else:
-                    return {"success": False, "error": "无法使用默认音色作为降级方案", "logs": results["logs"]}
+        Args:
+            speaker1_config: Speaker1 配置
+                {
+                    "type": "default" | "custom" | "custom_id",
+                    "voice_name": "mini" | "max" (default 时使用),
+                    "audio_file": "path/to/audio.wav" (custom 时使用),
+                    "voice_id": 已克隆的音色 ID (custom_id 时使用)
+                }
+            speaker2_config: Speaker2 配置（格式同上）
+
+        Returns:
+            包含两个 Speaker voice_id 的字典
+        """
+        results = {
+            "speaker1": None,
+            "speaker2": None,
+            "logs": [],
+            "trace_ids": {}
+        }
+
+        speaker_args = [
+            ("Speaker1", speaker1_config, "mini", "Mini（女声）"),
+            ("Speaker2", speaker2_config, "max", "Max（男声）")
+        ]
+
+        if speaker1_config["type"] == "custom" and speaker2_config["type"] == "custom":
+            # 两个克隆互不依赖，并发执行
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix="voice-clone") as executor:
+                futures = [executor.submit(self._prepare_speaker, *args, api_key=api_key) for args in speaker_args]
+                speaker_results = [future.result() for future in futures]
+        else:
+            speaker_results = [self._prepare_speaker(*args, api_key=api_key) for args in speaker_args]
+
+        for (speaker, _, _, _), speaker_result in zip(speaker_args, speaker_results):
+            results["logs"].extend(speaker_result["logs"])
+            if not speaker_result["success"]:
+                if speaker_result.get("include_logs"):
+                    return {"success": False, "error": speaker_result["error"], "logs": results["logs"]}
+                return {"success": False, "error": speaker_result["error"]}
+
+            results[speaker.lower()] = speaker_result["voice_id"]
+            results["trace_ids"].update(speaker_result["trace_ids"])
 
         results["success"] = True
         return results
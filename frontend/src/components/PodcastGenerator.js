@@ -7,6 +7,10 @@ const PodcastGenerator = () => {
   const [textInput, setTextInput] = useState('');
   const [urlInput, setUrlInput] = useState('');
   const [pdfFile, setPdfFile] = useState(null);
+  const [longInput, setLongInput] = useState(false);  // 长文档模式：分段摘要后生成脚本
+  const [longForm, setLongForm] = useState(false);  // 长节目模式：大纲 + 分段并行生成
+  const [targetMinutes, setTargetMinutes] = useState(30);
+  const [scriptMode, setScriptMode] = useState(false);  // 脚本模式：文本框内容直接作为脚本合成
 
   const [speaker1Type, setSpeaker1Type] = useState('default');
   const [speaker1Voice, setSpeaker1Voice] = useState('mini');
@@ -21,6 +25,8 @@ const PodcastGenerator = () => {
   const [logs, setLogs] = useState([]);
   const [script, setScript] = useState([]);
   const [coverImage, setCoverImage] = useState('');
+  const [coverDownloadUrl, setCoverDownloadUrl] = useState('');
+  const [coverSrcSet, setCoverSrcSet] = useState('');
   const [traceIds, setTraceIds] = useState([]);
 
   const [audioUrl, setAudioUrl] = useState('');
@@ -146,6 +152,8 @@ const PodcastGenerator = () => {
     setScript([]);
     setTraceIds([]);
     setCoverImage('');
+    setCoverDownloadUrl('');
+    setCoverSrcSet('');
     setAudioUrl('');
     setScriptUrl('');
     setPlayer0Url('');
@@ -157,9 +165,14 @@ const PodcastGenerator = () => {
     // 构建 FormData
     const formData = new FormData();
     formData.append('api_key', apiKey);
-    if (textInput) formData.append('text_input', textInput);
+    if (textInput) formData.append(scriptMode ? 'script_input' : 'text_input', textInput);
     if (urlInput) formData.append('url', urlInput);
     if (pdfFile) formData.append('pdf_file', pdfFile);
+    if (longInput) formData.append('long_input', 'true');
+    if (longForm) {
+      formData.append('long_form', 'true');
+      formData.append('target_minutes', targetMinutes);
+    }
 
     formData.append('speaker1_type', speaker1Type);
     if (speaker1Type === 'default') {
@@ -246,6 +259,11 @@ const PodcastGenerator = () => {
         addLog(data.message);
         break;
 
+      case 'queued':
+        // 服务繁忙，排队等待中
+        setProgress(data.message);
+        break;
+
       case 'script_chunk':
         setScript(prev => [...prev, data.full_line]);
         break;
@@ -255,7 +273,18 @@ const PodcastGenerator = () => {
         break;
 
       case 'cover_image':
-        setCoverImage(data.image_url);
+        // 优先使用后端保存到本地的封面（带缓存头），否则使用原始图片地址并经代理下载
+        if (data.local_url) {
+          setCoverImage(`${API_URL}${data.local_url}`);
+          setCoverDownloadUrl(`${API_URL}${data.local_url}?download=1`);
+          // 预览按显示尺寸选用后端预生成的缩略图，下载仍是原图
+          setCoverSrcSet(Object.values(data.variants || {})
+            .map(variant => `${API_URL}${variant.url} ${variant.width}w`)
+            .join(', '));
+        } else {
+          setCoverImage(data.image_url);
+          setCoverDownloadUrl(`${API_URL}/download/cover?url=${encodeURIComponent(data.image_url)}`);
+        }
         addLog('封面生成完成');
         break;
 
@@ -269,6 +298,34 @@ const PodcastGenerator = () => {
         // BGM 和欢迎语音频事件，前端不需要处理
         break;
 
+      case 'pipeline_stats':
+        // 后端流水线阶段统计，仅用于排查
+        console.log('流水线统计:', data.stages);
+        break;
+
+      case 'prompt_reduction':
+        // 脚本 Prompt 精简统计（日志中已有可读消息），仅用于排查
+        console.log('Prompt 精简:', data);
+        break;
+
+      case 'stage_timing':
+        // 后端各阶段开始/结束时间，仅用于排查
+        console.log(`阶段 ${data.stage} ${data.status}:`, data);
+        break;
+
+      case 'outline':
+        addLog(`🗂️ 节目大纲：${data.sections.join(' / ')}`);
+        break;
+
+      case 'section_progress':
+        setProgress(data.message);
+        break;
+
+      case 'source_progress':
+        // 多来源解析进度（每个网址/PDF 单独上报）
+        addLog(data.status === 'failed' ? `⚠️ ${data.message}` : data.message);
+        break;
+
       case 'progressive_audio':
         // 收到渐进式音频更新 - 使用双缓冲策略
         const progressiveUrl = `${API_URL}${data.audio_url}`;
@@ -383,6 +440,46 @@ const PodcastGenerator = () => {
               />
             </div>
           </div>
+
+          <div className="input-group">
+            <label className="input-label">
+              <input
+                type="checkbox"
+                checked={longInput}
+                onChange={(e) => setLongInput(e.target.checked)}
+              />
+              📚 长文档模式（分段摘要，覆盖网页/PDF 全文）
+            </label>
+          </div>
+
+          <div className="input-group">
+            <label className="input-label">
+              <input
+                type="checkbox"
+                checked={longForm}
+                onChange={(e) => setLongForm(e.target.checked)}
+              />
+              🎙️ 长节目模式（先生成大纲，分段并行生成）
+            </label>
+            {longForm && (
+              <select value={targetMinutes} onChange={(e) => setTargetMinutes(Number(e.target.value))}>
+                {[10, 20, 30, 45, 60].map((minutes) => (
+                  <option key={minutes} value={minutes}>{minutes} 分钟</option>
+                ))}
+              </select>
+            )}
+          </div>
+
+          <div className="input-group">
+            <label className="input-label">
+              <input
+                type="checkbox"
+                checked={scriptMode}
+                onChange={(e) => setScriptMode(e.target.checked)}
+              />
+              📜 脚本模式（文本框内容为 "Speaker1: 文本" 格式的脚本，跳过脚本生成）
+            </label>
+          </div>
         </div>
       </div>
 
@@ -526,7 +623,13 @@ const PodcastGenerator = () => {
           {coverImage && (
             <div className="cover-section">
               <h2>🖼️ 播客封面</h2>
-              <img src={coverImage} alt="播客封面" className="cover-image" />
+              <img
+                src={coverImage}
+                srcSet={coverSrcSet || undefined}
+                sizes="(max-width: 768px) 90vw, 320px"
+                alt="播客封面"
+                className="cover-image"
+              />
             </div>
           )}
 
@@ -580,8 +683,8 @@ const PodcastGenerator = () => {
               ⬇️ 下载脚本
             </a>
           )}
-          {coverImage && (
-            <a href={`${API_URL}/download/cover?url=${encodeURIComponent(coverImage)}`} download className="download-btn">
+          {coverDownloadUrl && (
+            <a href={coverDownloadUrl} download className="download-btn">
               ⬇️ 下载封面
             </a>
           )}
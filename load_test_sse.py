@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+SSE 延迟压测脚本 - 观察一个会话合成长播客时，其他会话的事件推送是否被拖慢
+
+用法:
+    python3 load_test_sse.py --api-key <MiniMax API Key> [--sessions 3]
+
+做法:
+- 启动 1 个长内容会话（最终合成耗时最长）和若干个普通会话
+- 记录每个会话每个 SSE 事件的到达时间
+- 后台线程每 100ms 请求一次 /health，测量服务端响应延迟
+- 统计长会话处于 audio_merging（最终合成）阶段期间的延迟分布，与其余时间对比
+"""
+import argparse
+import threading
+import time
+import json
+import requests
+
+API_BASE = "http://localhost:5001"
+
+LONG_TEXT = "请详细讨论人工智能在医疗、教育、金融、交通、能源等领域的应用、挑战与未来趋势。" * 20
+SHORT_TEXT = "聊聊今天的天气"
+
+
+def print_section(title):
+    print("\n" + "="*50)
+    print(f"  {title}")
+    print("="*50)
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * p / 100))
+    return values[index]
+
+
+def run_session(name, text, api_key, results, finalize_window=None):
+    """运行一个生成会话，记录事件到达时间"""
+    events = []
+    form = {
+        'api_key': api_key,
+        'text_input': text,
+        'speaker1_type': 'default',
+        'speaker1_voice_name': 'mini',
+        'speaker2_type': 'default',
+        'speaker2_voice_name': 'max'
+    }
+    try:
+        with requests.post(f"{API_BASE}/api/generate_podcast", data=form, stream=True, timeout=1800) as response:
+            for line in response.iter_lines():
+                if not line or not line.startswith(b'data: '):
+                    continue
+                event = json.loads(line[6:])
+                now = time.time()
+                events.append((now, event.get('type'), event.get('step')))
+
+                if finalize_window is not None:
+                    if event.get('step') == 'audio_merging':
+                        finalize_window['start'] = now
+                    elif event.get('type') in ('complete', 'error'):
+                        finalize_window['end'] = now
+    except Exception as e:
+        print(f"[{name}] 会话异常: {e}")
+    results[name] = events
+
+
+def probe_health(samples, stop_event):
+    """每 100ms 请求一次 /health，记录 (时间, 延迟)"""
+    while not stop_event.is_set():
+        start = time.time()
+        try:
+            requests.get(f"{API_BASE}/health", timeout=10)
+            samples.append((start, time.time() - start))
+        except Exception:
+            pass
+        time.sleep(0.1)
+
+
+def main():
+    global API_BASE
+    parser = argparse.ArgumentParser(description="SSE 事件延迟压测")
+    parser.add_argument('--api-key', required=True, help='MiniMax API Key')
+    parser.add_argument('--api-base', default=API_BASE, help='后端地址')
+    parser.add_argument('--sessions', type=int, default=3, help='普通会话数量')
+    args = parser.parse_args()
+    API_BASE = args.api_base.rstrip('/')
+
+    print_section("启动会话")
+    results = {}
+    finalize_window = {}
+    health_samples = []
+    stop_event = threading.Event()
+
+    prober = threading.Thread(target=probe_health, args=(health_samples, stop_event))
+    prober.start()
+
+    threads = [threading.Thread(target=run_session, args=("long", LONG_TEXT, args.api_key, results, finalize_window))]
+    for i in range(args.sessions):
+        threads.append(threading.Thread(target=run_session, args=(f"short-{i + 1}", SHORT_TEXT, args.api_key, results)))
+
+    for t in threads:
+        t.start()
+        time.sleep(0.5)
+    for t in threads:
+        t.join()
+
+    stop_event.set()
+    prober.join()
+
+    print_section("结果")
+    for name, events in results.items():
+        print(f"{name}: 共 {len(events)} 个事件")
+
+    start = finalize_window.get('start')
+    end = finalize_window.get('end')
+    if not start or not end:
+        print("未捕获到长会话的最终合成阶段")
+        return False
+
+    inside = [latency for ts, latency in health_samples if start <= ts <= end]
+    outside = [latency for ts, latency in health_samples if not (start <= ts <= end)]
+    print(f"长会话最终合成耗时: {end - start:.2f} 秒")
+    for label, values in (("最终合成期间", inside), ("其余时间", outside)):
+        print(f"{label}: 样本 {len(values)}，p50 {percentile(values, 50) * 1000:.0f}ms，"
+              f"p95 {percentile(values, 95) * 1000:.0f}ms，max {max(values, default=0) * 1000:.0f}ms")
+
+    # 其他会话在最终合成期间的事件间隔
+    gaps = []
+    for name, events in results.items():
+        if name == "long":
+            continue
+        times = [ts for ts, _, _ in events if start <= ts <= end]
+        gaps.extend(b - a for a, b in zip(times, times[1:]))
+    print(f"其他会话在最终合成期间的最大事件间隔: {max(gaps, default=0):.2f} 秒")
+    return True
+
+
+if __name__ == "__main__":
+    try:
+        exit(0 if main() else 1)
+    except KeyboardInterrupt:
+        print("\n\n压测被用户中断")
+        exit(1)